@@ -1,11 +1,12 @@
 import os
+import atexit
 from flask import Flask
 
 
 # Importa as extensões que vamos inicializar
 from .extensions import db, cors, bcrypt, jwt
 # Importa os Modelos (para o SQLAlchemy saber deles)
-from .models import User, ScrapedData
+from .models import User, ScrapedData, ScrapeJob, TrackedAccount, upgrade_schema
 
 
 def create_app(config_name="default"):
@@ -61,15 +62,54 @@ def create_app(config_name="default"):
     from .modules.admin import admin_bp
     from .modules.auth import auth_bp
     from .modules.scraping import scraping_bp 
+    from .modules.metrics import metrics_bp
 
     # 4. Registra os Blueprints (rotas)
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(scraping_bp)
+    app.register_blueprint(metrics_bp) # /metrics (Prometheus)
+
+    from .modules.metrics import instruments
+    instruments.init_app(app) # Logs estruturados (JSON) das etapas do scrape
+
+    # 5. Inicializa o pool de drivers do Selenium (pré-aquecido em background)
+    #    e a camada de fetch (HTTP primeiro, Selenium como fallback)
+    from .modules.scraping.services import driver_pool, page_fetcher, selenium_settings, host_scheduler
+    selenium_settings.init_app(app) # Antes do pool: o pré-aquecimento já usa estas opções
+    driver_pool.init_app(app)
+    atexit.register(driver_pool.shutdown)
+    host_scheduler.init_app(app)
+    page_fetcher.init_app(app)
+    from .modules.scraping.extraction import extraction_limits
+    extraction_limits.init_app(app) # Tetos de elementos/texto/links por página
+
+    from .modules.scraping.ai import gemini_client
+    gemini_client.init_app(app)
+    from .modules.scraping.content import content_reducer
+    content_reducer.init_app(app) # Orçamento de tokens do texto enviado ao Gemini
+
+    from .modules.scraping.cache import scrape_cache
+    scrape_cache.init_app(app)
 
     # Bônus: Cria tabelas se não existirem
     with app.app_context():
         # db.drop_all() # Cuidado: Usar só em dev para limpar
         db.create_all()
+        upgrade_schema() # Colunas/índices novos em tabelas que já existiam
+
+    # 6. Inicia os workers dos jobs de scrape assíncronos (depois das tabelas existirem)
+    from .modules.scraping.jobs import job_runner
+    job_runner.init_app(app)
+
+    # 7. Manutenção do cache (purga por idade + orçamento LRU) em background
+    from .modules.scraping.maintenance import cache_maintainer
+    cache_maintainer.init_app(app)
+    atexit.register(cache_maintainer.shutdown)
+
+    # 8. Pré-aquecimento do cache das contas acompanhadas, fora das horas de pico
+    from .modules.scraping.prewarm import cache_prewarmer
+    cache_prewarmer.init_app(app)
+    atexit.register(cache_prewarmer.shutdown)
 
     return app
\ No newline at end of file
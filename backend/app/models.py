@@ -1,27 +1,199 @@
 from app.extensions import db
 from sqlalchemy.dialects.postgresql import JSONB # Importa o tipo JSONB!
+from sqlalchemy import DDL, event, inspect, text
+from sqlalchemy.orm import deferred
+from sqlalchemy.schema import CreateColumn
 import datetime
+import json
+import uuid
+import zlib
+
+# (V10.9) Expressões da pesquisa nos dossiês em cache. Os índices GIN são
+# sobre estas expressões EXATAS: as queries têm de usar o mesmo texto
+# (ver app/modules/scraping/search.py) para o Postgres os usar.
+SEARCH_TECNOLOGIAS_EXPR = "(data #> '{dossie_pagina_principal,tecnologias_detetadas}')"
+SEARCH_EMAILS_EXPR = "(data #> '{dossie_pagina_principal,emails_encontrados}')"
+SEARCH_LINKS_SOCIAIS_EXPR = "(data #> '{dossie_pagina_principal,links_sociais}')"
+SEARCH_REDES_SOCIAIS_EXPR = "scraped_social_networks(data)"
+SEARCH_TS_CONFIG = "portuguese"
+SEARCH_TSV_EXPR = (
+    f"to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, "
+    "coalesce(data #>> '{dossie_pagina_principal,analise_ia,main_subject}', '') || ' ' || "
+    "coalesce(data #>> '{dossie_pagina_principal,analise_ia,target_audience}', ''))"
+)
+
+# Rede social -> domínios (os mesmos do REDES_SOCIAIS da extração).
+# Mudar esta lista exige um REINDEX do ix_scraped_data_cache_redes_sociais.
+REDES_SOCIAIS_DOMINIOS = {
+    'linkedin': ['linkedin.com'],
+    'facebook': ['facebook.com'],
+    'instagram': ['instagram.com'],
+    'twitter': ['twitter.com'],
+    'whatsapp': ['wa.me', 'whatsapp.com'],
+}
+
+# Função IMMUTABLE (pode ser indexada): links sociais do dossiê -> nomes das redes
+_REDES_VALUES = ", ".join(
+    f"('{rede}', '{dominio}')" for rede, dominios in REDES_SOCIAIS_DOMINIOS.items() for dominio in dominios
+)
+SOCIAL_NETWORKS_FUNCTION = DDL(f"""
+CREATE OR REPLACE FUNCTION scraped_social_networks(doc jsonb) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT rede.nome ORDER BY rede.nome), '{{}}')
+    FROM jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(doc #> '{{dossie_pagina_principal,links_sociais}}') = 'array'
+             THEN doc #> '{{dossie_pagina_principal,links_sociais}}' ELSE '[]'::jsonb END
+    ) AS link
+    JOIN (VALUES {_REDES_VALUES}) AS rede(nome, dominio)
+        ON strpos(lower(link), rede.dominio) > 0
+$$
+""").execute_if(dialect='postgresql')
 
 class ScrapedData(db.Model):
     """
     Modelo da tabela para armazenar o cache do scraping.
     """
     __tablename__ = 'scraped_data_cache'
+    __table_args__ = (
+        # (A consulta de "frescura" - url = ? AND scraped_at > ? - usa o índice único de 'url')
+        # Purga por idade e despejo "LRU" (menos acedidos primeiro)
+        db.Index('ix_scraped_data_cache_scraped_at', 'scraped_at'),
+        db.Index('ix_scraped_data_cache_lru', db.func.coalesce(db.text('last_accessed_at'), db.text('scraped_at'))),
+        # Pesquisa nos dossiês (V10.9): filtros GIN no JSONB (a paginação usa o índice da chave primária)
+        db.Index('ix_scraped_data_cache_tecnologias', db.text(SEARCH_TECNOLOGIAS_EXPR), postgresql_using='gin'),
+        db.Index('ix_scraped_data_cache_emails', db.text(SEARCH_EMAILS_EXPR), postgresql_using='gin'),
+        db.Index('ix_scraped_data_cache_links_sociais', db.text(SEARCH_LINKS_SOCIAIS_EXPR), postgresql_using='gin'),
+        db.Index('ix_scraped_data_cache_redes_sociais', db.text(SEARCH_REDES_SOCIAIS_EXPR), postgresql_using='gin'),
+        db.Index('ix_scraped_data_cache_analise_tsv', db.text(SEARCH_TSV_EXPR), postgresql_using='gin'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
     # URL única e indexada para buscas rápidas
     url = db.Column(db.String(2048), unique=True, nullable=False, index=True) 
     
-    # A "coluna mágica" para armazenar nosso JSON
+    # A "coluna mágica" para armazenar nosso JSON (o dossiê principal)
     data = db.Column(JSONB, nullable=False)
+
+    # As análises das sub-páginas (mapas de headings, etc.) ficam fora do JSONB,
+    # comprimidas (zlib), e só são carregadas quando acedidas
+    subpages_blob = deferred(db.Column(db.LargeBinary, nullable=True))
     
     # Data de quando o scrape foi feito
     scraped_at = db.Column(db.DateTime(timezone=True), default=datetime.datetime.utcnow, nullable=False)
 
+    # Último acesso (hit) ao registo - usado no despejo LRU do cache.
+    # Atualizado em lote pelo CacheMaintainer, não a cada hit.
+    last_accessed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    # Número de hits (também gravado em lote) - prioridade do pré-aquecimento
+    hit_count = db.Column(db.Integer, nullable=False, default=0, server_default=db.text('0'))
+
+    # "Impressões digitais" de cada página (home + sub-páginas) e validadores HTTP
+    # (ETag / Last-Modified), usados para só re-analisar o que mudou no refresh
+    page_meta = deferred(db.Column(JSONB, nullable=True))
+
+    @staticmethod
+    def pack_result(result_json_data):
+        """ Separa o resultado em (JSON do dossiê principal, blob comprimido das sub-páginas). """
+        data = {key: value for key, value in result_json_data.items() if key != "analise_profunda_subpaginas"}
+        subpages = result_json_data.get("analise_profunda_subpaginas", [])
+        subpages_blob = zlib.compress(json.dumps(subpages, ensure_ascii=False).encode('utf-8'))
+        return data, subpages_blob
+
+    def to_result(self):
+        """ Remonta o JSON completo (o mesmo formato devolvido pela API). """
+        if self.subpages_blob is None:
+            # Registos antigos: as sub-páginas ainda estão dentro do JSONB
+            return self.data
+        result = dict(self.data)
+        result["analise_profunda_subpaginas"] = json.loads(zlib.decompress(self.subpages_blob).decode('utf-8'))
+        return result
+
     def __repr__(self):
         return f'<ScrapedData {self.url}>'
 
+# Numa base nova, a função tem de existir antes do CREATE INDEX do create_all()
+event.listen(ScrapedData.__table__, 'before_create', SOCIAL_NETWORKS_FUNCTION)
+
+class ScrapeJob(db.Model):
+    """
+    Modelo da tabela de jobs de scraping assíncronos.
+    Persistido no Postgres para sobreviver a um restart da app.
+    """
+    __tablename__ = 'scrape_jobs'
+
+    # Estados possíveis do job
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+
+    url = db.Column(db.String(2048), nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+
+    # Resultado final (o mesmo JSON do ScrapedData) ou a mensagem de erro
+    result = db.Column(JSONB, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        job_dict = {
+            "job_id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == self.STATUS_DONE:
+            job_dict["result"] = self.result
+        if self.status == self.STATUS_FAILED:
+            job_dict["error"] = self.error
+        return job_dict
+
+    def __repr__(self):
+        return f'<ScrapeJob {self.id} {self.status}>'
+
+class TrackedAccount(db.Model):
+    """
+    Contas (URLs) acompanhadas pela equipa de vendas: o cache delas é
+    pré-aquecido em background fora das horas de pico (ver CachePrewarmer).
+    """
+    __tablename__ = 'tracked_accounts'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # URL normalizada (a mesma chave do ScrapedData)
+    url = db.Column(db.String(2048), unique=True, nullable=False, index=True)
+
+    active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.text('true'))
+
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.datetime.utcnow, nullable=False)
+
+    # Última tentativa de pré-aquecimento e o erro dela (se falhou)
+    last_prewarm_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_prewarm_error = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "active": self.active,
+            "created_at": self.created_at,
+            "last_prewarm_at": self.last_prewarm_at,
+            "last_prewarm_error": self.last_prewarm_error,
+        }
+
+    def __repr__(self):
+        return f'<TrackedAccount {self.url}>'
+
 class User(db.Model):
     """
     Modelo da tabela para armazenar os usuários da aplicação.
@@ -42,4 +214,39 @@ class User(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.datetime.utcnow, nullable=False)
 
     def __repr__(self):
-        return f'<User {self.email}>'
\ No newline at end of file
+        return f'<User {self.email}>'
+
+
+def upgrade_schema():
+    """
+    O 'db.create_all()' só cria tabelas novas; não altera as que já existem.
+    Esta função adiciona às tabelas existentes as colunas novas dos modelos
+    (ALTER TABLE ... ADD COLUMN IF NOT EXISTS).
+    (V10.10) Os índices novos NÃO são criados aqui: um CREATE INDEX normal numa
+    tabela grande bloqueia as escritas, e correria em cada worker que arranca.
+    Só avisa; quem os cria é a migração tools/migrate_indexes.py (CONCURRENTLY).
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            # Os índices da pesquisa dependem desta função
+            conn.execute(SOCIAL_NETWORKS_FUNCTION)
+
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column_ddl}'))
+                    print(f"SCHEMA: Coluna '{table.name}.{column.name}' adicionada.")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            missing_indexes = sorted(index.name for index in table.indexes if index.name not in existing_indexes)
+            if missing_indexes:
+                print(f"AVISO: Índices em falta em '{table.name}': {', '.join(missing_indexes)}. "
+                      f"Corra 'python tools/migrate_indexes.py'.")
@@ -1,11 +1,15 @@
 from flask import request, jsonify
 from . import admin_bp
-from app.models import ScrapedData, User
+from app.models import ScrapedData, TrackedAccount, User
 from app.extensions import db, bcrypt
 from sqlalchemy import exc
 
 # Importa nosso "porteiro" de admin
 from app.modules.auth.decorators import admin_required
+from app.modules.scraping.cache import scrape_cache
+from app.modules.scraping.maintenance import cache_maintainer, invalidate_cache
+from app.modules.scraping.prewarm import cache_prewarmer
+from app.utils import normalize_url
 
 @admin_bp.route('/users', methods=['POST'])
 @admin_required() # <-- SÓ ADMIN PODE ACESSAR
@@ -89,10 +93,132 @@ def clear_scrape_cache():
         # Apaga todas as linhas da tabela ScrapedData
         num_rows_deleted = db.session.query(ScrapedData).delete()
         db.session.commit()
+        # Limpa também o nível em memória deste processo (nos outros workers
+        # expira em até SCRAPE_MEMORY_CACHE_TTL_SECONDS)
+        scrape_cache.invalidate_memory()
         return jsonify({
             "message": f"Cache de scrape limpo com sucesso! {num_rows_deleted} registos apagados."
         }), 200
     except exc.SQLAlchemyError as e:
         db.session.rollback()
         print(f"Erro ao limpar cache: {e}")
-        return jsonify({"error": f"Erro interno ao tentar limpar o cache: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Erro interno ao tentar limpar o cache: {e}"}), 500
+
+@admin_bp.route('/cache/invalidate', methods=['POST'])
+@admin_required()
+def invalidate_scrape_cache():
+    """
+    (ADMIN) Invalidação dirigida do cache, por 'url' exata, 'domain'
+    (inclui subdomínios) ou 'prefix'. Por padrão os registos são só
+    expirados (o próximo scrape refaz tudo, sem refresh incremental);
+    com "hard": true são apagados.
+    """
+    data = request.get_json() or {}
+    criteria = {key: data.get(key) for key in ('url', 'domain', 'prefix') if data.get(key)}
+    if len(criteria) != 1:
+        return jsonify({"error": "Indique exatamente um de 'url', 'domain' ou 'prefix'"}), 400
+    if 'url' in criteria:
+        # Mesma normalização do scrape (é assim que a URL está gravada)
+        criteria['url'], _ = normalize_url(criteria['url'])
+
+    try:
+        num_rows = invalidate_cache(hard=bool(data.get('hard', False)), **criteria)
+        return jsonify({
+            "message": f"Cache invalidado: {num_rows} registos afetados.",
+            "criterio": criteria,
+            "registos": num_rows
+        }), 200
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Erro ao invalidar cache: {e}")
+        return jsonify({"error": f"Erro interno ao tentar invalidar o cache: {e}"}), 500
+
+@admin_bp.route('/cache/maintenance', methods=['POST'])
+@admin_required()
+def run_cache_maintenance():
+    """ (ADMIN) Executa já um ciclo de manutenção do cache (purga + orçamento). """
+    return jsonify(cache_maintainer.run_once()), 200
+
+@admin_bp.route('/tracked-accounts', methods=['GET'])
+@admin_required()
+def get_tracked_accounts():
+    """ (ADMIN) Lista as contas acompanhadas, com o estado do cache de cada uma """
+    rows = db.session.query(
+        TrackedAccount, ScrapedData.scraped_at, ScrapedData.hit_count, ScrapedData.last_accessed_at
+    ).outerjoin(ScrapedData, ScrapedData.url == TrackedAccount.url).order_by(TrackedAccount.id).all()
+
+    accounts = []
+    for account, scraped_at, hit_count, last_accessed_at in rows:
+        account_dict = account.to_dict()
+        account_dict.update(scraped_at=scraped_at, hit_count=hit_count or 0, last_accessed_at=last_accessed_at)
+        accounts.append(account_dict)
+    return jsonify(accounts), 200
+
+@admin_bp.route('/tracked-accounts', methods=['POST'])
+@admin_required()
+def add_tracked_accounts():
+    """
+    (ADMIN) Adiciona contas ao pré-aquecimento do cache: {"urls": [...]}
+    (ou {"url": "..."}). As que já existem são reativadas.
+    """
+    data = request.get_json() or {}
+    urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+    if not isinstance(urls, list) or not urls:
+        return jsonify({"error": "Indique 'url' ou uma lista 'urls'"}), 400
+
+    # Mesma normalização do scrape (é a chave do cache)
+    normalized = []
+    for url in urls:
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            return jsonify({"error": f"URL inválida: {url}"}), 400
+        normalized_url, _ = normalize_url(url)
+        if normalized_url not in normalized:
+            normalized.append(normalized_url)
+
+    try:
+        existing = {
+            account.url: account
+            for account in TrackedAccount.query.filter(TrackedAccount.url.in_(normalized)).all()
+        }
+        created = 0
+        for url in normalized:
+            if url in existing:
+                existing[url].active = True
+            else:
+                db.session.add(TrackedAccount(url=url))
+                created += 1
+        db.session.commit()
+        return jsonify({
+            "message": f"{created} contas adicionadas, {len(normalized) - created} já existiam.",
+            "adicionadas": created,
+            "urls": normalized
+        }), 201
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Erro ao adicionar contas acompanhadas: {e}")
+        return jsonify({"error": f"Erro interno ao adicionar as contas: {e}"}), 500
+
+@admin_bp.route('/tracked-accounts/<int:account_id>', methods=['DELETE'])
+@admin_required()
+def delete_tracked_account(account_id):
+    """ (ADMIN) Remove uma conta do pré-aquecimento (o cache dela fica como está) """
+    account = TrackedAccount.query.get(account_id)
+    if not account:
+        return jsonify({"error": "Conta não encontrada"}), 404
+
+    try:
+        db.session.delete(account)
+        db.session.commit()
+        return jsonify({"message": f"Conta {account.url} removida"}), 200
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Erro ao remover conta acompanhada: {e}")
+        return jsonify({"error": f"Erro interno ao remover a conta: {e}"}), 500
+
+@admin_bp.route('/cache/prewarm', methods=['POST'])
+@admin_required()
+def run_cache_prewarm():
+    """ (ADMIN) Pede já um ciclo de pré-aquecimento (mesmo fora da janela), em background. """
+    if not cache_prewarmer.trigger():
+        return jsonify({"error": "O pré-aquecimento está desligado (SCRAPE_PREWARM_INTERVAL = 0)"}), 409
+    return jsonify({"message": "Pré-aquecimento iniciado em background."}), 202
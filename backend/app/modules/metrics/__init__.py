@@ -0,0 +1,10 @@
+from flask import Blueprint
+
+# Endpoint do Prometheus fica na raiz (/metrics), fora do prefixo da API
+metrics_bp = Blueprint(
+    'metrics',
+    __name__
+)
+
+# Importa as rotas (que irão usar este 'metrics_bp')
+from . import routes
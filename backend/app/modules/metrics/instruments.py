@@ -0,0 +1,153 @@
+import functools
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+
+# Buckets (segundos) do milissegundo (lookup em memória) ao minuto (pipeline completo)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_DURATION = Histogram(
+    "scraper_stage_duration_seconds",
+    "Duração de cada etapa do scrape.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DURATION = Histogram(
+    "scraper_request_duration_seconds",
+    "Duração total do get_scraped_data_service, por desfecho.",
+    ["result"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "scraper_cache_requests_total",
+    "Consultas ao cache de scrapes por nível (memory/db) e resultado (hit/stale/miss).",
+    ["tier", "result"],
+)
+CACHE_PREWARMS = Counter(
+    "scraper_cache_prewarms_total",
+    "Pré-aquecimentos do cache das contas acompanhadas, por desfecho (ok/error).",
+    ["outcome"],
+)
+AI_CACHE_REQUESTS = Counter(
+    "scraper_ai_cache_requests_total",
+    "Consultas ao cache de análises do Gemini (hit/miss).",
+    ["result"],
+)
+AI_CALLS = Counter(
+    "scraper_ai_calls_total",
+    "Tentativas de chamada ao Gemini por desfecho "
+    "(success/error/timeout/retry/circuit_open/throttled).",
+    ["outcome"],
+)
+AI_CIRCUIT_STATE = Gauge(
+    "scraper_ai_circuit_state",
+    "Estado do circuit breaker do Gemini (0 = fechado, 1 = meio-aberto, 2 = aberto).",
+)
+LIMITS_HIT = Counter(
+    "scraper_limits_hit_total",
+    "Páginas que atingiram um teto de memória (html_bytes/elementos/texto/links).",
+    ["limit"],
+)
+PAGE_FETCHES = Counter(
+    "scraper_page_fetches_total",
+    "Páginas buscadas, por caminho (http/selenium).",
+    ["via"],
+)
+ERRORS = Counter(
+    "scraper_errors_total",
+    "Erros por etapa do scrape.",
+    ["stage"],
+)
+# Atualizado a cada mudança do pool (não com set_function, que o modo
+# multiprocess não suporta); com PROMETHEUS_MULTIPROC_DIR soma os workers vivos
+DRIVER_POOL = Gauge(
+    "scraper_driver_pool_drivers",
+    "Drivers do Chrome no pool, por estado (size = capacidade).",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+logger = logging.getLogger("scraper")
+
+
+class JsonFormatter(logging.Formatter):
+    """ Uma linha JSON por evento (fácil de indexar no agregador de logs). """
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        else:
+            payload["message"] = record.getMessage()
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def init_app(app):
+    """ Configura o logger estruturado ('scraper') conforme o config. """
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.disabled = not app.config.get("STRUCTURED_LOGS", True)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+
+
+def log_event(event, **fields):
+    """ Emite um evento estruturado: {"event": ..., **fields}. """
+    if logger.disabled:
+        return
+    logger.info(event, extra={"fields": dict(event=event, **fields)})
+
+
+@contextmanager
+def timed_stage(stage, **fields):
+    """
+    Mede uma etapa: observa o histograma 'scraper_stage_duration_seconds',
+    conta o erro (se houver) e emite um log estruturado com a duração.
+    Uso:
+        with timed_stage("home_load", url=url):
+            ...
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.labels(stage=stage).observe(duration)
+        log_event("stage", stage=stage, status=status, duration_ms=round(duration * 1000, 2), **fields)
+
+
+def timed(stage):
+    """ Decorator: mede a função inteira como a etapa 'stage'. """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed_stage(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_driver_pool(pool):
+    """ Liga o gauge do pool ao DriverPool: atualizado a cada checkout, checkin, criação ou descarte. """
+    def _update(stats):
+        for state in ("size", "total", "idle", "in_use"):
+            DRIVER_POOL.labels(state=state).set(stats[state])
+    pool.add_listener(_update)
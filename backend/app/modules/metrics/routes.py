@@ -0,0 +1,33 @@
+import os
+import hmac
+
+from flask import Response, current_app, request, jsonify
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from . import metrics_bp
+
+
+def _registry():
+    """
+    Com vários workers (gunicorn), cada processo tem os seus contadores: no
+    modo multiprocess do prometheus_client (PROMETHEUS_MULTIPROC_DIR) os
+    valores de todos os processos são agregados aqui.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+# /metrics (formato de texto do Prometheus)
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Token opcional: se METRICS_TOKEN estiver definido, exige "Authorization: Bearer <token>"
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            return jsonify({"error": "Não autorizado"}), 401
+
+    return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
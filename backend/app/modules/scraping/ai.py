@@ -0,0 +1,347 @@
+import os
+import json
+import hashlib
+import threading
+import time
+
+import requests
+from google.api_core import exceptions as google_exceptions
+
+# --- Importar o "Cérebro" (Google AI) ---\
+import google.generativeai as genai
+
+from app.utils import TTLCache
+from app.modules.metrics.instruments import AI_CACHE_REQUESTS, AI_CALLS, AI_CIRCUIT_STATE, timed_stage
+from .resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+
+
+# --- (PROMPT ATUALIZADO V8.5) ---
+# Este prompt é mais simples e focado no "propósito geral", como pedido.
+PROMPT_GERAL_V8_5 = """
+Contexto: Você é um assistente de análise de conteúdo. Sua tarefa é ler o texto de um site e resumi-lo de forma objetiva.
+Retorne APENAS um objeto JSON válido.
+
+O seu JSON de saída DEVE conter EXATAMENTE as seguintes chaves:
+{
+  "general_summary": "Um resumo geral (2-3 frases) sobre o que é esta página e qual seu propósito principal.",
+  "main_subject": "Qual é o assunto principal ou o produto/serviço central oferecido?",
+  "target_audience": "Para quem este site se destina? (ex: 'Desenvolvedores', 'Empresas de Varejo', 'Consumidores Finais')."
+}
+"""
+PROMPT_VERSION = "V8_5"
+
+# (V10.4) Etapa "map" dos sites grandes: cada parte do texto é resumida
+# separadamente e os resumos vão para a análise final (PROMPT_GERAL_V8_5).
+PROMPT_RESUMO_PARCIAL = """
+Contexto: Você vai receber UMA PARTE do texto de um site (não o site inteiro).
+Resuma em português, em no máximo {max_palavras} palavras, apenas o que esta parte diz sobre a empresa:
+o que ela faz, produtos/serviços, segmentos e clientes atendidos, diferenciais e público-alvo.
+Ignore menus, avisos legais e textos repetidos. Responda apenas com o resumo, em texto corrido.
+"""
+PROMPT_RESUMO_VERSION = "RESUMO_V1"
+
+# (V10.5) 2ª passagem do pipeline concorrente: a análise preliminar (só a home)
+# é refinada com o texto das sub-páginas, sem reenviar o texto da home.
+PROMPT_REFINAMENTO = """
+Contexto: Você já fez uma análise preliminar de um site usando apenas o texto da página principal (JSON abaixo).
+Agora recebe o texto de outras páginas do mesmo site (ex: Sobre, Serviços, Contato).
+Atualize a análise com o que essas páginas acrescentam ou corrigem; mantenha o que continua válido.
+Retorne APENAS um objeto JSON válido, com EXATAMENTE as mesmas chaves da análise preliminar:
+"general_summary", "main_subject" e "target_audience".
+"""
+PROMPT_REFINAMENTO_VERSION = "REFINAMENTO_V1"
+
+GEMINI_MODEL_NAME = 'models/gemini-pro-latest'
+
+# Falhas passageiras do serviço (vale a pena repetir): 5xx, 429, timeouts e rede
+RETRYABLE_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+TIMEOUT_ERRORS = (google_exceptions.DeadlineExceeded, requests.exceptions.Timeout, TimeoutError)
+
+_CIRCUIT_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+class AIUnavailable(Exception):
+    """O Gemini não respondeu a tempo (prazo, fila cheia ou tentativas esgotadas)."""
+
+
+def _normalize_text(text):
+    """ Normaliza o texto (espaços) para que re-scrapes idênticos gerem o mesmo hash. """
+    return ' '.join(text.split())
+
+
+def content_hash(text, prompt_version=PROMPT_VERSION):
+    """ Chave do cache: hash do texto normalizado + versão do prompt. """
+    digest = hashlib.sha256()
+    digest.update(prompt_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(_normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class GeminiClient:
+    """
+    (V9.7) Cliente do Gemini partilhado pelo processo.
+    - 'genai.configure' e o 'GenerativeModel' são criados UMA vez e reutilizados;
+    - as análises ficam em cache (TTL + limite de entradas) pela chave
+      hash(texto normalizado + versão do prompt), então um re-scrape com o
+      mesmo conteúdo não volta a chamar a API.
+
+    (V10.6) Resiliência (ver _call_model):
+    - timeout por tentativa (AI_REQUEST_TIMEOUT) e prazo total por chamada
+      (AI_CALL_DEADLINE, ou o prazo do pipeline, o que acabar primeiro);
+    - repetições limitadas (AI_MAX_RETRIES) com backoff exponencial + jitter,
+      só para falhas passageiras (5xx, 429, timeouts, rede);
+    - circuit breaker: com o Gemini em baixo, a etapa de AI é saltada na hora;
+    - no máximo AI_MAX_CONCURRENCY chamadas em curso por processo;
+    - GEMINI_API_ENDPOINT aponta o cliente para outro servidor (ex: o
+      tools/fake_gemini.py nos testes locais).
+    """
+
+    def __init__(self, app=None):
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.cache = TTLCache(maxsize=1000, ttl=7 * 24 * 3600)
+
+        self.api_endpoint = None
+        self.request_timeout = 20
+        self.call_deadline = 45
+        self.max_retries = 2
+        self.retry_base_delay = 0.5
+        self.retry_max_delay = 4
+        self.queue_timeout = 10
+        self._semaphore = threading.BoundedSemaphore(8)
+        self.breaker = CircuitBreaker(on_state_change=self._on_circuit_change)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = TTLCache(
+            maxsize=app.config.get("AI_CACHE_MAX_ENTRIES", self.cache.maxsize),
+            ttl=app.config.get("AI_CACHE_TTL_SECONDS", self.cache.ttl),
+        )
+        self.api_endpoint = app.config.get("GEMINI_API_ENDPOINT") or None
+        self.request_timeout = app.config.get("AI_REQUEST_TIMEOUT", self.request_timeout)
+        self.call_deadline = app.config.get("AI_CALL_DEADLINE", self.call_deadline)
+        self.max_retries = app.config.get("AI_MAX_RETRIES", self.max_retries)
+        self.retry_base_delay = app.config.get("AI_RETRY_BASE_DELAY", self.retry_base_delay)
+        self.retry_max_delay = app.config.get("AI_RETRY_MAX_DELAY", self.retry_max_delay)
+        self.queue_timeout = app.config.get("AI_QUEUE_TIMEOUT", self.queue_timeout)
+        self._semaphore = threading.BoundedSemaphore(max(1, app.config.get("AI_MAX_CONCURRENCY", 8)))
+        self.breaker = CircuitBreaker(
+            failure_threshold=app.config.get("AI_CIRCUIT_FAILURE_THRESHOLD", self.breaker.failure_threshold),
+            reset_seconds=app.config.get("AI_CIRCUIT_RESET_SECONDS", self.breaker.reset_seconds),
+            on_state_change=self._on_circuit_change,
+        )
+        self._model = None  # Reconfigura (endpoint novo) na próxima chamada
+
+    @staticmethod
+    def _on_circuit_change(state):
+        AI_CIRCUIT_STATE.set(_CIRCUIT_STATE_VALUES[state])
+
+    def _get_model(self):
+        """ Configura a API e cria o modelo na primeira chamada; depois reutiliza. """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+                    if not GOOGLE_API_KEY:
+                        return None
+                    if self.api_endpoint:
+                        # Servidor alternativo (ex: fake local): só o transporte REST aceita http://
+                        genai.configure(
+                            api_key=GOOGLE_API_KEY,
+                            transport="rest",
+                            client_options={"api_endpoint": self.api_endpoint},
+                        )
+                    else:
+                        genai.configure(api_key=GOOGLE_API_KEY)
+                    # --- Usando o modelo que a sua chave suporta ---
+                    self._model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        return self._model
+
+    def _call_model(self, model, prompt, generation_config, deadline=None):
+        """
+        (V10.6) Uma chamada ao Gemini, com as proteções do cliente.
+        'deadline' (time.monotonic) opcional: prazo de quem chama (ex: pipeline).
+        Retorna o texto da resposta. Levanta CircuitOpenError, AIUnavailable ou
+        o erro do pedido (ex: InvalidArgument), sem repetir.
+        """
+        deadline = min(deadline or float("inf"), time.monotonic() + self.call_deadline)
+        attempt = 0
+        while True:
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                AI_CALLS.labels(outcome="circuit_open").inc()
+                raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.breaker.release_probe()
+                AI_CALLS.labels(outcome="timeout").inc()
+                raise AIUnavailable("Prazo esgotado antes de chamar o Gemini.")
+            if not self._semaphore.acquire(timeout=min(remaining, self.queue_timeout)):
+                self.breaker.release_probe()
+                AI_CALLS.labels(outcome="throttled").inc()
+                raise AIUnavailable("Sem vaga para chamar o Gemini dentro do prazo.")
+
+            try:
+                timeout = max(0.1, min(self.request_timeout, deadline - time.monotonic()))
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    # Sem o retry interno da biblioteca (até 600s): as repetições são nossas
+                    request_options={"timeout": timeout, "retry": None},
+                )
+                self.breaker.record_success()
+                AI_CALLS.labels(outcome="success").inc()
+                return response.text
+
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                AI_CALLS.labels(outcome="timeout" if isinstance(e, TIMEOUT_ERRORS) else "error").inc()
+                attempt += 1
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                if attempt > self.max_retries or time.monotonic() + delay >= deadline:
+                    raise AIUnavailable(f"Gemini indisponível após {attempt} tentativa(s): {e}") from e
+                AI_CALLS.labels(outcome="retry").inc()
+                print(f"AVISO: Falha passageira no Gemini ({e}). Nova tentativa em {delay:.1f}s.")
+
+            except google_exceptions.GoogleAPICallError:
+                # Erro do pedido (4xx): o serviço respondeu; repetir não adianta
+                self.breaker.release_probe()
+                AI_CALLS.labels(outcome="error").inc()
+                raise
+
+            except Exception:
+                # Erro inesperado (transporte, biblioteca): conta como falha do serviço
+                self.breaker.record_failure()
+                AI_CALLS.labels(outcome="error").inc()
+                raise
+
+            finally:
+                self._semaphore.release()
+
+            time.sleep(delay)
+
+    def summarize(self, text_chunk, max_words=200, deadline=None):
+        """
+        (V10.4) Resume UMA parte do texto de um site (etapa "map" do map-reduce).
+        Também usa o cache por hash do conteúdo. "Safe-fail": retorna '' se falhar.
+        """
+        cache_key = content_hash(text_chunk, prompt_version=f"{PROMPT_RESUMO_VERSION}:{max_words}")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            AI_CACHE_REQUESTS.labels(result="hit").inc()
+            return cached
+        AI_CACHE_REQUESTS.labels(result="miss").inc()
+
+        try:
+            model = self._get_model()
+            if model is None:
+                return ''
+
+            generation_config = genai.types.GenerationConfig(
+                candidate_count=1,
+                temperature=0.2,
+            )
+            prompt_combinado = (
+                f"{PROMPT_RESUMO_PARCIAL.format(max_palavras=max_words)}\n\nParte do texto do site:\n{text_chunk}"
+            )
+            with timed_stage("gemini_summary"):
+                summary = (self._call_model(model, prompt_combinado, generation_config, deadline) or '').strip()
+
+        except Exception as e:
+            print(f"AVISO: Falha ao resumir uma parte do texto no Gemini: {e}")
+            return ''
+
+        if summary:
+            self.cache.set(cache_key, summary)
+        return summary
+
+    # --- (FUNÇÃO ATUALIZADA V8.5) ---
+    def analyze(self, full_text_content, deadline=None):
+        """
+        (V8.5) Tenta analisar o texto com o Gemini.
+        Usa o 'models/gemini-pro-latest' e o novo prompt V8.5 (foco geral).
+        É "safe-fail" - se falhar, retorna {} e não quebra o request (Erro 500).
+        """
+        print("Iniciando chamada à API do Gemini (V8.5) para análise geral...")
+        return self._generate_json(
+            f"{PROMPT_GERAL_V8_5}\n\nTexto do Site:\n{full_text_content}",
+            content_hash(full_text_content),
+            deadline,
+        )
+
+    def refine(self, previous_analysis, extra_text_content, deadline=None):
+        """
+        (V10.5) Refina uma análise anterior (ex: só da home) com texto novo
+        (as sub-páginas). Mesmo formato de saída e mesmo "safe-fail" do analyze.
+        """
+        previous_json = json.dumps(previous_analysis, ensure_ascii=False, sort_keys=True)
+        print("Iniciando chamada à API do Gemini para refinar a análise com as sub-páginas...")
+        return self._generate_json(
+            f"{PROMPT_REFINAMENTO}\n\nAnálise preliminar:\n{previous_json}\n\nTexto das outras páginas:\n{extra_text_content}",
+            content_hash(f"{previous_json}\n{extra_text_content}", prompt_version=PROMPT_REFINAMENTO_VERSION),
+            deadline,
+        )
+
+    def _generate_json(self, prompt_combinado, cache_key, deadline=None):
+        """ Chamada ao Gemini com resposta JSON, em cache pela 'cache_key'. """
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            AI_CACHE_REQUESTS.labels(result="hit").inc()
+            print("AI CACHE HIT: Conteúdo idêntico já analisado. Reutilizando a análise do Gemini.")
+            return dict(cached)
+        AI_CACHE_REQUESTS.labels(result="miss").inc()
+
+        try:
+            # 1. Pega o modelo (só configura a API na primeira vez)
+            model = self._get_model()
+            if model is None:
+                print("AVISO: Análise de AI ignorada (GOOGLE_API_KEY não encontrada no .env).")
+                return {} # Retorna um JSON vazio
+
+            # 2. Define as regras de geração
+            generation_config = genai.types.GenerationConfig(
+                candidate_count=1,
+                temperature=0.3,
+                response_mime_type="application/json",
+            )
+
+            # 3. Faz a chamada à API (e 4. extrai o JSON da resposta)
+            with timed_stage("gemini"):
+                ai_json = json.loads(self._call_model(model, prompt_combinado, generation_config, deadline))
+            print("Sucesso: Análise de IA do Gemini recebida.")
+
+        except (CircuitOpenError, AIUnavailable) as e:
+            # Gemini em baixo ou lento: resultado parcial rápido (sem AI)
+            print(f"AVISO: Análise de IA saltada: {e}")
+            return {}
+
+        except Exception as e:
+            # Captura QUALQUER erro (Chave Inválida, API offline, Modelo não encontrado)
+            print(f"!!! ERRO CRÍTICO AO CHAMAR O GEMINI AI !!!: {e}")
+            print("A análise de IA será retornada vazia.")
+            # Retorna um JSON vazio para não quebrar o frontend (falhas não vão para o cache)
+            return {}
+
+        if isinstance(ai_json, dict):
+            self.cache.set(cache_key, dict(ai_json))
+        return ai_json
+
+
+gemini_client = GeminiClient()
@@ -0,0 +1,130 @@
+import time
+
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+# Padrões de URL (Network.setBlockedURLs aceita '*' como curinga) por tipo de recurso.
+# Só lemos o DOM (texto, links, meta, <script src>), por isso nada disto faz falta.
+RESOURCE_TYPE_PATTERNS = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a", "*.m3u8", "*.mov"],
+    "stylesheet": ["*.css"],
+}
+
+# Beacons de analytics/publicidade: só enviam dados, não alteram o DOM.
+# (Os <script src> de GTM, Pixel, etc. continuam no HTML para a deteção de tecnologias.)
+TRACKER_PATTERNS = [
+    "*google-analytics.com/collect*",
+    "*google-analytics.com/g/collect*",
+    "*analytics.google.com/g/collect*",
+    "*doubleclick.net/*",
+    "*googlesyndication.com/*",
+    "*facebook.com/tr*",
+    "*bat.bing.com/action*",
+    "*px.ads.linkedin.com/*",
+]
+
+# Tamanho do texto visível (barato: não serializa o texto inteiro para o Python)
+_TEXT_LENGTH_SCRIPT = "return document.body ? document.body.innerText.length : -1"
+
+
+def _split_setting(value):
+    """ Aceita lista ou string separada por vírgulas (vinda do .env). """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [item.strip() for item in value if item and item.strip()]
+
+
+class SeleniumSettings:
+    """
+    (V9.11) Opções do Chrome usadas pela fábrica de drivers do pool:
+
+    - estratégia de carregamento ('eager': o driver.get volta no
+      DOMContentLoaded, sem esperar imagens, iframes e afins);
+    - bloqueio de pedidos via DevTools (Network.setBlockedURLs) por tipo de
+      recurso e por padrões de URL (ex: beacons de trackers);
+    - imagens desligadas também pelas preferências do Chrome.
+    """
+
+    def __init__(self, app=None):
+        self.page_load_strategy = "eager"
+        self.page_load_timeout = 20
+        self.blocked_resource_types = ["image", "font", "media"]
+        self.blocked_url_patterns = list(TRACKER_PATTERNS)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.page_load_strategy = app.config.get("SCRAPER_PAGE_LOAD_STRATEGY", self.page_load_strategy)
+        self.page_load_timeout = app.config.get("SCRAPER_PAGE_LOAD_TIMEOUT", self.page_load_timeout)
+        self.blocked_resource_types = _split_setting(
+            app.config.get("SCRAPER_BLOCK_RESOURCE_TYPES", self.blocked_resource_types)
+        )
+        patterns = _split_setting(app.config.get("SCRAPER_BLOCK_URL_PATTERNS"))
+        if app.config.get("SCRAPER_BLOCK_TRACKERS", True):
+            patterns = TRACKER_PATTERNS + patterns
+        self.blocked_url_patterns = patterns
+
+    def blocked_patterns(self):
+        """ Lista final de padrões passada ao Network.setBlockedURLs. """
+        patterns = []
+        for resource_type in self.blocked_resource_types:
+            patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+        patterns.extend(self.blocked_url_patterns)
+        return patterns
+
+    def apply_to_options(self, options):
+        """ Estratégia de carregamento + preferências do Chrome. """
+        options.page_load_strategy = self.page_load_strategy
+        if "image" in self.blocked_resource_types:
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+            })
+
+    def apply_to_driver(self, driver):
+        """ Ativa o bloqueio de pedidos na sessão (persiste entre navegações). """
+        driver.set_page_load_timeout(self.page_load_timeout)
+
+        patterns = self.blocked_patterns()
+        if not patterns:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except WebDriverException as e:
+            # Não é fatal: o driver funciona, só sem o bloqueio
+            print(f"AVISO: Bloqueio de recursos via DevTools indisponível: {e}")
+
+
+def wait_until_ready(driver, timeout=10, poll_interval=0.3):
+    """
+    Espera a página ficar "pronta para leitura", melhor que só esperar o <body>:
+    1. document.readyState 'interactive' ou 'complete' (DOM construído);
+    2. o tamanho do texto visível estabiliza entre duas amostras seguidas
+       (o JavaScript de SPAs terminou de montar o conteúdo).
+    Não levanta exceção no timeout: lê-se o que houver.
+    """
+    deadline = time.monotonic() + timeout
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script("return document.readyState") in ("interactive", "complete")
+        )
+    except TimeoutException:
+        print("AVISO: DOM não ficou pronto dentro do tempo. Lendo o que houver.")
+        return False
+
+    previous = None
+    while time.monotonic() < deadline:
+        current = driver.execute_script(_TEXT_LENGTH_SCRIPT)
+        if current > 0 and current == previous:
+            return True
+        previous = current
+        time.sleep(poll_interval)
+
+    return False
@@ -0,0 +1,218 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import undefer
+
+from app.utils import TTLCache
+from app.modules.metrics.instruments import CACHE_REQUESTS, timed
+
+
+def _age_seconds(scraped_at):
+    """ Idade (segundos) de um registo; aceita datetimes com ou sem timezone. """
+    if scraped_at.tzinfo is not None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    else:
+        now = datetime.datetime.utcnow()
+    return (now - scraped_at).total_seconds()
+
+
+class ScrapeCache:
+    """
+    (V9.9) Cache de scrapes em dois níveis, com stale-while-revalidate.
+
+    Nível 1: LRU/TTL em memória (por processo) - hits em microssegundos.
+    Nível 2: tabela ScrapedData (Postgres).
+    (V10.10) O nível 1 só guarda cada registo por SCRAPE_MEMORY_CACHE_TTL_SECONDS:
+    as invalidações (invalidate_memory) só limpam o processo que as faz, e os
+    outros workers voltam a ler o Postgres - e veem a invalidação - no fim desse prazo.
+
+    Um registo com idade < TTL está "fresco". Entre TTL e TTL + janela de
+    'stale' é servido na hora, e um refresh corre em background.
+    Acima disso é um miss normal.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 24 * 3600
+        self.stale_window = 7 * 24 * 3600
+        self.memory_ttl = 60
+        self.memory = TTLCache(maxsize=500, ttl=self.memory_ttl)
+        self.app = None
+        self._refresh_executor = None
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        # Últimos acessos (url -> (datetime, hits)) ainda não gravados no DB
+        self._accesses = {}
+        self.max_pending_accesses = 10000
+        self._accesses_lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get("SCRAPE_CACHE_TTL_SECONDS", self.ttl)
+        self.stale_window = app.config.get("SCRAPE_CACHE_STALE_SECONDS", self.stale_window)
+        self.memory_ttl = app.config.get("SCRAPE_MEMORY_CACHE_TTL_SECONDS", self.memory_ttl)
+        self.max_pending_accesses = app.config.get("SCRAPE_ACCESS_LOG_MAX_ENTRIES", self.max_pending_accesses)
+        self.memory = TTLCache(
+            maxsize=app.config.get("SCRAPE_MEMORY_CACHE_MAX_ENTRIES", self.memory.maxsize),
+            ttl=self.memory_ttl,
+        )
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=app.config.get("SCRAPE_CACHE_REFRESH_WORKERS", 2),
+            thread_name_prefix="cache-refresh"
+        )
+
+    def cutoff(self, include_stale=False):
+        """ Data a partir da qual um registo do DB ainda pode ser usado. """
+        max_age = self.ttl + (self.stale_window if include_stale else 0)
+        return datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age)
+
+    # --------------------------------------------------------------------------
+    # Leitura / escrita
+    # --------------------------------------------------------------------------
+
+    def lookup(self, url, allow_stale=True):
+        """
+        Procura na memória e depois no DB.
+        Retorna (dados, stale) - ou (None, False) num miss.
+        Pode levantar SQLAlchemyError (o chamador decide como tratar).
+        """
+        from app.models import ScrapedData
+
+        entry = self.memory.get(url)
+        if entry is not None:
+            data, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                CACHE_REQUESTS.labels(tier="memory", result="hit").inc()
+                self.record_access(url)
+                return data, False
+            if allow_stale:
+                CACHE_REQUESTS.labels(tier="memory", result="stale").inc()
+                self.record_access(url)
+                return data, True
+
+        # Uma só query: o 'page_meta' (só usado no refresh) fica de fora
+        row = ScrapedData.query.options(undefer(ScrapedData.subpages_blob)).filter(
+            ScrapedData.url == url,
+            ScrapedData.scraped_at > self.cutoff(include_stale=allow_stale)
+        ).first()
+        if row is None:
+            CACHE_REQUESTS.labels(tier="db", result="miss").inc()
+            return None, False
+
+        data = row.to_result()
+        self.record_access(url)
+        age = _age_seconds(row.scraped_at)
+        self.store_memory(url, data, age=age)
+        CACHE_REQUESTS.labels(tier="db", result="stale" if age >= self.ttl else "hit").inc()
+        return data, age >= self.ttl
+
+    @timed("db_write")
+    def save(self, url, result_json_data, page_meta=None):
+        """
+        Grava o resultado com UM único 'INSERT ... ON CONFLICT (url) DO UPDATE'
+        (atômico: sem a corrida do select-then-insert entre escritores) e
+        atualiza o nível de memória. Pode levantar SQLAlchemyError.
+        """
+        from app.extensions import db
+        from app.models import ScrapedData
+
+        data, subpages_blob = ScrapedData.pack_result(result_json_data)
+        values = {
+            "url": url,
+            "data": data,
+            "subpages_blob": subpages_blob,
+            "page_meta": page_meta,
+            "scraped_at": datetime.datetime.utcnow(),
+        }
+        statement = insert(ScrapedData).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ScrapedData.url],
+            set_={key: statement.excluded[key] for key in values if key != "url"},
+        )
+        db.session.execute(statement)
+        db.session.commit()
+        print(f"CACHE SET: Dados salvos (upsert) no Postgres para {url}")
+
+        self.store_memory(url, result_json_data)
+
+    def store_memory(self, url, data, age=0):
+        """
+        Guarda no nível de memória por no máximo 'memory_ttl' segundos (nunca
+        depois do fim da janela de 'stale'). A idade real fica guardada: a
+        frescura é decidida pela data do scrape, não pela da cópia em memória.
+        """
+        remaining = min(self.memory_ttl, self.ttl + self.stale_window - age)
+        if remaining > 0:
+            self.memory.set(url, (data, time.time() - age), ttl=remaining)
+
+    def invalidate_memory(self, url=None, predicate=None):
+        """
+        Remove do nível de memória (uma URL, as URLs que satisfazem
+        'predicate', ou tudo). Só afeta este processo; nos outros a cópia
+        expira em até SCRAPE_MEMORY_CACHE_TTL_SECONDS.
+        """
+        if predicate is not None:
+            self.memory.delete_where(predicate)
+        elif url is None:
+            self.memory.clear()
+        else:
+            self.memory.delete(url)
+
+    # --------------------------------------------------------------------------
+    # Registo de acessos (despejo LRU e prioridade do pré-aquecimento)
+    # --------------------------------------------------------------------------
+
+    def record_access(self, url):
+        """
+        Marca um hit; é gravado no DB em lote (CacheMaintainer e CachePrewarmer).
+        Se nada gravar os acessos (as duas threads desligadas), o dict fica
+        limitado a 'max_pending_accesses' URLs: sai o inserido há mais tempo.
+        """
+        with self._accesses_lock:
+            pending = self._accesses.get(url)
+            if pending is None:
+                if len(self._accesses) >= self.max_pending_accesses > 0:
+                    del self._accesses[next(iter(self._accesses))]
+                pending = (None, 0)
+            self._accesses[url] = (datetime.datetime.utcnow(), pending[1] + 1)
+
+    def drain_accesses(self):
+        """ Retorna e limpa os acessos pendentes ({url: (último acesso, nº de hits)}). """
+        with self._accesses_lock:
+            accesses, self._accesses = self._accesses, {}
+        return accesses
+
+    # --------------------------------------------------------------------------
+    # Stale-while-revalidate
+    # --------------------------------------------------------------------------
+
+    def schedule_refresh(self, url, refresh_fn):
+        """ Agenda 'refresh_fn()' em background (no máximo um refresh por URL). """
+        if self._refresh_executor is None:
+            return
+        with self._refreshing_lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def _run():
+            try:
+                with self.app.app_context():
+                    refresh_fn()
+            except Exception as e:
+                print(f"AVISO: Refresh em background falhou para {url}: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(url)
+
+        print(f"CACHE STALE: Agendando refresh em background para {url}")
+        self._refresh_executor.submit(_run)
+
+
+scrape_cache = ScrapeCache()
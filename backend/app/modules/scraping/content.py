@@ -0,0 +1,244 @@
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .ai import gemini_client
+from app.modules.metrics.instruments import log_event, timed_stage
+
+
+CHARS_PER_TOKEN = 4  # Estimativa (texto em português/inglês) - evita carregar um tokenizer
+
+# Blocos sem nenhuma letra/dígito (separadores, ícones, "|", "»") não informam nada
+_HAS_WORD = re.compile(r'\w')
+
+
+def estimate_tokens(text):
+    """ Estimativa barata do número de tokens de um texto. """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _block_key(block):
+    return hashlib.blake2b(' '.join(block.lower().split()).encode('utf-8'), digest_size=12).digest()
+
+
+def dedupe_pages(pages):
+    """
+    Remove os blocos repetidos: um bloco que já apareceu (nesta ou numa página
+    anterior - menus, rodapés, CTAs e banners do template) só fica na primeira
+    ocorrência. 'pages' = [(url, [blocos])]; a home vem primeiro.
+    """
+    seen = set()
+    result = []
+    for url, blocks in pages:
+        unique = []
+        for block in blocks:
+            if not _HAS_WORD.search(block):
+                continue
+            key = _block_key(block)
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(block)
+        result.append((url, unique))
+    return result
+
+
+def fit_to_budget(pages, max_tokens):
+    """
+    Corta os blocos para caberem em 'max_tokens'. Cada página tem direito a
+    uma parte igual do orçamento; o que sobra (páginas curtas) vai para as
+    outras, pela ordem (home primeiro). Um bloco maior que o espaço livre é
+    truncado em vez de descartado.
+    """
+    budget_chars = max_tokens * CHARS_PER_TOKEN
+    if not pages:
+        return pages
+    share = budget_chars // len(pages)
+
+    kept = [[] for _ in pages]
+    used = [0] * len(pages)
+
+    def _take(index, blocks, limit):
+        for position in range(len(kept[index]), len(blocks)):
+            block = blocks[position]
+            free = limit - used[index]
+            if free <= 0:
+                return
+            if len(block) + 1 > free:
+                kept[index].append(block[:free - 1])
+                used[index] += free
+                return
+            kept[index].append(block)
+            used[index] += len(block) + 1  # + o '\n' entre blocos
+
+    # 1ª passagem: parte igual para cada página
+    for index, (_url, blocks) in enumerate(pages):
+        _take(index, blocks, share)
+
+    # 2ª passagem: o orçamento que sobrou, pela ordem das páginas
+    leftover = budget_chars - sum(used)
+    for index, (_url, blocks) in enumerate(pages):
+        if leftover <= 0:
+            break
+        before = used[index]
+        _take(index, blocks, used[index] + leftover)
+        leftover -= used[index] - before
+
+    return [(url, kept[index]) for index, (url, _blocks) in enumerate(pages)]
+
+
+def format_pages(pages, home_first=True):
+    """ Texto enviado à AI: a home (1ª página) sem cabeçalho, cada sub-página com o seu. """
+    parts = []
+    for index, (url, blocks) in enumerate(pages):
+        text = '\n'.join(blocks)
+        if index == 0 and home_first:
+            parts.append(text)
+        else:
+            parts.append(f"\n\n--- CONTEÚDO DA PÁGINA: {url} ---\n{text}")
+    return ''.join(parts)
+
+
+def split_chunks(pages, chunk_tokens, home_first=True):
+    """ Parte o texto (já formatado por página) em pedaços de até 'chunk_tokens'. """
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks, current, size = [], [], 0
+    for index, (url, blocks) in enumerate(pages):
+        header = "" if index == 0 and home_first else f"--- CONTEÚDO DA PÁGINA: {url} ---"
+        for block in ([header] if header else []) + blocks:
+            # Blocos gigantes (texto sem marcação) são partidos à força
+            while len(block) > chunk_chars:
+                if current:
+                    chunks.append('\n'.join(current))
+                    current, size = [], 0
+                chunks.append(block[:chunk_chars])
+                block = block[chunk_chars:]
+            if size + len(block) > chunk_chars and current:
+                chunks.append('\n'.join(current))
+                current, size = [], 0
+            current.append(block)
+            size += len(block) + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+class ContentReducer:
+    """
+    (V10.4) Prepara o texto enviado ao Gemini (o tamanho do prompt manda na
+    latência e no custo):
+    1. usa só os blocos de conteúdo da extração (sem script/style, navegação,
+       rodapé, banners de cookies...);
+    2. remove os blocos repetidos entre páginas;
+    3. respeita um orçamento de tokens (AI_MAX_INPUT_TOKENS). Sites muito
+       grandes (acima de AI_MAP_REDUCE_THRESHOLD_TOKENS) passam por um
+       map-reduce: as partes são resumidas EM PARALELO e a análise final
+       é feita sobre os resumos.
+    """
+
+    def __init__(self, app=None):
+        self.max_input_tokens = 12000
+        self.map_reduce_threshold_tokens = 24000
+        self.chunk_tokens = 6000
+        self.max_chunks = 8
+        self.map_workers = 4
+        self.summary_words = 200
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_input_tokens = app.config.get("AI_MAX_INPUT_TOKENS", self.max_input_tokens)
+        self.map_reduce_threshold_tokens = app.config.get(
+            "AI_MAP_REDUCE_THRESHOLD_TOKENS", self.map_reduce_threshold_tokens
+        )
+        self.chunk_tokens = app.config.get("AI_CHUNK_TOKENS", self.chunk_tokens)
+        self.max_chunks = app.config.get("AI_MAX_CHUNKS", self.max_chunks)
+        self.map_workers = app.config.get("AI_MAP_WORKERS", self.map_workers)
+        self.summary_words = app.config.get("AI_CHUNK_SUMMARY_WORDS", self.summary_words)
+
+    def _map_reduce(self, pages, home_first=True, deadline=None):
+        """
+        Resume as partes em paralelo; retorna o texto com os resumos (ou None).
+        (V10.10) Com 'deadline' (time.monotonic() do pipeline), os resumos só
+        usam metade do tempo que falta (o resto é da análise final). Se o
+        prazo acabar antes de todas as partes, retorna None e quem chama usa
+        o texto cortado ao orçamento.
+        """
+        map_deadline = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print("AVISO: Prazo esgotado antes do map-reduce. Usando o texto cortado.")
+                return None
+            map_deadline = time.monotonic() + remaining / 2
+
+        chunks = split_chunks(pages, self.chunk_tokens, home_first)
+        if len(chunks) > self.max_chunks:
+            print(f"AVISO: {len(chunks)} partes de texto; só as {self.max_chunks} primeiras serão resumidas.")
+            chunks = chunks[:self.max_chunks]
+
+        with timed_stage("ai_map", chunks=len(chunks)):
+            executor = ThreadPoolExecutor(max_workers=max(1, self.map_workers), thread_name_prefix="ai-map")
+            try:
+                futures = [
+                    executor.submit(gemini_client.summarize, chunk, self.summary_words, map_deadline)
+                    for chunk in chunks
+                ]
+                timeout = None if map_deadline is None else max(0.0, map_deadline - time.monotonic())
+                _done, pending = wait(futures, timeout=timeout)
+            finally:
+                # Os resumos atrasados não seguram o pipeline (os que acabarem ficam no cache da AI)
+                executor.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            print(f"AVISO: Prazo esgotado no map-reduce ({len(pending)} de {len(chunks)} parte(s) sem resumo). Usando o texto cortado.")
+            return None
+        summaries = [future.result() for future in futures]
+
+        if not any(summaries):
+            return None
+        return '\n\n'.join(
+            f"--- RESUMO DA PARTE {index} DE {len(chunks)} ---\n{summary}"
+            for index, summary in enumerate(summaries, start=1) if summary
+        )
+
+    def prepare(self, pages, seen_pages=(), deadline=None):
+        """
+        Texto final para a análise. 'pages' = [(url, [blocos])], home primeiro.
+        'seen_pages': páginas já enviadas numa análise anterior - os blocos
+        delas contam como repetidos, mas não entram no texto.
+        'deadline' (time.monotonic(), opcional): prazo do pipeline para o map-reduce.
+        Retorna '' se não sobrar nenhum bloco.
+        """
+        seen_pages = list(seen_pages)
+        pages = dedupe_pages(seen_pages + list(pages))[len(seen_pages):]
+        if not any(blocks for _url, blocks in pages):
+            return ''
+        home_first = not seen_pages
+        text = format_pages(pages, home_first)
+        tokens = estimate_tokens(text)
+
+        if tokens <= self.max_input_tokens:
+            reduced, mode = text, "full"
+        else:
+            reduced = None
+            if self.map_reduce_threshold_tokens and tokens > self.map_reduce_threshold_tokens:
+                reduced = self._map_reduce(pages, home_first, deadline)
+            if reduced is not None:
+                mode = "map_reduce"
+                if estimate_tokens(reduced) > self.max_input_tokens:
+                    reduced = reduced[:self.max_input_tokens * CHARS_PER_TOKEN]
+            else:
+                # Sem map-reduce (ou falhou): corta para caber no orçamento
+                headers_tokens = estimate_tokens(format_pages([(url, []) for url, _blocks in pages], home_first))
+                budget = max(0, self.max_input_tokens - headers_tokens)
+                reduced, mode = format_pages(fit_to_budget(pages, budget), home_first), "truncated"
+
+        reduced_tokens = estimate_tokens(reduced)
+        print(f"Texto para a AI: ~{reduced_tokens} tokens (de ~{tokens}, modo '{mode}').")
+        log_event("ai_input", mode=mode, tokens=reduced_tokens, original_tokens=tokens, pages=len(pages))
+        return reduced
+
+
+content_reducer = ContentReducer()
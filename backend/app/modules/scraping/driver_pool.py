@@ -0,0 +1,270 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException, TimeoutException
+
+from app.modules.metrics.instruments import timed_stage
+
+
+class DriverPoolExhausted(Exception):
+    """Nenhum driver ficou livre dentro do tempo de espera do checkout."""
+
+
+class DriverPool:
+    """
+    (V9.0) Pool de drivers do Chrome (Selenium) pré-iniciados e reutilizáveis.
+
+    Evita pagar o arranque do Chrome (1-3 s) a cada scrape:
+    - checkout/checkin de drivers já abertos;
+    - health check antes de entregar um driver;
+    - reciclagem após N páginas ou acima de um teto de memória (heap JS);
+    - substituição automática de sessões que crasharam.
+
+    Segue o padrão das extensões do Flask: instancia-se sem app e
+    configura-se depois com 'init_app(app)'.
+    """
+
+    def __init__(self, driver_factory, app=None):
+        self._driver_factory = driver_factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._stats = {}  # id(driver) -> {"pages": int, "created_at": float}
+        self._total = 0
+        self._closed = False
+        self._listeners = []  # callback(stats) a cada mudança (ex: métricas)
+
+        # Valores padrão (sobrescritos pelo init_app)
+        self.size = 2
+        self.max_pages = 50
+        self.max_memory_mb = 512
+        self.checkout_timeout = 30
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.size = app.config.get("SCRAPER_POOL_SIZE", self.size)
+        self.max_pages = app.config.get("SCRAPER_POOL_MAX_PAGES", self.max_pages)
+        self.max_memory_mb = app.config.get("SCRAPER_POOL_MAX_MEMORY_MB", self.max_memory_mb)
+        self.checkout_timeout = app.config.get("SCRAPER_POOL_CHECKOUT_TIMEOUT", self.checkout_timeout)
+        self._notify()
+
+        # Pré-aquece o pool em background para não atrasar o arranque da app
+        if app.config.get("SCRAPER_POOL_PREWARM", False):
+            threading.Thread(target=self.prewarm, name="driver-pool-prewarm", daemon=True).start()
+
+    def add_listener(self, callback):
+        """ Regista 'callback(stats)', chamado já e depois de cada mudança do pool. """
+        self._listeners.append(callback)
+        callback(self.stats())
+
+    def _notify(self):
+        if not self._listeners:
+            return
+        stats = self.stats()
+        for callback in self._listeners:
+            try:
+                callback(stats)
+            except Exception as e:
+                print(f"AVISO: Erro ao publicar o estado do pool de drivers: {e}")
+
+    # --------------------------------------------------------------------------
+    # Ciclo de vida dos drivers
+    # --------------------------------------------------------------------------
+
+    def _create_driver(self):
+        with timed_stage("driver_init"):
+            driver = self._driver_factory()
+        with self._lock:
+            self._stats[id(driver)] = {"pages": 0, "created_at": time.monotonic()}
+        return driver
+
+    def _destroy_driver(self, driver):
+        with self._lock:
+            self._stats.pop(id(driver), None)
+            self._total -= 1
+        self._notify()
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"AVISO: Erro ao fechar driver do pool: {e}")
+
+    def _is_healthy(self, driver):
+        """
+        Verifica se a sessão do Chrome ainda responde. Qualquer erro conta
+        como "não responde": com o chromedriver morto o Selenium levanta
+        erros do urllib3 (ex: MaxRetryError), não WebDriverException.
+        """
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycling(self, driver):
+        """ Recicla o driver após N páginas ou acima do teto de memória. """
+        stats = self._stats.get(id(driver))
+        if stats and self.max_pages and stats["pages"] >= self.max_pages:
+            return True
+
+        if self.max_memory_mb:
+            try:
+                used_bytes = driver.execute_script(
+                    "return (window.performance && performance.memory) ? performance.memory.usedJSHeapSize : 0"
+                ) or 0
+                if used_bytes > self.max_memory_mb * 1024 * 1024:
+                    return True
+            except Exception:
+                return True
+
+        return False
+
+    def prewarm(self):
+        """ Abre drivers até completar o tamanho configurado do pool. """
+        while True:
+            with self._lock:
+                if self._closed or self._total >= self.size:
+                    return
+                self._total += 1
+            try:
+                self._idle.put(self._create_driver())
+                self._notify()
+            except Exception as e:
+                with self._lock:
+                    self._total -= 1
+                print(f"AVISO: Falha ao pré-aquecer o pool de drivers: {e}")
+                return
+
+    # --------------------------------------------------------------------------
+    # Checkout / Checkin
+    # --------------------------------------------------------------------------
+
+    def checkout(self, timeout=None):
+        """
+        Retira um driver saudável do pool. Cria um novo se ainda houver vaga,
+        senão espera até 'timeout' segundos por um driver livre.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            if self._closed:
+                raise DriverPoolExhausted("O pool de drivers foi encerrado.")
+
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+
+            if driver is None:
+                with self._lock:
+                    can_create = self._total < self.size
+                    if can_create:
+                        self._total += 1
+                if can_create:
+                    try:
+                        driver = self._create_driver()
+                        self._notify()
+                        return driver
+                    except Exception:
+                        with self._lock:
+                            self._total -= 1
+                        raise
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DriverPoolExhausted(
+                        f"Nenhum driver livre após {timeout}s (pool com {self.size} drivers)."
+                    )
+                try:
+                    driver = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+
+            # Sessão crashada: substitui por uma nova na próxima volta.
+            # O driver só sai do pool se estiver saudável; senão a vaga é sempre libertada.
+            healthy = False
+            try:
+                healthy = self._is_healthy(driver)
+            finally:
+                if not healthy:
+                    print("AVISO: Driver do pool não responde. Substituindo...")
+                    self._destroy_driver(driver)
+            if not healthy:
+                continue
+
+            self._notify()
+            return driver
+
+    def checkin(self, driver, discard=False):
+        """
+        Devolve o driver ao pool. 'discard=True' força o descarte
+        (ex: depois de um WebDriverException).
+        """
+        with self._lock:
+            stats = self._stats.get(id(driver))
+            if stats:
+                stats["pages"] += 1
+
+        # O driver volta ao pool ou é destruído (libertando a vaga), aconteça o que acontecer
+        returned = False
+        try:
+            if discard or self._closed or not self._is_healthy(driver) or self._needs_recycling(driver):
+                return
+
+            # Limpa o estado da sessão para o próximo utilizador
+            try:
+                driver.delete_all_cookies()
+                driver.get("about:blank")
+            except Exception as e:
+                print(f"AVISO: Falha ao limpar o driver do pool ({e}). Descartando...")
+                return
+
+            self._idle.put(driver)
+            returned = True
+        finally:
+            if returned:
+                self._notify()
+            else:
+                self._destroy_driver(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        Uso:
+            with driver_pool.driver() as driver:
+                driver.get(url)
+        """
+        driver = self.checkout(timeout)
+        discard = False
+        try:
+            yield driver
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            # Erros do WebDriver (exceto timeout) indicam sessão potencialmente corrompida
+            discard = True
+            raise
+        finally:
+            self.checkin(driver, discard=discard)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "total": self._total,
+                "idle": self._idle.qsize(),
+                "in_use": self._total - self._idle.qsize(),
+            }
+
+    def shutdown(self):
+        """ Fecha todos os drivers ociosos (chamado no encerramento do processo). """
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy_driver(driver)
@@ -0,0 +1,289 @@
+import re
+import threading
+
+import lxml.html
+from lxml import etree
+
+from app.modules.metrics.instruments import LIMITS_HIT, timed
+
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+# "logo@2x.png" tem a forma de um e-mail, mas é um ficheiro (comum em src/data-src)
+EMAIL_ASSET_PATTERN = re.compile(r'\.(?:png|jpe?g|gif|svg|webp|avif|ico|css|js)$', re.IGNORECASE)
+# Atributos onde os sites põem e-mails fora do texto (além do 'content' das metas)
+EMAIL_ATTRS = {'href', 'content', 'value'}
+
+REDES_SOCIAIS = ['linkedin.com', 'facebook.com', 'instagram.com', 'twitter.com', 'wa.me', 'whatsapp.com']
+CTA_KEYWORDS = ['contato', 'fale conosco', 'orçamento', 'saiba mais', 'agende', 'demonstração', 'teste grátis']
+
+# Tags cujo conteúdo não é texto visível
+SKIP_TEXT_TAGS = {'script', 'style', 'template', 'noscript'}
+HEADING_TAGS = {'h2', 'h3'}
+
+# Elementos que delimitam um "bloco" de texto (parágrafo, item, célula...)
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'header', 'li', 'ul', 'ol', 'dl', 'dt', 'dd',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'table', 'tr', 'td', 'th',
+    'br', 'hr', 'figure', 'figcaption', 'address', 'body',
+}
+
+# Boilerplate: navegação, rodapé, formulários, banners de cookies...
+# O texto destes elementos entra no 'texto' (impressão digital, contagem de
+# palavras), mas não nos 'blocos' de conteúdo enviados à AI.
+BOILERPLATE_TAGS = {'nav', 'footer', 'aside', 'form', 'dialog', 'select', 'button'}
+BOILERPLATE_ROLES = {'navigation', 'contentinfo', 'dialog', 'alertdialog', 'search', 'menu', 'menubar'}
+BOILERPLATE_ATTR_PATTERN = re.compile(
+    r'cookie|consent|gdpr|lgpd|newsletter|popup|modal|breadcrumb|skip-link|share|social|sidebar|'
+    r'menu|navbar|footer|copyright',
+    re.IGNORECASE
+)
+
+BOILERPLATE_CONTAINER_TAGS = {'div', 'section', 'header', 'ul', 'ol', 'p', 'table'}
+
+
+def _is_boilerplate(el, tag):
+    if tag in BOILERPLATE_TAGS:
+        return True
+    role = el.get('role')
+    if role and role.lower() in BOILERPLATE_ROLES:
+        return True
+    # Classe/id só nos contêineres (um <span class="social-icon"> não é uma secção inteira)
+    if tag not in BOILERPLATE_CONTAINER_TAGS:
+        return False
+    attrs = (el.get('id') or '') + ' ' + (el.get('class') or '')
+    return bool(attrs.strip()) and BOILERPLATE_ATTR_PATTERN.search(attrs) is not None
+
+
+class ExtractionLimits:
+    """
+    (V10.7) Tetos da extração, para a memória por worker ser previsível
+    mesmo em homes de e-commerce gigantes:
+    - SCRAPER_MAX_ELEMENTS: elementos percorridos (o resto da árvore é ignorado);
+    - SCRAPER_MAX_TEXT_CHARS: caracteres de texto guardados ('texto' e 'blocos');
+    - SCRAPER_MAX_LINKS: links guardados (candidatos a sub-página).
+    Os tetos atingidos vão para extracao["limites_atingidos"].
+    """
+
+    def __init__(self, app=None):
+        self.max_elements = 100000
+        self.max_text_chars = 300000
+        self.max_links = 5000
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_elements = app.config.get("SCRAPER_MAX_ELEMENTS", self.max_elements)
+        self.max_text_chars = app.config.get("SCRAPER_MAX_TEXT_CHARS", self.max_text_chars)
+        self.max_links = app.config.get("SCRAPER_MAX_LINKS", self.max_links)
+
+
+extraction_limits = ExtractionLimits()
+
+
+def _find_emails(text):
+    """ E-mails no texto (sem os nomes de ficheiro do tipo "logo@2x.png"). """
+    return [email for email in EMAIL_PATTERN.findall(text) if not EMAIL_ASSET_PATTERN.search(email)]
+
+
+def _clean_text(text):
+    """ Junta espaços em branco (equivalente ao get_text(strip=True) do BeautifulSoup). """
+    return ' '.join(text.split())
+
+
+_parsers = threading.local()
+
+
+def _get_parser():
+    """ Um parser por thread (os parsers do lxml não devem ser partilhados entre threads). """
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        # Sem comentários/PIs: o texto à volta deles fica junto no nó pai
+        parser = lxml.html.HTMLParser(remove_comments=True, remove_pis=True)
+        _parsers.parser = parser
+    return parser
+
+
+def parse_html(html_content):
+    """ Faz o parse (lxml) do HTML. Retorna None se o documento estiver vazio/inválido. """
+    if not html_content or not html_content.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(html_content, parser=_get_parser())
+    except ValueError:
+        # lxml recusa strings unicode com declaração de encoding (<?xml ... encoding=...?>)
+        return lxml.html.document_fromstring(html_content.encode('utf-8'), parser=_get_parser())
+    except etree.ParserError:
+        return None
+
+
+@timed("parse")
+def extract_page(html_content, limits=None):
+    """
+    (V9.5) Motor de extração: faz o parse da página UMA vez (lxml) e recolhe
+    tudo numa única passagem pela árvore:
+    título, H1, metas, links sociais, CTAs, links (com texto âncora),
+    headings (H2/H3), emails, scripts/links externos e o texto visível.
+    (V10.10) Os emails vêm também do JSON-LD (<script type="application/ld+json">)
+    e dos atributos href, content, value e data-*.
+    (V10.4) Também separa o texto em 'blocos' de conteúdo, sem o boilerplate
+    (navegação, rodapé, banners de cookies...), para o texto enviado à AI.
+    (V10.7) Respeita os tetos de 'limits' (padrão: extraction_limits) e liberta
+    a árvore assim que a passagem termina.
+    """
+    limits = limits or extraction_limits
+    extracao = {
+        "titulo": '',
+        "h1_principal": '',
+        "descricao_meta": '',
+        "meta_keywords": [],
+        "meta_generator": '',
+        "emails": set(),
+        "links_sociais": set(),
+        "ctas": set(),
+        "links": [],          # [(href, texto âncora)]
+        "headings": [],       # ["H2: ...", "H3: ..."]
+        "script_srcs": [],
+        "link_hrefs": [],
+        "texto": '',
+        "blocos": [],         # Blocos de conteúdo (sem boilerplate), na ordem da página
+        "limites_atingidos": [],
+    }
+
+    root = parse_html(html_content)
+    if root is None:
+        extracao["contagem_palavras"] = 0
+        return extracao
+
+    titulo_encontrado = False
+    h1_encontrado = False
+    partes_texto = []
+    bloco_atual = []
+    skip_depth = 0
+    boilerplate_el = None  # Raiz do boilerplate em que estamos (None = conteúdo)
+    elementos = 0
+    texto_restante = [limits.max_text_chars]
+
+    def _limite(nome):
+        if nome not in extracao["limites_atingidos"]:
+            extracao["limites_atingidos"].append(nome)
+            LIMITS_HIT.labels(limit=nome).inc()
+
+    def _coletar_texto(texto):
+        if '@' in texto:
+            extracao["emails"].update(_find_emails(texto))
+        if texto_restante[0] <= 0:
+            return
+        if len(texto) > texto_restante[0]:
+            texto = texto[:texto_restante[0]]
+            _limite("texto")
+        texto_restante[0] -= len(texto)
+        partes_texto.append(texto)
+        if boilerplate_el is None:
+            bloco_atual.append(texto)
+
+    def _fechar_bloco():
+        if bloco_atual:
+            bloco = _clean_text(' '.join(bloco_atual))
+            if bloco:
+                extracao["blocos"].append(bloco)
+            bloco_atual.clear()
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag
+        if not isinstance(tag, str):
+            continue
+        tag = tag.lower()
+
+        if event == "end":
+            if tag in SKIP_TEXT_TAGS:
+                skip_depth -= 1
+            if el is boilerplate_el:
+                boilerplate_el = None
+            elif tag in BLOCK_TAGS and boilerplate_el is None:
+                _fechar_bloco()
+            if skip_depth == 0 and el.tail and el.tail.strip():
+                _coletar_texto(el.tail)
+            continue
+
+        # --- event == "start" ---
+        elementos += 1
+        if elementos > limits.max_elements:
+            _limite("elementos")
+            break
+
+        for name, value in el.items():
+            if '@' in value and (name in EMAIL_ATTRS or name.startswith('data-')):
+                extracao["emails"].update(_find_emails(value))
+
+        if tag in SKIP_TEXT_TAGS:
+            skip_depth += 1
+            if tag == 'script':
+                if el.get('src'):
+                    extracao["script_srcs"].append(el.get('src'))
+                elif el.text and '@' in el.text and 'ld+json' in (el.get('type') or '').lower():
+                    # Dados estruturados (Organization, LocalBusiness...): "email": "..."
+                    extracao["emails"].update(_find_emails(el.text))
+            continue
+
+        if boilerplate_el is None:
+            if _is_boilerplate(el, tag):
+                _fechar_bloco()
+                boilerplate_el = el
+            elif tag in BLOCK_TAGS:
+                _fechar_bloco()
+
+        if skip_depth == 0 and el.text and el.text.strip():
+            _coletar_texto(el.text)
+
+        if tag == 'title' and not titulo_encontrado:
+            titulo_encontrado = True
+            extracao["titulo"] = el.text or ''
+
+        elif tag == 'h1' and not h1_encontrado:
+            h1_encontrado = True
+            extracao["h1_principal"] = _clean_text(el.text_content())
+
+        elif tag in HEADING_TAGS:
+            extracao["headings"].append(f"{tag.upper()}: {_clean_text(el.text_content())}")
+
+        elif tag == 'meta':
+            name = (el.get('name') or '').lower()
+            content = el.get('content')
+            if content is None:
+                continue
+            if name == 'description' and not extracao["descricao_meta"]:
+                extracao["descricao_meta"] = content
+            elif name == 'keywords' and not extracao["meta_keywords"]:
+                extracao["meta_keywords"] = [k.strip() for k in content.split(',')] if content else []
+            elif name == 'generator' and not extracao["meta_generator"]:
+                extracao["meta_generator"] = content
+
+        elif tag == 'link':
+            if el.get('href'):
+                extracao["link_hrefs"].append(el.get('href'))
+
+        elif tag == 'a':
+            texto_link = _clean_text(el.text_content())
+            href = el.get('href')
+            if href is not None:
+                if len(extracao["links"]) < limits.max_links:
+                    extracao["links"].append((href, texto_link))
+                else:
+                    _limite("links")
+                if any(rede in href for rede in REDES_SOCIAIS):
+                    extracao["links_sociais"].add(href)
+            if texto_link and any(keyword in texto_link.lower() for keyword in CTA_KEYWORDS):
+                extracao["ctas"].add(texto_link)
+
+        elif tag == 'button':
+            texto_botao = _clean_text(el.text_content())
+            if texto_botao and any(keyword in texto_botao.lower() for keyword in CTA_KEYWORDS):
+                extracao["ctas"].add(texto_botao)
+
+    # A árvore já não é precisa: liberta-a antes de juntar o texto (picos menores)
+    root = el = None
+    _fechar_bloco()
+    extracao["texto"] = _clean_text(' '.join(partes_texto))
+    extracao["contagem_palavras"] = len(extracao["texto"].split())
+    return extracao
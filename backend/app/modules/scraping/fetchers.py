@@ -0,0 +1,328 @@
+import codecs
+import re
+from contextlib import nullcontext
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+
+from .browser import wait_until_ready
+from .politeness import HostSlotTimeout
+from app.modules.metrics.instruments import LIMITS_HIT, PAGE_FETCHES, log_event
+
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Marcadores de "casca" de SPA (o conteúdo real só aparece depois do JavaScript)
+SPA_ROOT_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|___gatsby)["\'][^>]*>\s*</div>',
+    re.IGNORECASE
+)
+NOSCRIPT_JS_PATTERN = re.compile(
+    r'<noscript[^>]*>[^<]*(?:enable javascript|ative o javascript|habilite o javascript)',
+    re.IGNORECASE
+)
+BODY_START_PATTERN = re.compile(r'<body[^>]*>', re.IGNORECASE)
+STRIP_BLOCKS_PATTERN = re.compile(r'<(script|style|noscript|template)[^>]*>.*?</\1>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Charset do header Content-Type e do <meta charset> / <meta http-equiv="Content-Type">
+HEADER_CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(
+    rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)',
+    re.IGNORECASE
+)
+META_SNIFF_BYTES = 4096
+DETECT_SAMPLE_BYTES = 64 * 1024
+
+
+def _visible_text_length(html_content):
+    """ Estimativa barata (sem parser) do tamanho do texto visível do <body>. """
+    # Até ao fim do documento (um HTML truncado pelo teto de bytes não tem o </body>)
+    match = BODY_START_PATTERN.search(html_content)
+    body = html_content[match.end():] if match else html_content
+    body = STRIP_BLOCKS_PATTERN.sub(' ', body)
+    return len(' '.join(TAG_PATTERN.sub(' ', body).split()))
+
+
+def looks_js_rendered(html_content, min_text_chars=500):
+    """
+    Decide se a página parece depender de JavaScript para mostrar o conteúdo:
+    body vazio, div raiz de SPA vazia, aviso de <noscript> ou pouco texto.
+    """
+    if not html_content or not BODY_START_PATTERN.search(html_content):
+        return True
+    if SPA_ROOT_PATTERN.search(html_content) or NOSCRIPT_JS_PATTERN.search(html_content):
+        return True
+    return _visible_text_length(html_content) < min_text_chars
+
+# Só a parte inicial do DOM atravessa o WebDriver (o page_source traria tudo)
+OUTER_HTML_SCRIPT = """
+const html = document.documentElement.outerHTML;
+return [html.length, html.substring(0, arguments[0])];
+"""
+
+
+def _read_capped(response, max_bytes):
+    """ Lê o corpo em streaming até 'max_bytes'. Retorna (bytes, truncado). """
+    chunks, size = [], 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            return b"".join(chunks)[:max_bytes], True
+    return b"".join(chunks), False
+
+
+def _codec_name(label):
+    """ Nome do codec do Python para um rótulo de charset (None se desconhecido). """
+    if not label:
+        return None
+    try:
+        name = codecs.lookup(label.strip()).name
+    except LookupError:
+        return None
+    # Como nos browsers: "iso-8859-1" (e "ascii") declarado quer dizer windows-1252
+    return "cp1252" if name in ("latin-1", "iso8859-1", "ascii") else name
+
+
+def decode_html(raw, content_type=""):
+    """
+    (V10.10) Bytes do HTML -> str, com o charset que um browser usaria:
+    1. o charset do header Content-Type;
+    2. o BOM, se houver;
+    3. o <meta charset> nos primeiros bytes do documento;
+    4. UTF-8 (se os bytes forem UTF-8 válido);
+    5. a deteção do requests (charset_normalizer/chardet) numa amostra.
+    Sem charset no header, o requests assume ISO-8859-1 e ignora o <meta>,
+    o que estragava acentos ("ServiÃ§os") nas páginas em UTF-8.
+    """
+    match = HEADER_CHARSET_PATTERN.search(content_type or "")
+    encoding = _codec_name(match.group(1)) if match else None
+
+    if encoding is None:
+        for bom, bom_encoding in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+            if raw.startswith(bom):
+                encoding = bom_encoding
+                break
+
+    if encoding is None:
+        match = META_CHARSET_PATTERN.search(raw[:META_SNIFF_BYTES])
+        if match:
+            encoding = _codec_name(match.group(1).decode("ascii", "ignore"))
+            # Um <meta> "utf-16" num documento lido como bytes ASCII é mentira (HTML5)
+            if encoding and encoding.startswith("utf-16"):
+                encoding = "utf-8"
+
+    if encoding is None:
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError:
+            detected = chardet.detect(raw[:DETECT_SAMPLE_BYTES]) if chardet is not None else None
+            encoding = _codec_name((detected or {}).get("encoding")) or "cp1252"
+
+    return raw.decode(encoding, errors="replace")
+
+
+def _report_truncated(url, size_limit):
+    print(f"AVISO: {url} passou de {size_limit} bytes de HTML. Usando só o início da página.")
+    LIMITS_HIT.labels(limit="html_bytes").inc()
+    log_event("limit_hit", url=url, limit="html_bytes", max_bytes=size_limit)
+
+
+class PageFetcher:
+    """
+    (V9.2) Camada de "fetch" em dois níveis:
+    1. Tenta um cliente HTTP com pool de conexões (requests.Session) - rápido e barato.
+    2. Só escala para o Selenium (driver do pool) quando a página parece
+       renderizada por JavaScript, ou quando o HTTP falha.
+
+    Cada fetch retorna um dicionário:
+        {"url", "html", "headers", "cookies", "via", "truncated"}  (via = "http" ou "selenium")
+    (V10.7) O HTML é limitado a SCRAPER_MAX_HTML_BYTES ("truncated" = True
+    quando a página era maior): o HTTP lê o corpo em streaming e pára no
+    teto; o Selenium só transfere o início do outerHTML.
+    """
+
+    def __init__(self, driver_pool, scheduler=None, app=None):
+        self.driver_pool = driver_pool
+        self.scheduler = scheduler  # HostScheduler (educação por host), opcional
+        self.session = None
+
+        # Valores padrão (sobrescritos pelo init_app)
+        self.http_enabled = True
+        self.http_timeout = 10
+        self.http_pool_size = 20
+        self.min_text_chars = 500
+        self.ready_timeout = 10
+        self.ready_poll_interval = 0.3
+        self.max_html_bytes = 5 * 1024 * 1024
+
+        self._build_session()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.http_enabled = app.config.get("SCRAPER_HTTP_FAST_PATH", self.http_enabled)
+        self.http_timeout = app.config.get("SCRAPER_HTTP_TIMEOUT", self.http_timeout)
+        self.http_pool_size = app.config.get("SCRAPER_HTTP_POOL_SIZE", self.http_pool_size)
+        self.min_text_chars = app.config.get("SCRAPER_STATIC_MIN_TEXT", self.min_text_chars)
+        self.ready_timeout = app.config.get("SCRAPER_READY_TIMEOUT", self.ready_timeout)
+        self.ready_poll_interval = app.config.get("SCRAPER_READY_POLL_INTERVAL", self.ready_poll_interval)
+        self.max_html_bytes = app.config.get("SCRAPER_MAX_HTML_BYTES", self.max_html_bytes)
+        self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.http_pool_size, pool_maxsize=self.http_pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "pt-BR,pt;q=0.9,en;q=0.8",
+        })
+        self.session = session
+        if self.scheduler is not None:
+            self.scheduler.session = session  # robots.txt pela mesma pool de conexões
+
+    def _slot(self, url, timeout=None):
+        """ Vaga do host no HostScheduler (ou nenhuma restrição, sem scheduler). """
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.slot(url, timeout)
+
+    # --------------------------------------------------------------------------
+    # Nível 1: HTTP
+    # --------------------------------------------------------------------------
+
+    def _page_from_response(self, response):
+        """ Página a partir de uma resposta em streaming (corpo lido até o teto de bytes). """
+        raw, truncated = _read_capped(response, self.max_html_bytes)
+        if truncated:
+            _report_truncated(response.url, self.max_html_bytes)
+        return {
+            "url": response.url,
+            # Não o response.encoding: sem charset no header seria sempre ISO-8859-1
+            "html": decode_html(raw, response.headers.get("Content-Type", "")),
+            # Nomes de headers em minúsculas (o dict perde o case-insensitive do requests)
+            "headers": {name.lower(): value for name, value in response.headers.items()},
+            "cookies": {cookie.name: cookie.value for cookie in response.cookies},
+            "via": "http",
+            "truncated": truncated,
+        }
+
+    def fetch_http(self, url):
+        """ Retorna o resultado do fetch via HTTP, ou None se não for HTML utilizável. """
+        try:
+            with self._slot(url):
+                with self.session.get(url, timeout=self.http_timeout, allow_redirects=True, stream=True) as response:
+                    content_type = response.headers.get("Content-Type", "")
+                    if response.status_code != 200 or "html" not in content_type.lower():
+                        print(f"HTTP {response.status_code} ({content_type}) para {url}. Escalando para o Selenium.")
+                        return None
+                    return self._page_from_response(response)
+        except (requests.RequestException, HostSlotTimeout) as e:
+            print(f"HTTP falhou para {url} ({e}). Escalando para o Selenium.")
+            return None
+
+    def revalidate(self, url, etag=None, last_modified=None):
+        """
+        GET condicional (If-None-Match / If-Modified-Since) para saber, de forma
+        barata, se a página mudou desde o último scrape.
+        Retorna (status, página): status = "not_modified", "ok" ou "failed".
+        """
+        conditional_headers = {}
+        if etag:
+            conditional_headers["If-None-Match"] = etag
+        if last_modified:
+            conditional_headers["If-Modified-Since"] = last_modified
+
+        try:
+            with self._slot(url):
+                with self.session.get(
+                    url, headers=conditional_headers, timeout=self.http_timeout, allow_redirects=True, stream=True
+                ) as response:
+                    if response.status_code == 304:
+                        return "not_modified", None
+
+                    content_type = response.headers.get("Content-Type", "")
+                    if response.status_code != 200 or "html" not in content_type.lower():
+                        return "failed", None
+
+                    return "ok", self._page_from_response(response)
+        except (requests.RequestException, HostSlotTimeout) as e:
+            print(f"Revalidação HTTP falhou para {url} ({e}).")
+            return "failed", None
+
+    def fetch_bytes(self, url, max_bytes=10 * 1024 * 1024, timeout=None):
+        """
+        Corpo "cru" (bytes) de um recurso que não precisa de renderização
+        (ex: sitemap.xml). Retorna None se falhar, não for 200 ou passar de 'max_bytes'.
+        'timeout' (segundos, padrão SCRAPER_HTTP_TIMEOUT) limita tanto a espera
+        pela vaga do host como o pedido.
+        """
+        timeout = self.http_timeout if timeout is None else timeout
+        try:
+            with self._slot(url, timeout):
+                with self.session.get(url, timeout=timeout, allow_redirects=True, stream=True) as response:
+                    if response.status_code != 200:
+                        return None
+                    content, truncated = _read_capped(response, max_bytes)
+                    if truncated:
+                        print(f"AVISO: {url} passou de {max_bytes} bytes. Ignorando.")
+                        return None
+                    return content
+        except (requests.RequestException, HostSlotTimeout) as e:
+            print(f"HTTP falhou para {url} ({e}).")
+            return None
+
+    # --------------------------------------------------------------------------
+    # Nível 2: Selenium
+    # --------------------------------------------------------------------------
+
+    def fetch_selenium(self, url):
+        print(f"Selenium acessando: {url}...")
+        with self._slot(url), self.driver_pool.driver() as driver:
+            driver.get(url)
+
+            # Espera o DOM e a estabilização do texto (não só o <body>)
+            wait_until_ready(driver, self.ready_timeout, self.ready_poll_interval)
+
+            html, truncated = self._selenium_html(driver)
+            if truncated:
+                _report_truncated(url, self.max_html_bytes)
+
+            return {
+                "url": driver.current_url,
+                "html": html,
+                "headers": {},
+                "cookies": {cookie["name"]: cookie.get("value", "") for cookie in driver.get_cookies()},
+                "via": "selenium",
+                "truncated": truncated,
+            }
+
+    def _selenium_html(self, driver):
+        """ Início do outerHTML (até o teto, em caracteres). Retorna (html, truncado). """
+        try:
+            length, html = driver.execute_script(OUTER_HTML_SCRIPT, self.max_html_bytes)
+            return html, length > self.max_html_bytes
+        except Exception as e:
+            print(f"AVISO: outerHTML indisponível ({e}). Usando o page_source.")
+            html = driver.page_source
+            return html[:self.max_html_bytes], len(html) > self.max_html_bytes
+
+    def fetch(self, url):
+        """ Busca a página pelo caminho mais barato que entregue conteúdo real. """
+        if self.http_enabled:
+            page = self.fetch_http(url)
+            if page is not None:
+                if not looks_js_rendered(page["html"], self.min_text_chars):
+                    print(f"HTTP (fast path) OK: {url}")
+                    PAGE_FETCHES.labels(via="http").inc()
+                    return page
+                print(f"Página parece renderizada por JavaScript: {url}. Escalando para o Selenium.")
+
+        page = self.fetch_selenium(url)
+        PAGE_FETCHES.labels(via="selenium").inc()
+        return page
@@ -0,0 +1,235 @@
+import gzip
+import io
+import re
+import time
+import unicodedata
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from lxml import etree
+
+
+# Pesos por palavra-chave (no caminho da URL ou no texto âncora).
+# As páginas institucionais dizem mais sobre a empresa do que uma página de produto isolada.
+LINK_KEYWORDS = {
+    "sobre": 10, "quem-somos": 10, "quemsomos": 10, "empresa": 9, "institucional": 9,
+    "about": 9, "company": 8, "historia": 6, "missao": 5,
+    "servicos": 8, "services": 7, "solucoes": 8, "solutions": 7, "produtos": 7, "products": 6,
+    "o-que-fazemos": 8, "segmentos": 5, "clientes": 4, "cases": 4,
+    "contato": 6, "fale-conosco": 6, "contact": 5,
+}
+
+# Caminhos que raramente ajudam a entender a empresa (e costumam existir aos milhares)
+NOISE_PATTERN = re.compile(
+    r'/(blog|noticias|news|tag|tags|categoria|category|author|autor|page|pagina|feed|wp-json|'
+    r'carrinho|cart|checkout|login|minha-conta|account|politica|privacy|termos|terms)(/|$)',
+    re.IGNORECASE
+)
+
+# Ficheiros que não são páginas HTML
+SKIP_EXTENSIONS = re.compile(
+    r'\.(pdf|jpe?g|png|gif|webp|svg|ico|zip|rar|gz|mp4|mp3|avi|mov|docx?|xlsx?|pptx?|css|js|json|xml|txt)$',
+    re.IGNORECASE
+)
+
+# Parâmetros de rastreamento: não mudam o conteúdo da página
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|_ga|ref|source)$', re.IGNORECASE)
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024  # Limite do protocolo (descomprimido)
+
+
+def _fold(text):
+    """ Minúsculas e sem acentos ('Serviços' -> 'servicos'). """
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def _strip_www(host):
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_link(href, page_url):
+    """
+    URL canónica de um link, ou None se não for uma página HTTP(S).
+    - resolve links relativos (com ou sem '/') em relação à página;
+    - remove o fragmento (#...), os parâmetros de rastreamento e a barra final;
+    - host em minúsculas, sem a porta padrão; parâmetros restantes ordenados.
+    """
+    href = (href or "").strip()
+    if not href or href.startswith(("#", "mailto:", "tel:", "javascript:", "data:")):
+        return None
+
+    parts = urlsplit(urljoin(page_url, href))
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if parts.port and not ((parts.scheme == "http" and parts.port == 80) or (parts.scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r'/{2,}', '/', parts.path or "/")
+    if SKIP_EXTENSIONS.search(path):
+        return None
+    path = path.rstrip("/") or ""
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit((parts.scheme, host, path, query, ""))
+
+
+class LinkFrontier:
+    """
+    (V10.3) Seleção das sub-páginas a visitar.
+
+    Junta os candidatos (links da home e, opcionalmente, do sitemap.xml),
+    normaliza e remove duplicados, e ordena por pontuação:
+    palavra-chave no caminho + palavra-chave no texto âncora + bónus do
+    sitemap - penalização por profundidade e por caminhos de "ruído".
+    A ordem é determinística (empates desfeitos pela profundidade e pela URL).
+    """
+
+    def __init__(self, base_url, page_url=None):
+        self.base_url = base_url
+        self.page_url = page_url or base_url + "/"
+        self.site_hosts = {
+            _strip_www((urlsplit(base_url).hostname or "").lower()),
+            _strip_www((urlsplit(self.page_url).hostname or "").lower()),
+        }
+        self.excluded = {normalize_link(base_url, base_url), normalize_link(self.page_url, self.page_url)}
+        self.candidates = {}  # url normalizada -> {"anchors": set, "sitemap": bool}
+
+    def _is_internal(self, url):
+        return _strip_www((urlsplit(url).hostname or "").lower()) in self.site_hosts
+
+    def _candidate(self, href, base):
+        url = normalize_link(href, base)
+        if url is None or url in self.excluded or not self._is_internal(url):
+            return None
+        return self.candidates.setdefault(url, {"anchors": set(), "sitemap": False})
+
+    def add_links(self, links):
+        """ Links da página: lista de (href, texto âncora). """
+        for href, anchor in links:
+            candidate = self._candidate(href, self.page_url)
+            if candidate is not None and anchor:
+                candidate["anchors"].add(_fold(anchor.strip())[:100])
+
+    def add_sitemap_urls(self, urls):
+        for url in urls:
+            candidate = self._candidate(url, self.base_url)
+            if candidate is not None:
+                candidate["sitemap"] = True
+
+    def score(self, url, candidate):
+        path = _fold(urlsplit(url).path)
+        segments = [segment for segment in path.split("/") if segment]
+
+        score = 0
+        for keyword, weight in LINK_KEYWORDS.items():
+            if keyword in path:
+                score = max(score, weight)
+        anchor_text = " ".join(candidate["anchors"])
+        anchor_score = max(
+            (weight for keyword, weight in LINK_KEYWORDS.items() if keyword.replace("-", " ") in anchor_text),
+            default=0
+        )
+
+        # Sem sinal de palavra-chave, a página não entra
+        if not score and not anchor_score:
+            return 0
+
+        score += anchor_score * 0.6
+        if candidate["sitemap"]:
+            score += 1
+        score -= 2 * max(0, len(segments) - 1)
+        if urlsplit(url).query:
+            score -= 2
+        if NOISE_PATTERN.search(path + "/"):
+            score -= 8
+        return score
+
+    def select(self, limit=5):
+        """ As 'limit' melhores URLs (pontuação > 0), em ordem determinística. """
+        scored = []
+        for url, candidate in self.candidates.items():
+            score = self.score(url, candidate)
+            if score > 0:
+                depth = len([segment for segment in urlsplit(url).path.split("/") if segment])
+                scored.append((-score, depth, url))
+        scored.sort()
+        return [url for _score, _depth, url in scored[:limit]]
+
+
+# ==============================================================================
+# sitemap.xml (lido como XML, sem renderizar)
+# ==============================================================================
+
+def _parse_sitemap(content):
+    """ Retorna (URLs de páginas, URLs de sub-sitemaps) de um sitemap ou índice. """
+    if content[:2] == b"\x1f\x8b":
+        # sitemap.xml.gz: descomprime com teto (evita "bombas" de compressão)
+        try:
+            content = gzip.GzipFile(fileobj=io.BytesIO(content)).read(MAX_SITEMAP_BYTES)
+        except (OSError, EOFError):
+            return [], []
+
+    pages, children = [], []
+    parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True, huge_tree=False)
+    try:
+        root = etree.fromstring(content, parser=parser)
+    except (etree.XMLSyntaxError, ValueError):
+        return pages, children
+    if root is None:
+        return pages, children
+
+    is_index = root.tag.endswith("sitemapindex")
+    for loc in root.iter(f"{SITEMAP_NS}loc", "loc"):
+        if loc.text:
+            (children if is_index else pages).append(loc.text.strip())
+    return pages, children
+
+
+def discover_sitemap_urls(fetch_bytes, base_url, max_urls=5000, max_sitemaps=5, deadline=None, fetch_timeout=None):
+    """
+    Lê o /sitemap.xml (e, se for um índice, alguns sub-sitemaps - os de
+    páginas primeiro). 'fetch_bytes(url, timeout=...)' devolve o corpo em bytes ou None.
+    'deadline' (time.monotonic()) corta a descoberta a meio: nenhum pedido
+    começa depois dele, e cada um tem no máximo 'fetch_timeout' segundos
+    (ou o que falta até o prazo, se for menos).
+    Retorna (lista de URLs - no máximo 'max_urls', completa?).
+    """
+    def _fetch(url):
+        timeout = fetch_timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return fetch_bytes(url, timeout=timeout)
+
+    def _expired():
+        return deadline is not None and time.monotonic() >= deadline
+
+    content = _fetch(f"{base_url}/sitemap.xml")
+    if not content and not _expired():
+        content = _fetch(f"{base_url}/sitemap_index.xml")
+    if not content:
+        return [], not _expired()
+
+    urls, children = _parse_sitemap(content)
+
+    # Índice: páginas institucionais antes de posts/produtos
+    children.sort(key=lambda child: (0 if re.search(r'page|pagina', child, re.IGNORECASE) else 1, child))
+    for child in children[:max_sitemaps]:
+        if len(urls) >= max_urls:
+            break
+        if _expired():
+            return urls[:max_urls], False
+        child_content = _fetch(child)
+        if child_content:
+            child_urls, _ = _parse_sitemap(child_content)
+            urls.extend(child_urls)
+
+    return urls[:max_urls], not _expired()
@@ -0,0 +1,177 @@
+import datetime
+import queue
+import threading
+
+from sqlalchemy import exc
+
+from app.extensions import db
+from app.models import ScrapeJob
+
+
+class JobQueueFull(Exception):
+    """A fila local de jobs atingiu o limite configurado."""
+
+
+class ScrapeJobRunner:
+    """
+    (V9.3) Executa o 'get_scraped_data_service' em background.
+
+    - Fila local em processo (queue.Queue), sem broker externo;
+    - Um número limitado de threads worker (SCRAPE_JOB_WORKERS);
+    - O estado de cada job fica na tabela 'scrape_jobs' (Postgres), por isso
+      jobs pendentes são re-enfileirados quando a app reinicia.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._workers = []
+        self.max_queue = 100
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_queue = app.config.get("SCRAPE_JOB_QUEUE_MAX", self.max_queue)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+
+        num_workers = app.config.get("SCRAPE_JOB_WORKERS", 2)
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"scrape-job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        if num_workers:
+            self._recover_jobs(app.config.get("SCRAPE_JOB_STALE_SECONDS", 600))
+
+    def _recover_jobs(self, stale_seconds):
+        """ Re-enfileira jobs pendentes e os 'running' órfãos de um restart. """
+        with self.app.app_context():
+            try:
+                stale_cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=stale_seconds)
+                ScrapeJob.query.filter(
+                    ScrapeJob.status == ScrapeJob.STATUS_RUNNING,
+                    ScrapeJob.started_at < stale_cutoff
+                ).update({"status": ScrapeJob.STATUS_PENDING}, synchronize_session=False)
+                db.session.commit()
+
+                pending_ids = [
+                    job_id for (job_id,) in db.session.query(ScrapeJob.id)
+                    .filter(ScrapeJob.status == ScrapeJob.STATUS_PENDING)
+                    .order_by(ScrapeJob.created_at)
+                    .limit(self.max_queue)
+                ]
+            except exc.SQLAlchemyError as e:
+                db.session.rollback()
+                print(f"AVISO: Não foi possível recuperar os jobs pendentes: {e}")
+                return
+
+        for job_id in pending_ids:
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                break
+        if pending_ids:
+            print(f"JOBS: {len(pending_ids)} job(s) pendente(s) re-enfileirado(s).")
+
+    # --------------------------------------------------------------------------
+    # API pública
+    # --------------------------------------------------------------------------
+
+    def submit(self, url):
+        """ Cria o job no DB e coloca-o na fila. Retorna o ScrapeJob criado. """
+        if self._queue is None or not self._workers:
+            raise JobQueueFull("Nenhum worker de jobs está ativo.")
+        if self._queue.full():
+            raise JobQueueFull(f"A fila de jobs está cheia ({self.max_queue}). Tente novamente mais tarde.")
+
+        job = ScrapeJob(url=url)
+        db.session.add(job)
+        db.session.commit()
+
+        try:
+            self._queue.put_nowait(job.id)
+        except queue.Full:
+            # A fila encheu entre o 'full()' e o 'put': o cliente recebe 503 e não
+            # conhece o job_id, por isso o job não pode ficar 'pending' no DB (o
+            # _recover_jobs iria executá-lo no próximo restart sem ninguém o pedir)
+            self._discard(job)
+            raise JobQueueFull(f"A fila de jobs está cheia ({self.max_queue}). Tente novamente mais tarde.")
+
+        return job
+
+    def _discard(self, job):
+        """ Apaga um job que nunca chegou à fila. """
+        try:
+            db.session.delete(job)
+            db.session.commit()
+        except exc.SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"AVISO: Não foi possível apagar o job {job.id} recusado: {e}")
+
+    # --------------------------------------------------------------------------
+    # Worker
+    # --------------------------------------------------------------------------
+
+    def _claim(self, job_id):
+        """
+        Marca o job como 'running' de forma atômica (UPDATE ... WHERE status='pending'),
+        para que dois workers/processos nunca executem o mesmo job.
+        """
+        claimed = ScrapeJob.query.filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.status == ScrapeJob.STATUS_PENDING
+        ).update({
+            "status": ScrapeJob.STATUS_RUNNING,
+            "started_at": datetime.datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _finish(self, job_id, status, result=None, error=None):
+        ScrapeJob.query.filter(ScrapeJob.id == job_id).update({
+            "status": status,
+            "result": result,
+            "error": error,
+            "finished_at": datetime.datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def _run_job(self, job_id):
+        # Import tardio: o services importa o Selenium e o Gemini
+        from .services import get_scraped_data_service
+
+        if not self._claim(job_id):
+            return
+
+        job = db.session.get(ScrapeJob, job_id)
+        print(f"JOB {job_id}: iniciando scrape de {job.url}")
+        try:
+            result = get_scraped_data_service(job.url)
+        except Exception as e:
+            print(f"JOB {job_id}: falhou ({e})")
+            db.session.rollback()
+            self._finish(job_id, ScrapeJob.STATUS_FAILED, error=str(e))
+            return
+
+        self._finish(job_id, ScrapeJob.STATUS_DONE, result=result)
+        print(f"JOB {job_id}: concluído")
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._run_job(job_id)
+                    except exc.SQLAlchemyError as e:
+                        db.session.rollback()
+                        print(f"AVISO: Erro de banco de dados no job {job_id}: {e}")
+            except Exception as e:
+                print(f"ERRO inesperado no worker de jobs ({job_id}): {e}")
+            finally:
+                self._queue.task_done()
+
+
+job_runner = ScrapeJobRunner()
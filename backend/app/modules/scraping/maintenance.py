@@ -0,0 +1,240 @@
+import datetime
+import math
+import re
+import threading
+
+from sqlalchemy import bindparam, delete, exc, func, null, select, update
+
+from app.extensions import db
+from app.models import ScrapedData
+from app.modules.scraping.cache import scrape_cache
+from app.modules.scraping.singleflight import pg_advisory_lock
+
+
+def _lru_order():
+    """ Ordem de despejo: primeiro os registos acedidos (ou gravados) há mais tempo. """
+    return func.coalesce(ScrapedData.last_accessed_at, ScrapedData.scraped_at).asc()
+
+
+def _host_pattern(domain):
+    """ Regex (Postgres, case-insensitive) para o domínio e os seus subdomínios. """
+    return r'^https?://([^/@]*\.)?' + re.escape(domain.strip().lower().rstrip('.')) + r'(:[0-9]+)?(/|$)'
+
+
+def invalidation_filter(url=None, domain=None, prefix=None):
+    """
+    Filtro SQL + predicado Python (para o nível de memória) de uma invalidação
+    dirigida. Retorna (filtro, predicado) ou (None, None) sem critério.
+    """
+    if url:
+        return ScrapedData.url == url, lambda key: key == url
+    if domain:
+        pattern = _host_pattern(domain)
+        compiled = re.compile(pattern, re.IGNORECASE)
+        return ScrapedData.url.op('~*')(pattern), lambda key: compiled.search(key) is not None
+    if prefix:
+        return ScrapedData.url.startswith(prefix, autoescape=True), lambda key: key.startswith(prefix)
+    return None, None
+
+
+def invalidate_cache(url=None, domain=None, prefix=None, hard=False):
+    """
+    Invalida o cache por URL exata, domínio (inclui subdomínios) ou prefixo.
+
+    Por padrão os registos são apenas EXPIRADOS (scraped_at logo antes do fim
+    da janela de 'stale') e perdem o 'page_meta': o próximo pedido faz o
+    pipeline COMPLETO (sem o 'page_meta', o refresh incremental devolveria a
+    análise antiga sempre que as páginas não tivessem mudado).
+    Com 'hard=True' os registos são apagados.
+    Retorna o número de registos afetados. Pode levantar SQLAlchemyError.
+    """
+    criterion, predicate = invalidation_filter(url=url, domain=domain, prefix=prefix)
+    if criterion is None:
+        raise ValueError("Indique 'url', 'domain' ou 'prefix'.")
+
+    if hard:
+        statement = delete(ScrapedData).where(criterion)
+    else:
+        expired_at = scrape_cache.cutoff(include_stale=True) - datetime.timedelta(seconds=1)
+        statement = update(ScrapedData).where(criterion).values(scraped_at=expired_at, page_meta=null())
+    result = db.session.execute(statement.execution_options(synchronize_session=False))
+    db.session.commit()
+
+    scrape_cache.invalidate_memory(predicate=predicate)
+    return result.rowcount
+
+
+class CacheMaintainer:
+    """
+    (V9.10) Manutenção do cache de scrapes numa thread em background:
+
+    1. Grava em lote os acessos (hits) registados pelo ScrapeCache
+       (colunas 'last_accessed_at' e 'hit_count');
+    2. Purga, em lotes, os registos mais velhos que SCRAPE_CACHE_PURGE_AFTER_SECONDS;
+    3. Aplica o orçamento (SCRAPE_CACHE_MAX_ROWS / SCRAPE_CACHE_MAX_BYTES),
+       despejando primeiro os registos menos acedidos (LRU).
+
+    Os passos 2 e 3 correm sob um pg_try_advisory_lock: com vários workers do
+    gunicorn, só um deles faz a limpeza em cada ciclo.
+    """
+
+    LOCK_KEY = "scrape-cache-maintenance"
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 300
+        self.purge_after = 30 * 24 * 3600
+        self.batch_size = 500
+        self.max_rows = 0
+        self.max_bytes = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get("SCRAPE_CACHE_MAINTENANCE_INTERVAL", self.interval)
+        self.purge_after = app.config.get("SCRAPE_CACHE_PURGE_AFTER_SECONDS", self.purge_after)
+        self.batch_size = app.config.get("SCRAPE_CACHE_PURGE_BATCH", self.batch_size)
+        self.max_rows = app.config.get("SCRAPE_CACHE_MAX_ROWS", self.max_rows)
+        self.max_bytes = app.config.get("SCRAPE_CACHE_MAX_BYTES", self.max_bytes)
+
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="scrape-cache-maintainer", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.run_once()
+            except Exception as e:
+                print(f"AVISO: Manutenção do cache falhou: {e}")
+
+    # --------------------------------------------------------------------------
+    # Um ciclo de manutenção
+    # --------------------------------------------------------------------------
+
+    def run_once(self):
+        """ Executa um ciclo completo. Retorna um resumo (útil no admin/logs). """
+        summary = {"acessos_gravados": self.flush_accesses(), "purgados": 0, "despejados": 0}
+
+        with pg_advisory_lock(db.engine, self.LOCK_KEY, wait=False) as acquired:
+            if not acquired and db.engine.dialect.name == 'postgresql':
+                return summary  # Outro processo já está a fazer a limpeza
+            summary["purgados"] = self.purge_expired()
+            summary["despejados"] = self.enforce_budget()
+
+        if summary["purgados"] or summary["despejados"]:
+            print(f"CACHE MAINTENANCE: {summary}")
+        return summary
+
+    def flush_accesses(self):
+        """ Grava os 'last_accessed_at' e 'hit_count' pendentes com um único UPDATE em lote. """
+        accesses = scrape_cache.drain_accesses()
+        if not accesses:
+            return 0
+
+        table = ScrapedData.__table__
+        statement = (
+            update(table)
+            .where(table.c.url == bindparam("b_url"))
+            .values(
+                last_accessed_at=bindparam("b_accessed_at"),
+                hit_count=func.coalesce(table.c.hit_count, 0) + bindparam("b_hits"),
+            )
+        )
+        params = [
+            {"b_url": url, "b_accessed_at": accessed_at, "b_hits": hits}
+            for url, (accessed_at, hits) in accesses.items()
+        ]
+        try:
+            db.session.execute(statement, params)
+            db.session.commit()
+        except exc.SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"AVISO: Não foi possível gravar os acessos ao cache: {e}")
+            return 0
+        return len(params)
+
+    def _delete_batch(self, criterion=None, order_by=None, limit=None):
+        """ Apaga até 'limit' registos (por id), numa transação curta. """
+        ids = select(ScrapedData.id)
+        if criterion is not None:
+            ids = ids.where(criterion)
+        if order_by is not None:
+            ids = ids.order_by(order_by)
+        ids = ids.limit(limit or self.batch_size)
+
+        result = db.session.execute(
+            delete(ScrapedData).where(ScrapedData.id.in_(ids.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def purge_expired(self):
+        """ Apaga, em lotes, os registos que já nem para o refresh incremental servem. """
+        if self.purge_after <= 0:
+            return 0
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.purge_after)
+
+        total = 0
+        try:
+            while not self._stop.is_set():
+                deleted = self._delete_batch(criterion=ScrapedData.scraped_at < cutoff)
+                total += deleted
+                if deleted < self.batch_size:
+                    break
+        except exc.SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"AVISO: Purga do cache interrompida: {e}")
+        return total
+
+    def _rows_over_budget(self):
+        """ Quantos registos é preciso despejar para cumprir o orçamento. """
+        count = db.session.execute(select(func.count(ScrapedData.id))).scalar()
+
+        total_bytes = 0
+        if self.max_bytes and db.engine.dialect.name == 'postgresql':
+            total_bytes = db.session.execute(select(func.coalesce(func.sum(
+                func.pg_column_size(ScrapedData.data)
+                + func.coalesce(func.pg_column_size(ScrapedData.subpages_blob), 0)
+                + func.coalesce(func.pg_column_size(ScrapedData.page_meta), 0)
+            ), 0))).scalar()
+
+        excess = 0
+        if self.max_rows and count > self.max_rows:
+            excess = count - self.max_rows
+        if self.max_bytes and count and total_bytes > self.max_bytes:
+            # Estimativa pelo tamanho médio (evita recalcular a soma a cada lote)
+            average = total_bytes / count
+            excess = max(excess, math.ceil((total_bytes - self.max_bytes) / average))
+        return excess
+
+    def enforce_budget(self):
+        """ Despeja os registos menos acedidos até caber no orçamento. """
+        if not self.max_rows and not self.max_bytes:
+            return 0
+
+        total = 0
+        try:
+            excess = self._rows_over_budget()
+            while excess > 0 and not self._stop.is_set():
+                deleted = self._delete_batch(order_by=_lru_order(), limit=min(excess, self.batch_size))
+                if not deleted:
+                    break
+                total += deleted
+                excess -= deleted
+        except exc.SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"AVISO: Despejo do cache interrompido: {e}")
+        return total
+
+
+cache_maintainer = CacheMaintainer()
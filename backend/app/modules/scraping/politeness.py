@@ -0,0 +1,268 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from app.utils import TTLCache
+from app.modules.metrics.instruments import timed_stage
+
+
+class HostSlotTimeout(Exception):
+    """Não foi possível obter vaga para o host dentro do tempo de espera."""
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.active = 0
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def ready_at(self, now):
+        """ Momento em que haverá um token disponível (token bucket). """
+        if self.rate <= 0:
+            return now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class _Ticket:
+    def __init__(self, host):
+        self.host = host
+        self.granted = False
+
+
+class HostScheduler:
+    """
+    (V10.2) "Educação" por host entre o serviço e os fetchers.
+
+    - Token bucket por host (SCRAPER_HOST_RATE pedidos/s, rajada SCRAPER_HOST_BURST);
+    - Concorrência máxima por host (SCRAPER_HOST_MAX_CONCURRENCY) e global
+      (SCRAPER_GLOBAL_MAX_CONCURRENCY);
+    - Crawl-delay do robots.txt (limita o ritmo do host a 1 pedido por
+      'crawl-delay' segundos, com teto SCRAPER_MAX_CRAWL_DELAY);
+    - Fila justa: quando abre uma vaga global, os hosts com pedidos à espera
+      são atendidos em round-robin (um site com 100 URLs no lote não bloqueia
+      os outros).
+
+    Uso:
+        with host_scheduler.slot(url):
+            ... um pedido ao host ...
+    """
+
+    MAX_TRACKED_HOSTS = 1000
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.host_max_concurrency = 2
+        self.host_rate = 1.0
+        self.host_burst = 3
+        self.global_max_concurrency = 16
+        self.slot_timeout = 60
+        self.respect_robots = True
+        self.max_crawl_delay = 10
+        self.robots_timeout = 5
+        self.robots_cache = TTLCache(maxsize=2000, ttl=3600)
+        self.session = None  # Sessão HTTP (partilhada com o PageFetcher) para o robots.txt
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Vaga libertada / pedido novo
+        self._hosts = {}        # host -> _HostState
+        self._queues = {}       # host -> deque de _Ticket
+        self._round_robin = deque()  # hosts com pedidos à espera, pela ordem de vez
+        self._global_active = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("SCRAPER_POLITENESS", self.enabled)
+        self.host_max_concurrency = app.config.get("SCRAPER_HOST_MAX_CONCURRENCY", self.host_max_concurrency)
+        self.host_rate = app.config.get("SCRAPER_HOST_RATE", self.host_rate)
+        self.host_burst = app.config.get("SCRAPER_HOST_BURST", self.host_burst)
+        self.global_max_concurrency = app.config.get("SCRAPER_GLOBAL_MAX_CONCURRENCY", self.global_max_concurrency)
+        self.slot_timeout = app.config.get("SCRAPER_HOST_SLOT_TIMEOUT", self.slot_timeout)
+        self.respect_robots = app.config.get("SCRAPER_RESPECT_ROBOTS", self.respect_robots)
+        self.max_crawl_delay = app.config.get("SCRAPER_MAX_CRAWL_DELAY", self.max_crawl_delay)
+        self.robots_timeout = app.config.get("SCRAPER_ROBOTS_TIMEOUT", self.robots_timeout)
+        self.robots_cache = TTLCache(
+            maxsize=self.robots_cache.maxsize,
+            ttl=app.config.get("SCRAPER_ROBOTS_TTL_SECONDS", self.robots_cache.ttl),
+        )
+
+    # --------------------------------------------------------------------------
+    # robots.txt
+    # --------------------------------------------------------------------------
+
+    def crawl_delay(self, scheme, host, user_agent="*"):
+        """ Crawl-delay (segundos) do robots.txt do host, ou None. Em cache por host. """
+        cached = self.robots_cache.get(host)
+        if cached is not None:
+            return cached or None
+
+        delay = 0
+        try:
+            getter = self.session.get if self.session is not None else requests.get
+            response = getter(f"{scheme}://{host}/robots.txt", timeout=self.robots_timeout)
+            if response.status_code == 200:
+                parser = RobotFileParser()
+                parser.parse(response.text.splitlines())
+                delay = parser.crawl_delay(user_agent) or parser.crawl_delay("*") or 0
+        except requests.RequestException as e:
+            print(f"AVISO: robots.txt indisponível para {host}: {e}")
+
+        if delay and delay > self.max_crawl_delay:
+            print(f"AVISO: Crawl-delay de {delay}s em {host} acima do teto; usando {self.max_crawl_delay}s.")
+            delay = self.max_crawl_delay
+        self.robots_cache.set(host, float(delay))
+        return float(delay) or None
+
+    def _host_state(self, host, crawl_delay):
+        state = self._hosts.get(host)
+        if state is None:
+            rate, burst = self.host_rate, self.host_burst
+            if crawl_delay:
+                # O crawl-delay manda: no máximo 1 pedido a cada 'crawl_delay' segundos
+                delay_rate = 1.0 / crawl_delay
+                rate = min(rate, delay_rate) if rate > 0 else delay_rate
+                burst = 1
+            state = _HostState(rate, burst)
+            self._hosts[host] = state
+        return state
+
+    # --------------------------------------------------------------------------
+    # Fila justa
+    # --------------------------------------------------------------------------
+
+    def _dispatch(self):
+        """
+        Entrega vagas (com o lock adquirido): percorre os hosts à espera em
+        round-robin e libera o primeiro pedido de cada host que tenha vaga e token.
+        Retorna em quantos segundos vale a pena tentar de novo (espera por token).
+        """
+        now = time.monotonic()
+        next_try = None
+
+        while self._global_active < self.global_max_concurrency and self._round_robin:
+            picked = None
+            for host in list(self._round_robin):
+                queue = self._queues.get(host)
+                if not queue:
+                    self._round_robin.remove(host)
+                    continue
+                state = self._hosts[host]
+                if state.active >= self.host_max_concurrency:
+                    continue
+                ready_at = state.ready_at(now)
+                if ready_at > now:
+                    next_try = ready_at - now if next_try is None else min(next_try, ready_at - now)
+                    continue
+                picked = host
+                break
+
+            if picked is None:
+                break
+
+            ticket = self._queues[picked].popleft()
+            state = self._hosts[picked]
+            state.consume()
+            state.active += 1
+            self._global_active += 1
+            ticket.granted = True
+
+            # Vai para o fim da fila de vez (ou sai dela, se não tem mais pedidos)
+            self._round_robin.remove(picked)
+            if self._queues[picked]:
+                self._round_robin.append(picked)
+
+        return next_try
+
+    def acquire(self, url, timeout=None):
+        """ Espera a vez do host da URL. Levanta HostSlotTimeout. Retorna o host. """
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        timeout = self.slot_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        crawl_delay = None
+        if self.respect_robots and host and host not in self._hosts:
+            crawl_delay = self.crawl_delay(parsed.scheme or "https", host)
+
+        ticket = _Ticket(host)
+        with self._lock:
+            if len(self._hosts) > self.MAX_TRACKED_HOSTS:
+                self._prune_idle_hosts()
+            self._host_state(host, crawl_delay)
+            self._queues.setdefault(host, deque()).append(ticket)
+            if host not in self._round_robin:
+                self._round_robin.append(host)
+            next_try = self._dispatch()
+            if ticket.granted:
+                return host
+
+            # Acorda a cada vaga libertada (notify_all) ou quando um token fica pronto
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[host].remove(ticket)
+                    raise HostSlotTimeout(f"Sem vaga para {host} após {timeout}s.")
+                self._changed.wait(min(remaining, next_try) if next_try else remaining)
+                next_try = self._dispatch()
+
+        return host
+
+    def release(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None and state.active > 0:
+                state.active -= 1
+            self._global_active = max(0, self._global_active - 1)
+            self._dispatch()
+            self._changed.notify_all()
+
+    def _prune_idle_hosts(self):
+        """
+        Descarta (com o lock adquirido) o estado de hosts ociosos e com o
+        bucket cheio - evita crescer sem limite; o robots.txt fica no cache.
+        """
+        now = time.monotonic()
+        for host, state in list(self._hosts.items()):
+            if state.active or self._queues.get(host):
+                continue
+            state.ready_at(now)  # Reabastece os tokens até agora
+            if state.tokens >= state.burst:
+                del self._hosts[host]
+                self._queues.pop(host, None)
+
+    @contextmanager
+    def slot(self, url, timeout=None):
+        """ Segura uma vaga do host durante UM pedido. """
+        if not self.enabled:
+            yield
+            return
+
+        with timed_stage("host_wait"):
+            host = self.acquire(url, timeout)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "global_active": self._global_active,
+                "hosts_waiting": len(self._round_robin),
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+            }
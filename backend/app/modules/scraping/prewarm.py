@@ -0,0 +1,279 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import exc, func, or_, select, update
+
+from app.extensions import db
+from app.models import ScrapedData, TrackedAccount
+from app.modules.metrics.instruments import CACHE_PREWARMS, log_event
+from app.modules.scraping.cache import scrape_cache
+from app.modules.scraping.maintenance import cache_maintainer
+from app.modules.scraping.singleflight import pg_advisory_lock
+from app.utils import normalize_url
+
+
+def parse_window(window):
+    """
+    "HH:MM-HH:MM" -> (datetime.time início, datetime.time fim); a janela pode
+    atravessar a meia-noite ("22:00-05:00"). Vazio -> None (a qualquer hora).
+    """
+    if not window or not window.strip():
+        return None
+    try:
+        start, end = (datetime.datetime.strptime(part.strip(), "%H:%M").time() for part in window.split("-"))
+    except ValueError:
+        raise ValueError(f"Janela inválida: '{window}' (formato esperado: 'HH:MM-HH:MM').")
+    return start, end
+
+
+def in_window(window, now):
+    """ 'now' (hora local) está dentro da janela? """
+    if window is None:
+        return True
+    start, end = window
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def next_window_start(window, now):
+    """ Próxima abertura da janela (hora local) depois de 'now'. """
+    start = datetime.datetime.combine(now.date(), window[0])
+    if start <= now:
+        start += datetime.timedelta(days=1)
+    return start
+
+
+class CachePrewarmer:
+    """
+    (V10.8) Pré-aquecimento do cache das contas acompanhadas (tracked_accounts)
+    numa thread em background, para que os vendedores quase nunca esperem
+    por um scrape completo:
+
+    - só corre dentro da janela fora de pico (SCRAPE_PREWARM_WINDOW, hora local);
+    - renova os registos que EXPIRARIAM antes da próxima janela (mais uma
+      margem, SCRAPE_PREWARM_LEAD_SECONDS) e os que ainda não existem;
+    - prioridade: os mais acedidos ('hit_count') e os acedidos mais recentemente
+      (os acessos pendentes em memória são gravados no início de cada ciclo);
+    - ritmo limitado (SCRAPE_PREWARM_RATE_PER_MINUTE, SCRAPE_PREWARM_CONCURRENCY),
+      para não competir com os pedidos interativos pelos drivers e pelo Gemini;
+    - corre sob um pg_try_advisory_lock: com vários workers do gunicorn, só
+      um deles pré-aquece em cada ciclo.
+    """
+
+    LOCK_KEY = "scrape-cache-prewarm"
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 60
+        self.window = parse_window("01:00-06:00")
+        self.rate_per_minute = 10.0
+        self.concurrency = 2
+        self.lead_seconds = 3600
+        self.retry_seconds = 3600
+        self.batch_size = 50
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._running = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get("SCRAPE_PREWARM_INTERVAL", self.interval)
+        self.window = parse_window(app.config.get("SCRAPE_PREWARM_WINDOW", "01:00-06:00"))
+        self.rate_per_minute = app.config.get("SCRAPE_PREWARM_RATE_PER_MINUTE", self.rate_per_minute)
+        self.concurrency = max(1, app.config.get("SCRAPE_PREWARM_CONCURRENCY", self.concurrency))
+        self.lead_seconds = app.config.get("SCRAPE_PREWARM_LEAD_SECONDS", self.lead_seconds)
+        self.retry_seconds = app.config.get("SCRAPE_PREWARM_RETRY_SECONDS", self.retry_seconds)
+        self.batch_size = app.config.get("SCRAPE_PREWARM_BATCH", self.batch_size)
+
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="scrape-cache-prewarmer", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """ Pede um ciclo imediato, mesmo fora da janela. False se a thread está desligada. """
+        if self._thread is None:
+            return False
+        self._wake.set()
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            forced = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                with self.app.app_context():
+                    self.run_once(ignore_window=forced)
+            except Exception as e:
+                print(f"AVISO: Pré-aquecimento do cache falhou: {e}")
+
+    # --------------------------------------------------------------------------
+    # Seleção das contas a renovar
+    # --------------------------------------------------------------------------
+
+    def refresh_before(self, now=None):
+        """
+        Data (UTC) antes da qual um registo tem de ser renovado já: é a que
+        o faria expirar antes da próxima janela (+ a margem). Nunca passa da
+        abertura da janela atual (o que já foi renovado nesta janela fica).
+        Sem janela, renova o que expira nos próximos 'lead_seconds'.
+        """
+        utc_offset = datetime.datetime.utcnow() - datetime.datetime.now()
+        now = now or datetime.datetime.now()
+        horizon = now + datetime.timedelta(seconds=self.lead_seconds)
+        if self.window is None:
+            return horizon - datetime.timedelta(seconds=scrape_cache.ttl) + utc_offset
+
+        next_start = next_window_start(self.window, now)
+        horizon += next_start - now
+        current_start = next_start - datetime.timedelta(days=1)
+        return min(horizon - datetime.timedelta(seconds=scrape_cache.ttl), current_start) + utc_offset
+
+    def candidates(self, refresh_before, limit):
+        """
+        Contas ativas cujo registo no cache falta ou expira antes de
+        'refresh_before', das mais acedidas para as menos. As que falharam há
+        pouco (SCRAPE_PREWARM_RETRY_SECONDS) ficam de fora. Retorna [(id, url)].
+        """
+        retry_cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.retry_seconds)
+        statement = (
+            select(TrackedAccount.id, TrackedAccount.url)
+            .outerjoin(ScrapedData, ScrapedData.url == TrackedAccount.url)
+            .where(
+                TrackedAccount.active.is_(True),
+                or_(ScrapedData.id.is_(None), ScrapedData.scraped_at < refresh_before),
+                or_(TrackedAccount.last_prewarm_at.is_(None), TrackedAccount.last_prewarm_at < retry_cutoff),
+            )
+            .order_by(
+                func.coalesce(ScrapedData.hit_count, 0).desc(),
+                ScrapedData.last_accessed_at.desc().nulls_last(),
+                ScrapedData.scraped_at.asc().nulls_first(),
+            )
+            .limit(limit)
+        )
+        return [(row.id, row.url) for row in db.session.execute(statement)]
+
+    # --------------------------------------------------------------------------
+    # Um ciclo de pré-aquecimento
+    # --------------------------------------------------------------------------
+
+    def run_once(self, ignore_window=False):
+        """
+        Renova, ao ritmo configurado, as contas que expirariam antes da
+        próxima janela. Fora da janela só corre com 'ignore_window' (admin).
+        Retorna um resumo.
+        """
+        summary = {"renovados": 0, "falhas": 0}
+        # A prioridade vem do 'hit_count': grava os acessos pendentes mesmo com a
+        # manutenção do cache desligada (SCRAPE_CACHE_MAINTENANCE_INTERVAL=0)
+        cache_maintainer.flush_accesses()
+        if not ignore_window and not in_window(self.window, datetime.datetime.now()):
+            return summary
+        if not self._running.acquire(blocking=False):
+            return summary  # Já há um ciclo em curso neste processo
+
+        try:
+            with pg_advisory_lock(db.engine, self.LOCK_KEY, wait=False) as acquired:
+                if not acquired and db.engine.dialect.name == 'postgresql':
+                    return summary  # Outro processo já está a pré-aquecer
+                self._run(summary, ignore_window)
+        finally:
+            self._running.release()
+
+        if summary["renovados"] or summary["falhas"]:
+            print(f"CACHE PREWARM: {summary}")
+            log_event("cache_prewarm", **summary)
+        return summary
+
+    def _run(self, summary, ignore_window):
+        refresh_before = self.refresh_before()
+        pace = 60.0 / self.rate_per_minute if self.rate_per_minute > 0 else 0.0
+        slots = threading.BoundedSemaphore(self.concurrency)
+        summary_lock = threading.Lock()
+        attempted = set()
+        next_start = time.monotonic()
+
+        def _done(future):
+            ok = future.exception() is None and future.result()
+            with summary_lock:
+                summary["renovados" if ok else "falhas"] += 1
+            slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cache-prewarm") as executor:
+            while not self._stop.is_set():
+                try:
+                    batch = [
+                        (account_id, url) for account_id, url in self.candidates(refresh_before, self.batch_size)
+                        if account_id not in attempted
+                    ]
+                except exc.SQLAlchemyError as e:
+                    db.session.rollback()
+                    print(f"AVISO: Não foi possível listar as contas a pré-aquecer: {e}")
+                    break
+                if not batch:
+                    break
+
+                for account_id, url in batch:
+                    if self._stop.is_set():
+                        break
+                    if not ignore_window and not in_window(self.window, datetime.datetime.now()):
+                        return  # A janela fechou: o resto fica para a próxima
+                    slots.acquire()
+                    delay = next_start - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        slots.release()
+                        break
+                    next_start = max(next_start, time.monotonic()) + pace
+                    attempted.add(account_id)
+                    executor.submit(self._prewarm_one, account_id, url, refresh_before).add_done_callback(_done)
+
+                # Espera o lote terminar: o próximo já vê os registos gravados
+                for _ in range(self.concurrency):
+                    slots.acquire()
+                for _ in range(self.concurrency):
+                    slots.release()
+
+    def _prewarm_one(self, account_id, url, refresh_before):
+        """ Faz o scrape de uma conta (no contexto da app). Retorna True se correu bem. """
+        # Import tardio: o services importa o Selenium e o Gemini
+        from .services import _scrape_coalesced
+
+        error = None
+        with self.app.app_context():
+            try:
+                url, base_url = normalize_url(url)
+                _scrape_coalesced(url, base_url, refresh_before=refresh_before)
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                print(f"AVISO: Pré-aquecimento de {url} falhou: {error}")
+
+            try:
+                db.session.execute(
+                    update(TrackedAccount)
+                    .where(TrackedAccount.id == account_id)
+                    .values(last_prewarm_at=datetime.datetime.utcnow(), last_prewarm_error=error)
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            except exc.SQLAlchemyError as e:
+                db.session.rollback()
+                print(f"AVISO: Não foi possível gravar o pré-aquecimento de {url}: {e}")
+
+        CACHE_PREWARMS.labels(outcome="error" if error else "ok").inc()
+        return error is None
+
+
+cache_prewarmer = CachePrewarmer()
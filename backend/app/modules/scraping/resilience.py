@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """O serviço está a falhar (circuito aberto): a chamada nem é tentada."""
+
+
+class CircuitBreaker:
+    """
+    (V10.6) Circuit breaker para um serviço externo (o Gemini).
+
+    - "closed": as chamadas passam; 'failure_threshold' falhas SEGUIDAS abrem o circuito;
+    - "open": as chamadas são recusadas na hora (CircuitOpenError) durante
+      'reset_seconds' - uma indisponibilidade vira uma resposta rápida, não lenta;
+    - "half_open": passado esse tempo, UMA chamada de teste passa. Sucesso
+      fecha o circuito; falha volta a abri-lo.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(self, failure_threshold=5, reset_seconds=30, on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.on_state_change = on_state_change  # on_state_change(estado)
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def _set_state(self, state):
+        """ Muda de estado (com o lock adquirido). """
+        if state == self._state:
+            return
+        self._state = state
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        print(f"CIRCUIT BREAKER: Gemini -> {state}")
+        if self.on_state_change is not None:
+            self.on_state_change(state)
+
+    def allow(self):
+        """ Levanta CircuitOpenError se a chamada não deve ser tentada agora. """
+        with self._lock:
+            if self._state == self.OPEN:
+                retry_in = self._opened_at + self.reset_seconds - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpenError(f"Circuito aberto (nova tentativa em {retry_in:.0f}s).")
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError("Circuito meio-aberto: chamada de teste em curso.")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._set_state(self.OPEN)
+                # Reabre sempre com um período completo de espera
+                self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """ A chamada de teste terminou sem veredito (ex: erro do pedido, não do serviço). """
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """
+    Espera antes da tentativa 'attempt' (1 = primeira repetição): backoff
+    exponencial com "full jitter" (aleatório entre 0 e o teto), para que
+    vários workers não repitam todos ao mesmo tempo.
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify
+import json
+from urllib.parse import urlparse
+from flask import request, jsonify, url_for, Response, stream_with_context, current_app
 from . import scraping_bp 
-from .services import get_scraped_data_service 
+from .services import get_scraped_data_service, scrape_batch_service, scrape_stream_service
+from .jobs import job_runner, JobQueueFull
+from .search import InvalidSearch, build_filters, search_dossiers
+from app.models import ScrapeJob
+from app.extensions import db
 from flask_jwt_extended import jwt_required 
+from sqlalchemy import exc
 
 # /api/v1/scraping/scrape
 @scraping_bp.route('/scrape', methods=['POST'])
@@ -21,4 +28,178 @@ def scrape_website():
     except Exception as e:
         # Captura erros (ex: Timeout, API Key inválida, etc.)
         print(f"ERRO GERAL na Rota de Scrape: {e}")
-        return jsonify({"error": f"Falha no scraping: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Falha no scraping: {str(e)}"}), 500
+
+# /api/v1/scraping/scrape/stream
+@scraping_bp.route('/scrape/stream', methods=['POST'])
+@jwt_required()
+def scrape_website_stream():
+    """
+    Mesmo scrape do /scrape, mas em Server-Sent Events: cada etapa é enviada
+    assim que fica pronta (home, subpage, tech, ai) e, no fim, "done" com o
+    resultado completo. Em caso de falha, um evento "error".
+    """
+    data = request.get_json()
+    url = data.get('url')
+
+    if not url:
+        return jsonify({"error": "URL é obrigatória"}), 400
+
+    def generate():
+        try:
+            for event, payload in scrape_stream_service(url):
+                if event == "heartbeat":
+                    yield ": keep-alive\n\n"  # Comentário SSE (ignorado pelo cliente)
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+        except Exception as e:
+            print(f"ERRO GERAL na Rota de Scrape (stream): {e}")
+            yield f"event: error\ndata: {json.dumps({'error': f'Falha no scraping: {e}'})}\n\n"
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Sem buffer no nginx (eventos chegam na hora)
+    return response
+
+def _is_http_url(value):
+    """ True se 'value' é uma string com uma URL http(s) com host. """
+    if not isinstance(value, str) or not value.strip():
+        return False
+    parsed = urlparse(value.strip())
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+# /api/v1/scraping/batch
+@scraping_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def scrape_batch():
+    """
+    Scrape de uma lista de URLs. A resposta é NDJSON (um JSON por linha),
+    enviada em streaming à medida que cada URL termina.
+    """
+    data = request.get_json()
+    urls = data.get('urls')
+
+    if not urls or not isinstance(urls, list):
+        return jsonify({"error": "'urls' deve ser uma lista não vazia"}), 400
+
+    max_urls = current_app.config.get("SCRAPE_BATCH_MAX_URLS", 500)
+    if len(urls) > max_urls:
+        return jsonify({"error": f"Máximo de {max_urls} URLs por lote"}), 400
+
+    # Valida o lote todo ANTES do streaming: depois do 200 já não há como devolver 400
+    invalid = [index for index, item in enumerate(urls) if not _is_http_url(item)]
+    if invalid:
+        return jsonify({
+            "error": "Todas as 'urls' devem ser URLs http(s) não vazias",
+            "invalid_indexes": invalid[:20]
+        }), 400
+    urls = [item.strip() for item in urls]
+
+    concurrency = current_app.config.get("SCRAPE_BATCH_CONCURRENCY", 4)
+
+    def generate():
+        for item in scrape_batch_service(urls, concurrency=concurrency):
+            yield json.dumps(item, default=str) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# --- Jobs Assíncronos ---
+
+# /api/v1/scraping/jobs
+@scraping_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def submit_scrape_job():
+    """
+    Cria um job de scrape em background e retorna o job_id imediatamente (202).
+    O resultado é consultado depois em GET /jobs/<job_id>.
+    """
+    data = request.get_json()
+    url = data.get('url')
+
+    if not url:
+        return jsonify({"error": "URL é obrigatória"}), 400
+
+    try:
+        job = job_runner.submit(url)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Erro de banco de dados: {e}"}), 500
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('scraping.get_scrape_job', job_id=job.id)
+    }), 202
+
+
+# /api/v1/scraping/jobs/<job_id>
+@scraping_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_scrape_job(job_id):
+    """ Retorna o estado do job (e o resultado, quando concluído). """
+    try:
+        job = db.session.get(ScrapeJob, job_id)
+    except exc.SQLAlchemyError as e:
+        return jsonify({"error": f"Erro de banco de dados: {e}"}), 500
+
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+
+    return jsonify(job.to_dict()), 200
+
+
+# --- Pesquisa nos dossiês em cache ---
+
+def _list_arg(name):
+    """ Valores de um filtro repetido (?tech=A&tech=B) ou separado por vírgulas (?tech=A,B). """
+    return [value.strip() for raw in request.args.getlist(name) for value in raw.split(',') if value.strip()]
+
+
+# /api/v1/scraping/search
+@scraping_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_cached_dossiers():
+    """
+    Pesquisa nos sites já analisados (cache), sem novo scrape. Filtros (AND):
+    tech, tech_any, without_tech, social, without_social, email, social_link,
+    has_email (true/false) e q (texto no assunto/público da análise da AI).
+    Ex: ?tech=RD Station&without_tech=Hotjar. Paginação: 'limit' e o
+    'next_cursor' da resposta anterior em 'cursor'.
+    """
+    default_limit = current_app.config.get("SEARCH_DEFAULT_LIMIT", 50)
+    max_limit = current_app.config.get("SEARCH_MAX_LIMIT", 200)
+    try:
+        limit = min(max(1, int(request.args.get('limit', default_limit))), max_limit)
+    except ValueError:
+        return jsonify({"error": "'limit' deve ser um número"}), 400
+
+    has_email = request.args.get('has_email')
+    if has_email is not None:
+        if has_email.lower() not in ('true', 'false'):
+            return jsonify({"error": "'has_email' deve ser 'true' ou 'false'"}), 400
+        has_email = has_email.lower() == 'true'
+
+    try:
+        criteria = build_filters(
+            tech=_list_arg('tech'),
+            tech_any=_list_arg('tech_any'),
+            without_tech=_list_arg('without_tech'),
+            social=_list_arg('social'),
+            without_social=_list_arg('without_social'),
+            email=request.args.get('email'),
+            social_link=request.args.get('social_link'),
+            has_email=has_email,
+            q=request.args.get('q'),
+        )
+        items, next_cursor = search_dossiers(criteria, limit=limit, cursor=request.args.get('cursor'))
+    except InvalidSearch as e:
+        return jsonify({"error": str(e)}), 400
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Erro na pesquisa de dossiês: {e}")
+        return jsonify({"error": f"Erro de banco de dados: {e}"}), 500
+
+    return jsonify({"items": items, "next_cursor": next_cursor}), 200
@@ -0,0 +1,157 @@
+import base64
+import json
+
+from sqlalchemy import and_, bindparam, cast, func, literal_column, not_, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR, array
+from sqlalchemy.types import Text
+
+from app.extensions import db
+from app.models import (
+    REDES_SOCIAIS_DOMINIOS,
+    SEARCH_EMAILS_EXPR,
+    SEARCH_LINKS_SOCIAIS_EXPR,
+    SEARCH_REDES_SOCIAIS_EXPR,
+    SEARCH_TECNOLOGIAS_EXPR,
+    SEARCH_TS_CONFIG,
+    SEARCH_TSV_EXPR,
+    ScrapedData,
+)
+
+
+class InvalidSearch(ValueError):
+    """Filtro ou cursor inválido (a rota responde 400)."""
+
+
+# As MESMAS expressões dos índices GIN (ver models.py) - senão o Postgres não os usa
+_TECNOLOGIAS = literal_column(SEARCH_TECNOLOGIAS_EXPR, JSONB)
+_EMAILS = literal_column(SEARCH_EMAILS_EXPR, JSONB)
+_LINKS_SOCIAIS = literal_column(SEARCH_LINKS_SOCIAIS_EXPR, JSONB)
+_REDES_SOCIAIS = literal_column(SEARCH_REDES_SOCIAIS_EXPR, ARRAY(Text))
+_ANALISE_TSV = literal_column(SEARCH_TSV_EXPR, TSVECTOR)
+
+_DOSSIE = ScrapedData.data["dossie_pagina_principal"]
+
+
+def _text_array(values):
+    """ ARRAY[...]::text[] (os operadores de arrays não aceitam varchar[] contra text[]). """
+    return cast(array(values, type_=Text), ARRAY(Text))
+
+
+def _social_networks(values):
+    """ 'instagram', 'instagram.com', 'wa.me'... -> nomes das redes (chaves de REDES_SOCIAIS_DOMINIOS). """
+    networks = []
+    for value in values:
+        value = value.strip().lower()
+        for rede, dominios in REDES_SOCIAIS_DOMINIOS.items():
+            if value == rede or value in dominios:
+                networks.append(rede)
+                break
+        else:
+            raise InvalidSearch(
+                f"Rede social desconhecida: '{value}' (use {', '.join(REDES_SOCIAIS_DOMINIOS)})."
+            )
+    return networks
+
+
+def encode_cursor(row_id):
+    """ Cursor opaco da paginação por keyset: o id do último item. """
+    raw = json.dumps([row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        (row_id,) = json.loads(raw)
+        return int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidSearch(f"Cursor inválido: {e}")
+
+
+def build_filters(tech=(), tech_any=(), without_tech=(), social=(), without_social=(),
+                  email=None, social_link=None, has_email=None, q=None):
+    """
+    Critérios SQL (combinados com AND) a partir dos filtros da pesquisa:
+    - tech: tem TODAS estas tecnologias (nomes exatos da detecção, ex: "VTEX");
+    - tech_any: tem PELO MENOS UMA; without_tech: não tem NENHUMA;
+    - social / without_social: redes sociais (linkedin, facebook, instagram, twitter, whatsapp);
+    - email / social_link: um e-mail ou link social exato;
+    - has_email: tem (ou não) algum e-mail;
+    - q: texto livre no 'main_subject' e 'target_audience' da análise da AI.
+    """
+    criteria = []
+    if tech:
+        criteria.append(_TECNOLOGIAS.has_all(_text_array(list(tech))))
+    if tech_any:
+        criteria.append(_TECNOLOGIAS.has_any(_text_array(list(tech_any))))
+    if without_tech:
+        # Sem tecnologias detectadas conta como "não tem"
+        criteria.append(or_(
+            _TECNOLOGIAS.is_(None),
+            not_(_TECNOLOGIAS.has_any(_text_array(list(without_tech)))),
+        ))
+    if social:
+        criteria.append(_REDES_SOCIAIS.contains(_text_array(_social_networks(social))))
+    if without_social:
+        criteria.append(not_(_REDES_SOCIAIS.overlap(_text_array(_social_networks(without_social)))))
+    if email:
+        criteria.append(_EMAILS.has_key(bindparam("b_email", email.strip(), type_=Text)))
+    if social_link:
+        criteria.append(_LINKS_SOCIAIS.has_key(bindparam("b_social_link", social_link.strip(), type_=Text)))
+    if has_email is not None:
+        has_any_email = func.coalesce(func.jsonb_array_length(_EMAILS), 0) > 0
+        criteria.append(has_any_email if has_email else not_(has_any_email))
+    if q and q.strip():
+        query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig"), q.strip())
+        criteria.append(_ANALISE_TSV.op('@@')(query))
+    return criteria
+
+
+def search_dossiers(criteria, limit=50, cursor=None):
+    """
+    (V10.9) Pesquisa nos dossiês já em cache (sem re-scrape), pela ordem em
+    que os sites ENTRARAM no cache (o 'id', dos mais novos para os mais
+    antigos) - não pela data da última análise: um site antigo re-analisado
+    hoje continua no lugar dele. Paginação por keyset no 'id' (chave
+    primária): cada página custa o mesmo, seja a 1ª ou a 1000ª (sem OFFSET). (V10.10) Não no 'scraped_at': esse muda a cada
+    refresh, pré-aquecimento ou invalidação, e um registo podia saltar de
+    página a meio da paginação (repetido ou nunca listado). O 'id' não muda
+    (o upsert do cache mantém-no).
+    Retorna (itens, próximo cursor ou None). Pode levantar SQLAlchemyError.
+    """
+    statement = select(
+        ScrapedData.id,
+        ScrapedData.url,
+        ScrapedData.scraped_at,
+        _DOSSIE["titulo"].astext.label("titulo"),
+        _TECNOLOGIAS.label("tecnologias_detetadas"),
+        _LINKS_SOCIAIS.label("links_sociais"),
+        _EMAILS.label("emails_encontrados"),
+        _DOSSIE["analise_ia"]["main_subject"].astext.label("main_subject"),
+        _DOSSIE["analise_ia"]["target_audience"].astext.label("target_audience"),
+    )
+    if criteria:
+        statement = statement.where(and_(*criteria))
+    if cursor:
+        statement = statement.where(ScrapedData.id < decode_cursor(cursor))
+
+    # Um item a mais só para saber se há próxima página
+    statement = statement.order_by(ScrapedData.id.desc()).limit(limit + 1)
+    rows = db.session.execute(statement).all()
+
+    items = [{
+        "url": row.url,
+        "scraped_at": row.scraped_at,
+        "titulo": row.titulo,
+        "tecnologias_detetadas": row.tecnologias_detetadas or [],
+        "links_sociais": row.links_sociais or [],
+        "emails_encontrados": row.emails_encontrados or [],
+        "main_subject": row.main_subject,
+        "target_audience": row.target_audience,
+    } for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.id)
+    return items, next_cursor
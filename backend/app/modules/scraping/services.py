@@ -1,22 +1,32 @@
 import os
-import datetime
-import re
-import json
-from bs4 import BeautifulSoup
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from sqlalchemy import exc
-from urllib.parse import urlparse, urljoin
+from sqlalchemy.orm import undefer
+from flask import current_app
 
 # --- Importações do Selenium ---\
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
 
-# --- Importar o "Cérebro" (Google AI) ---\
-import google.generativeai as genai
+from .driver_pool import DriverPool
+from .browser import SeleniumSettings
+from .fetchers import PageFetcher, USER_AGENT, looks_js_rendered
+from .politeness import HostScheduler
+from .frontier import LinkFrontier, discover_sitemap_urls
+from .extraction import extract_page
+from .tech_detection import get_tech_engine
+from .ai import PROMPT_REFINAMENTO_VERSION, PROMPT_RESUMO_VERSION, PROMPT_VERSION, gemini_client
+from .content import content_reducer
+from .singleflight import SingleFlight, pg_advisory_lock
+from .cache import scrape_cache
+from app.utils import TTLCache, normalize_url
+from app.modules.metrics.instruments import REQUEST_DURATION, log_event, timed, timed_stage, track_driver_pool
 
 # Configurar o caminho do driver
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -30,9 +40,13 @@ DRIVER_PATH = os.path.join(project_root, DRIVER_NAME)
 # 1. FUNÇÕES DO SELENIUM 
 # ==============================================================================
 
+# Estratégia de carregamento e bloqueio de recursos (configurado no create_app)
+selenium_settings = SeleniumSettings()
+
 def _init_selenium_driver():
     """
     Inicializa um driver do Chrome (Selenium) otimizado e headless.
+    (V9.11) Carregamento 'eager' e sem imagens, fontes, vídeos e trackers.
     """
     service = Service(executable_path=DRIVER_PATH)
     options = Options()
@@ -41,11 +55,12 @@ def _init_selenium_driver():
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920,1080")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    selenium_settings.apply_to_options(options)
     
     try:
         driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(20) # Timeout de 20 segundos
+        selenium_settings.apply_to_driver(driver) # Timeout de carregamento + bloqueio via DevTools
     except WebDriverException as e:
         print(f"ERRO CRÍTICO: Não foi possível encontrar o '{DRIVER_NAME}'.")
         print("Certifique-se de que o 'chromedriver' (ou 'chromedriver.exe') está na pasta raiz do projeto backend.")
@@ -53,367 +68,848 @@ def _init_selenium_driver():
     
     return driver
 
-def scrape_home_page_dossier(driver, url):
+# Pool de drivers do processo (configurado no create_app via init_app)
+driver_pool = DriverPool(_init_selenium_driver)
+track_driver_pool(driver_pool)
+
+# Limites por host (token bucket, concorrência, crawl-delay) com fila justa entre hosts
+host_scheduler = HostScheduler()
+
+# Fetch em dois níveis: HTTP primeiro, Selenium (pool) só quando necessário
+page_fetcher = PageFetcher(driver_pool, scheduler=host_scheduler)
+
+# Scrapes em curso por URL (pedidos simultâneos partilham o mesmo resultado)
+scrape_single_flight = SingleFlight()
+
+# (V10.10) Versão do formato do resultado (campos extraídos + prompts do Gemini),
+# gravada no page_meta. O refresh incremental só reaproveita um dossiê da
+# MESMA versão; um mais antigo (ex: sem 'versoes_tecnologias' ou
+# 'limites_atingidos', ou analisado por outro prompt) passa pelo pipeline completo.
+# Aumentar RESULT_SCHEMA_VERSION sempre que o dossiê ganhar ou mudar campos.
+RESULT_SCHEMA_VERSION = 2
+PAGE_META_VERSION = f"{RESULT_SCHEMA_VERSION}:{PROMPT_VERSION}:{PROMPT_REFINAMENTO_VERSION}:{PROMPT_RESUMO_VERSION}"
+
+# URLs do sitemap.xml por site (base_url), para não o reler a cada scrape
+sitemap_cache = TTLCache(maxsize=1000, ttl=6 * 3600)
+
+def build_home_dossier(url, extracao):
+    """ Compila o dossiê da página principal a partir da extração (extract_page). """
+    return {
+        "url": url,
+        "titulo": extracao["titulo"],
+        "h1_principal": extracao["h1_principal"],
+        "descricao_meta": extracao["descricao_meta"],
+        "meta_keywords": list(extracao["meta_keywords"]),
+        "emails_encontrados": list(extracao["emails"]),
+        "links_sociais": list(extracao["links_sociais"]),
+        "ctas_encontrados": list(extracao["ctas"]),
+        "contagem_palavras_home": extracao["contagem_palavras"],
+        "limites_atingidos": list(extracao["limites_atingidos"]),
+        # As chaves 'analise_ia' e 'tecnologias' serão adicionadas depois
+    }
+
+
+def _extract(page):
     """
-    (V7.0) Acessa a página principal e extrai o "dossiê" (título, H1, metas, links, etc.)
-    Retorna o (HTML, Dossiê JSON, Texto para AI)
+    extract_page do HTML buscado; os tetos atingidos (HTML truncado pelo
+    fetcher + os da extração) ficam em extracao["limites_atingidos"].
     """
-    print(f"Selenium acessando (página principal): {url}...")
-    driver.get(url)
-    
-    # Espera até que o <body> esteja presente
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.TAG_NAME, "body"))
-    )
-    
-    html_content = driver.page_source
-    soup = BeautifulSoup(html_content, 'html.parser')
+    extracao = extract_page(page["html"])
+    if page.get("truncated"):
+        extracao["limites_atingidos"].insert(0, "html_bytes")
+    if extracao["limites_atingidos"]:
+        print(f"AVISO: {page['url']} atingiu os limites: {', '.join(extracao['limites_atingidos'])}")
+    return extracao
+
+
+def scrape_home_page_dossier(url):
+    """
+    (V9.5) Acessa a página principal e extrai o "dossiê" (título, H1, metas, links, etc.)
+    Usa o HTTP (fast path) e só recorre ao Selenium se a página depender de JavaScript.
+    O HTML é analisado UMA única vez (extract_page); a extração completa
+    (texto, links internos, scripts...) é devolvida para as etapas seguintes.
+    Retorna (Página buscada, Dossiê JSON, Extração)
+    """
+    print(f"Acessando (página principal): {url}...")
+    with timed_stage("home_load", url=url):
+        page = page_fetcher.fetch(url)
     
     print("Página principal carregada, analisando...")
+    extracao = _extract(page)
+    dossie_json = build_home_dossier(url, extracao)
     
-    # 1. Extração de Metadados
-    titulo = soup.title.string if soup.title else ''
-    
-    # Pega o H1 (usa .get_text para limpar tags internas)
-    h1_tag = soup.find('h1')
-    h1_principal = h1_tag.get_text(strip=True) if h1_tag else ''
+    return page, dossie_json, extracao
 
-    # Pega a meta description
-    descricao_meta_tag = soup.find('meta', attrs={'name': 'description'})
-    descricao_meta = descricao_meta_tag['content'] if descricao_meta_tag and 'content' in descricao_meta_tag.attrs else ''
 
-    # Pega meta keywords
-    meta_keywords_tag = soup.find('meta', attrs={'name': 'keywords'})
-    keywords_raw = meta_keywords_tag['content'] if meta_keywords_tag and 'content' in meta_keywords_tag.attrs else ''
-    meta_keywords = [k.strip() for k in keywords_raw.split(',')] if keywords_raw else []
+def build_sub_page_dossier(link, extracao):
+    """ Compila o dossiê de uma sub-página (título + mapa de conteúdo H2/H3). """
+    return {
+        "url_visitada": link,
+        "titulo_da_pagina": extracao["titulo"],
+        "mapa_de_conteudo_headings": extracao["headings"],
+        "limites_atingidos": list(extracao["limites_atingidos"]),
+    }
 
-    # 2. Extração de Contatos (Email e Redes Sociais)
-    emails_encontrados = set(re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', html_content))
-    
-    links_sociais = set()
-    for a_tag in soup.find_all('a', href=True):
-        href = a_tag['href']
-        if any(rede in href for rede in ['linkedin.com', 'facebook.com', 'instagram.com', 'twitter.com', 'wa.me', 'whatsapp.com']):
-            links_sociais.add(href)
-
-    # 3. Extração de CTAs (Call-to-Action)
-    ctas_encontrados = set()
-    cta_keywords = ['contato', 'fale conosco', 'orçamento', 'saiba mais', 'agende', 'demonstração', 'teste grátis']
-    
-    # Procura em <a>
-    for a_tag in soup.find_all('a'):
-        text = a_tag.get_text(strip=True).lower()
-        if any(keyword in text for keyword in cta_keywords):
-            ctas_encontrados.add(a_tag.get_text(strip=True))
-            
-    # Procura em <button>
-    for btn_tag in soup.find_all('button'):
-        text = btn_tag.get_text(strip=True).lower()
-        if any(keyword in text for keyword in cta_keywords):
-            ctas_encontrados.add(btn_tag.get_text(strip=True))
-
-    # 4. Extração de Texto (para Contagem e para a AI)
-    texto_bruto = soup.get_text(separator=' ', strip=True)
-    contagem_palavras_home = len(texto_bruto.split())
-
-    # Compila o Dossiê
-    dossie_json = {
-        "url": url,
-        "titulo": titulo,
-        "h1_principal": h1_principal,
-        "descricao_meta": descricao_meta,
-        "meta_keywords": list(meta_keywords),
-        "emails_encontrados": list(emails_encontrados),
-        "links_sociais": list(links_sociais),
-        "ctas_encontrados": list(ctas_encontrados),
-        "contagem_palavras_home": contagem_palavras_home
-        # As chaves 'analise_ia' e 'tecnologias' serão adicionadas depois
+
+def _page_fingerprint(page, extracao):
+    """
+    "Impressão digital" de uma página: hash do texto extraído (ignora ruído de
+    markup como nonces e tokens) + validadores HTTP para revalidação barata.
+    """
+    headers = page.get("headers") or {}
+    return {
+        "fingerprint": hashlib.sha256(extracao["texto"].encode('utf-8')).hexdigest(),
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "via": page["via"],
     }
-    
-    return html_content, dossie_json, texto_bruto
 
 
-def scrape_sub_page_analysis(driver, base_url, soup_home):
+def _scrape_single_sub_page(link):
+    """
+    Acessa UMA sub-página (HTTP ou Selenium, via page_fetcher) e extrai o dossiê dela.
+    Retorna (Dossiê da Sub-página, Blocos de conteúdo da Sub-página, Impressão digital)
+    """
+    print(f"Acessando sub-página para análise profunda: {link}...")
+    with timed_stage("subpage_load", url=link):
+        page = page_fetcher.fetch(link)
+    extracao = _extract(page)
+    meta = dict(_page_fingerprint(page, extracao), url=link)
+    return build_sub_page_dossier(link, extracao), extracao["blocos"], meta
+
+
+def _sitemap_urls(base_url, max_urls, deadline=None):
+    """
+    URLs do sitemap.xml do site, do sitemap_cache ou lidas por HTTP (cada
+    pedido com no máximo SCRAPER_SITEMAP_FETCH_TIMEOUT segundos, nenhum
+    depois do 'deadline'). Uma descoberta cortada pelo prazo não fica em cache.
+    """
+    cached = sitemap_cache.get(base_url)
+    if cached is not None:
+        return cached
+
+    with timed_stage("sitemap", url=base_url):
+        urls, complete = discover_sitemap_urls(
+            page_fetcher.fetch_bytes, base_url, max_urls=max_urls, deadline=deadline,
+            fetch_timeout=current_app.config.get("SCRAPER_SITEMAP_FETCH_TIMEOUT", 3),
+        )
+    if complete:
+        sitemap_cache.set(base_url, urls, ttl=current_app.config.get("SCRAPER_SITEMAP_CACHE_TTL", 6 * 3600))
+    else:
+        print(f"AVISO: Prazo esgotado na leitura do sitemap de {base_url}. Usando só o que já chegou.")
+    return urls
+
+
+def select_sub_pages(base_url, links_home, page_url=None, max_pages=5, use_sitemap=False, sitemap_max_urls=5000,
+                     deadline=None):
     """
-    (V7.0) Acessa até 5 sub-páginas (ex: /sobre) e extrai
+    (V10.3) Escolhe as sub-páginas mais informativas (LinkFrontier):
+    links normalizados e sem duplicados, pontuados por palavra-chave no
+    caminho, texto âncora e profundidade. Com 'use_sitemap', as URLs do
+    sitemap.xml (lido por HTTP, sem renderizar) entram como candidatas.
+    (V10.10) O sitemap só é lido quando os links da home não chegam para
+    'max_pages' sub-páginas, fica em cache por site e respeita o 'deadline'
+    (time.monotonic()) do pipeline.
+    """
+    frontier = LinkFrontier(base_url, page_url)
+    frontier.add_links(links_home)
+    selecionados = frontier.select(max_pages)
+    if use_sitemap and len(selecionados) < max_pages:
+        sitemap_urls = _sitemap_urls(base_url, sitemap_max_urls, deadline)
+        if sitemap_urls:
+            print(f"Sitemap: {len(sitemap_urls)} URL(s) candidatas em {base_url}")
+            frontier.add_sitemap_urls(sitemap_urls)
+            selecionados = frontier.select(max_pages)
+    return selecionados
+
+
+def scrape_sub_page_analysis(base_url, links_home, max_workers=3, deadline_seconds=25, on_result=None,
+                             page_url=None, max_pages=5, use_sitemap=False, deadline=None):
+    """
+    (V9.1) Acessa até 'max_pages' sub-páginas (ex: /sobre) EM PARALELO e extrai
     o "mapa de conteúdo" (H2, H3) e o texto principal.
-    Retorna (Lista de Dossiês de Sub-página, Texto da Sub-página para AI)
+    Cada sub-página passa pelo page_fetcher; no máximo 'max_workers' ao mesmo tempo.
+    Ao atingir 'deadline_seconds', retorna o que já terminou (resultado parcial).
+    'deadline' (time.monotonic(), opcional) é o prazo do pipeline: limita
+    também a descoberta pelo sitemap, e o prazo das sub-páginas conta a
+    partir do fim dessa descoberta sem nunca o passar.
+    'links_home' é a lista de (href, texto âncora) extraída da página principal
+    ('page_url' = URL final da home, para resolver os links relativos).
+    'on_result(dossiê)' (opcional) é chamado assim que cada sub-página termina.
+    Retorna (Lista de Dossiês de Sub-página, Lista de (URL, blocos de conteúdo)
+             para a AI, Lista de Impressões digitais das sub-páginas)
     """
     
-    # 1. Encontrar links internos relevantes (Sobre, Serviços, Contato, etc.)
-    # Usamos regex para encontrar links que PARECEM ser de conteúdo
-    links_internos = set()
-    palavras_chave_links = r'(sobre|quem-somos|servicos|produtos|contato|empresa|institucional|solucoes)'
-    
-    for a_tag in soup_home.find_all('a', href=True):
-        href = a_tag['href']
-        # Garante que é um link interno e relevante
-        if href.startswith('/') or href.startswith(base_url):
-            if re.search(palavras_chave_links, href, re.IGNORECASE):
-                full_url = urljoin(base_url, href) # Constrói URL completa
-                links_internos.add(full_url)
-    
-    # Limita a 5 links para não sobrecarregar
-    links_para_visitar = list(links_internos)[:5]
+    # 1. Encontrar as sub-páginas mais relevantes (Sobre, Serviços, Contato, etc.)
+    links_para_visitar = select_sub_pages(
+        base_url, links_home, page_url=page_url, max_pages=max_pages, use_sitemap=use_sitemap,
+        deadline=deadline,
+    )
+    if deadline is not None:
+        deadline_seconds = min(deadline_seconds, max(0.0, deadline - time.monotonic()))
     print(f"Links de conteúdo encontrados para análise: {links_para_visitar}")
 
-    lista_dossies_subpaginas = []
-    texto_total_subpaginas = ""
+    if not links_para_visitar:
+        return [], [], []
 
-    # 2. Visitar cada link
-    for link in links_para_visitar:
-        try:
-            print(f"Acessando sub-página para análise profunda: {link}...")
-            driver.get(link)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            soup_subpage = BeautifulSoup(driver.page_source, 'html.parser')
+    # 2. Visitar os links em paralelo (limitado por 'max_workers')
+    resultados = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="subpage")
+    futures = {executor.submit(_scrape_single_sub_page, link): link for link in links_para_visitar}
 
-            titulo_pagina = soup_subpage.title.string if soup_subpage.title else ''
+    try:
+        for future in as_completed(futures, timeout=deadline_seconds):
+            link = futures[future]
+            try:
+                resultados[link] = future.result()
+                if on_result is not None:
+                    on_result(resultados[link][0])
+            except TimeoutException:
+                print(f"Timeout ao acessar sub-página: {link}. Ignorando.")
+            except Exception as e:
+                print(f"Erro ao analisar sub-página {link}: {e}. Ignorando.")
+    except FuturesTimeoutError:
+        pendentes = [link for future, link in futures.items() if not future.done()]
+        print(f"Prazo de {deadline_seconds}s esgotado. Sub-páginas ignoradas (resultado parcial): {pendentes}")
+    finally:
+        # Não espera pelas páginas lentas; as que ainda não começaram são canceladas
+        executor.shutdown(wait=False, cancel_futures=True)
 
-            # 3. Extrair Mapa de Conteúdo (H2 e H3)
-            mapa_conteudo = []
-            for heading in soup_subpage.find_all(['h2', 'h3']):
-                mapa_conteudo.append(f"{heading.name.upper()}: {heading.get_text(strip=True)}")
-            
-            # 4. Extrair Texto
-            texto_subpagina = soup_subpage.get_text(separator=' ', strip=True)
-            texto_total_subpaginas += f"\n\n--- CONTEÚDO DA PÁGINA: {link} ---\n{texto_subpagina}"
-
-            # 5. Compilar Dossiê
-            lista_dossies_subpaginas.append({
-                "url_visitada": link,
-                "titulo_da_pagina": titulo_pagina,
-                "mapa_de_conteudo_headings": mapa_conteudo
-            })
-
-        except TimeoutException:
-            print(f"Timeout ao acessar sub-página: {link}. Ignorando.")
-        except Exception as e:
-            print(f"Erro ao analisar sub-página {link}: {e}. Ignorando.")
+    # 3. Compilar na ordem original dos links
+    lista_dossies_subpaginas = []
+    paginas_subpaginas = []
+    metas_subpaginas = []
+    for link in links_para_visitar:
+        if link in resultados:
+            dossie, blocos_subpagina, meta = resultados[link]
+            lista_dossies_subpaginas.append(dossie)
+            paginas_subpaginas.append((link, blocos_subpagina))
+            metas_subpaginas.append(meta)
             
-    return lista_dossies_subpaginas, texto_total_subpaginas
+    return lista_dossies_subpaginas, paginas_subpaginas, metas_subpaginas
 
 
 # ==============================================================================
 # 2. FUNÇÕES DE ANÁLISE (REGEX e IA)
 # ==============================================================================
 
-def _detect_technology_stack(html_content):
+@timed("tech_detection")
+def _detect_technology_stack(page, extracao):
     """
-    (V8.1) Usa Regex simples para tentar adivinhar tecnologias no HTML.
+    (V9.6) Detecta tecnologias com o motor de assinaturas (data/technologies.json).
+    Procura nas fontes direcionadas (script src, link href, meta generator,
+    headers e cookies) e, por último, no HTML.
+    Retorna (Lista de Tecnologias, {Tecnologia: Versão}) - só as com versão conhecida.
     """
-    tech_stack = []
-    
-    # Dicionário de Regex
-    tech_patterns = {
-        'React': r'react-dom|react\.js|react\.min\.js',
-        'Vue.js': r'vue\.js|vue\.min\.js',
-        'Angular': r'angular\.js|angular\.min\.js',
-        'jQuery': r'jquery\.js|jquery\.min\.js',
-        'WordPress': r'wp-content|wp-includes',
-        'Shopify': r'cdn\.shopify\.com',
-        'VTEX': r'vteximg\.com\.br|vtexassets\.com',
-        'Nuvemshop': r'cdn\.nuvemshop\.com\.br',
-        'Wix': r'wix\.com|static\.parastorage\.com',
-        'Google Analytics': r'google-analytics\.com/analytics\.js|gtag\(\'config\', \'UA-',
-        'Google Tag Manager': r'googletagmanager\.com/gtm\.js',
-        'Hotjar': r'static\.hotjar\.com',
-        'RD Station': r'tools\.rdstation\.com\.br',
-    }
-
-    for tech, pattern in tech_patterns.items():
-        if re.search(pattern, html_content, re.IGNORECASE):
-            tech_stack.append(tech)
-            
-    if not tech_stack:
-        return ["Nenhuma tecnologia específica detectada"]
-        
-    return tech_stack
-
-# --- (PROMPT ATUALIZADO V8.5) ---
-# Este prompt é mais simples e focado no "propósito geral", como pedido.
-PROMPT_GERAL_V8_5 = """
-Contexto: Você é um assistente de análise de conteúdo. Sua tarefa é ler o texto de um site e resumi-lo de forma objetiva.
-Retorne APENAS um objeto JSON válido.
-
-O seu JSON de saída DEVE conter EXATAMENTE as seguintes chaves:
-{
-  "general_summary": "Um resumo geral (2-3 frases) sobre o que é esta página e qual seu propósito principal.",
-  "main_subject": "Qual é o assunto principal ou o produto/serviço central oferecido?",
-  "target_audience": "Para quem este site se destina? (ex: 'Desenvolvedores', 'Empresas de Varejo', 'Consumidores Finais')."
-}
-"""
-
-# --- (FUNÇÃO ATUALIZADA V8.5) ---
-def _analyze_text_with_ai(full_text_content):
-    """
-    (V8.5) Tenta analisar o texto com o Gemini.
-    Usa o 'models/gemini-pro-latest' e o novo prompt V8.5 (foco geral).
-    É "safe-fail" - se falhar, retorna {} e não quebra o request (Erro 500).
-    """
-    print("Iniciando chamada à API do Gemini (V8.5) para análise geral...")
-    
-    try:
-        # --- Configurar a API DENTRO da função ---
-        GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-        
-        # 1. Verifica se a chave existe
-        if not GOOGLE_API_KEY:
-            print("AVISO: Análise de AI ignorada (GOOGLE_API_KEY não encontrada no .env).")
-            return {} # Retorna um JSON vazio
-        
-        # 2. Configura a API 
-        genai.configure(api_key=GOOGLE_API_KEY)
-        
-        # --- Usando o modelo que a sua chave suporta ---
-        model = genai.GenerativeModel('models/gemini-pro-latest')
-
-        # 3. Define as regras de geração
-        generation_config = genai.types.GenerationConfig(
-            candidate_count=1,
-            temperature=0.3, 
-            response_mime_type="application/json", 
-        )
-
-        # 4. Combina o prompt com o conteúdo
-        
-        prompt_combinado = f"{PROMPT_GERAL_V8_5}\n\nTexto do Site:\n{full_text_content}"
-        
-        # 5. Faz a chamada à API
-        response = model.generate_content(
-            prompt_combinado,
-            generation_config=generation_config
-        )
-
-        # 6. Extrai o JSON da resposta
-        ai_json = json.loads(response.text)
-        print("Sucesso: Análise de IA do Gemini (V8.5) recebida.")
-        return ai_json
+    found = get_tech_engine().detect(
+        html_content=page["html"],
+        script_srcs=extracao["script_srcs"],
+        link_hrefs=extracao["link_hrefs"],
+        meta_generator=extracao["meta_generator"],
+        headers=page.get("headers"),
+        cookies=page.get("cookies"),
+    )
 
-    except Exception as e:
-        # Captura QUALQUER erro (Chave Inválida, API offline, Modelo não encontrado)
-        print(f"!!! ERRO CRÍTICO AO CHAMAR O GEMINI AI !!!: {e}")
-        print("A análise de IA será retornada vazia.")
-        # Retorna um JSON vazio para não quebrar o frontend
-        return {}
+    if not found:
+        return ["Nenhuma tecnologia específica detectada"], {}
 
+    versions = {tech: version for tech, version in found.items() if version}
+    return list(found), versions
 
 # ==============================================================================
 # 3. FUNÇÃO PRINCIPAL DE SERVIÇO (O "CÉREBRO")
 # ==============================================================================
 
-def get_scraped_data_service(url):
+def _revalidate_page(link, previous_meta):
     """
-    (V8.1) Orquestra todo o processo de scraping e análise.
-    1. Verifica Cache (DB)
-    2. Se não tem cache, usa Selenium (Aranha)
-    3. Faz análise de Tech Stack (Regex)
-    4. Faz análise de Vendas (Gemini AI)
-    5. Salva no Cache
-    6. Retorna o JSON completo
+    Verifica se UMA página mudou desde o último scrape.
+    1. Páginas que vieram por HTTP: GET condicional (ETag / Last-Modified);
+       um 304 resolve sem baixar nem analisar nada.
+    2. Caso contrário, busca a página e compara o hash do texto extraído.
+    Retorna {"changed", "meta", "page", "extracao"} ('page'/'extracao' = None num 304).
     """
-    
-    
-    
-    from app.extensions import db
-    from app.models import ScrapedData
-   
-    
-    # Limpa a URL (ex: remove / no final)
-    parsed_url = urlparse(url)
-    url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}".rstrip('/')
-    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    page = None
+    if previous_meta.get("via") == "http":
+        status, page = page_fetcher.revalidate(
+            link, etag=previous_meta.get("etag"), last_modified=previous_meta.get("last_modified")
+        )
+        if status == "not_modified":
+            return {"changed": False, "meta": previous_meta, "page": None, "extracao": None}
+        if page is not None and looks_js_rendered(page["html"], page_fetcher.min_text_chars):
+            page = None
+
+    if page is None:
+        page = page_fetcher.fetch(link)
+
+    extracao = _extract(page)
+    meta = dict(_page_fingerprint(page, extracao), url=link)
+    return {
+        "changed": meta["fingerprint"] != previous_meta.get("fingerprint"),
+        "meta": meta,
+        "page": page,
+        "extracao": extracao,
+    }
+
+
+def _blocos_da_pagina(link, revalidacao):
+    """ Blocos de conteúdo de uma página revalidada (busca o corpo se a revalidação foi um 304). """
+    if revalidacao["extracao"] is None:
+        revalidacao["page"] = page_fetcher.fetch(link)
+        revalidacao["extracao"] = _extract(revalidacao["page"])
+    return revalidacao["extracao"]["blocos"]
+
+
+def _refresh_changed_pages(url, previous_data, previous_meta):
+    """
+    (V10.0) Refresh incremental de um scrape expirado.
+    Revalida a home e cada sub-página do scrape anterior. Só re-extrai e
+    re-analisa (Gemini) as páginas cuja impressão digital mudou, e junta
+    o resultado com o dossiê anterior.
+
+    (V10.10) Tudo sob o mesmo prazo do pipeline completo (SCRAPER_PIPELINE_DEADLINE).
+    Retorna (JSON do resultado, page_meta) ou None quando a home mudou
+    (nesse caso os links podem ter mudado e é preciso o pipeline completo)
+    ou quando o page_meta é de outra versão do pipeline (PAGE_META_VERSION).
+    """
+    home_meta = previous_meta.get("home") or {}
+    previous_subpages = previous_meta.get("subpages") or []
+    if not home_meta or not previous_data:
+        return None
+    if previous_meta.get("versao") != PAGE_META_VERSION:
+        print(f"REFRESH: O dossiê de {url} é de outra versão do pipeline. Fazendo o pipeline completo.")
+        return None
+    deadline = time.monotonic() + current_app.config.get("SCRAPER_PIPELINE_DEADLINE", 60)
+
+    # 1. Home
+    revalidacao_home = _revalidate_page(url, home_meta)
+    if revalidacao_home["changed"]:
+        print(f"REFRESH: A página principal de {url} mudou. Fazendo o pipeline completo.")
+        return None
+
+    # 2. Sub-páginas (em paralelo)
+    max_workers = current_app.config.get("SCRAPER_SUBPAGE_PARALLELISM", 3)
+    deadline_seconds = min(
+        current_app.config.get("SCRAPER_SUBPAGE_DEADLINE", 25), max(0.0, deadline - time.monotonic())
+    )
+    revalidacoes = {}
+    if previous_subpages:
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="revalidate")
+        futures = {executor.submit(_revalidate_page, meta["url"], meta): meta["url"] for meta in previous_subpages}
+        try:
+            for future in as_completed(futures, timeout=deadline_seconds):
+                link = futures[future]
+                try:
+                    revalidacoes[link] = future.result()
+                except Exception as e:
+                    print(f"REFRESH: Erro ao revalidar sub-página {link}: {e}. Ignorando.")
+        except FuturesTimeoutError:
+            print(f"REFRESH: Prazo de {deadline_seconds}s esgotado na revalidação das sub-páginas.")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    mudou = (
+        len(revalidacoes) != len(previous_subpages)
+        or any(revalidacao["changed"] for revalidacao in revalidacoes.values())
+    )
+
+    new_meta = {
+        "versao": PAGE_META_VERSION,
+        "home": revalidacao_home["meta"],
+        "subpages": [revalidacoes[meta["url"]]["meta"] for meta in previous_subpages if meta["url"] in revalidacoes],
+    }
+
+    if not mudou:
+        print(f"REFRESH: Nenhuma página de {url} mudou. Reutilizando o dossiê e a análise anteriores.")
+        return previous_data, new_meta
 
-    # 1. VERIFICAR CACHE
+    # 3. Algo mudou: junta os dossiês (novos só para as páginas alteradas) e refaz a AI
+    dossies_anteriores = {
+        dossie.get("url_visitada"): dossie for dossie in previous_data.get("analise_profunda_subpaginas", [])
+    }
+    lista_dossies_subpaginas = []
+    paginas_subpaginas = []
+    for meta in previous_subpages:
+        link = meta["url"]
+        revalidacao = revalidacoes.get(link)
+        if revalidacao is None:
+            continue
+        if revalidacao["changed"] or link not in dossies_anteriores:
+            print(f"REFRESH: Sub-página alterada: {link}")
+            lista_dossies_subpaginas.append(build_sub_page_dossier(link, revalidacao["extracao"]))
+        else:
+            lista_dossies_subpaginas.append(dossies_anteriores[link])
+        paginas_subpaginas.append((link, _blocos_da_pagina(link, revalidacao)))
+
+    paginas = [(url, _blocos_da_pagina(url, revalidacao_home))] + paginas_subpaginas
+    dossie_home_json = dict(previous_data["dossie_pagina_principal"])
+    dossie_home_json["analise_ia"] = gemini_client.analyze(
+        content_reducer.prepare(paginas, deadline=deadline), deadline=deadline
+    )
+
+    result_json_data = {
+        "dossie_pagina_principal": dossie_home_json,
+        "analise_profunda_subpaginas": lista_dossies_subpaginas
+    }
+    return result_json_data, new_meta
+
+
+def _emit(on_event, event, data):
+    """ Entrega um evento parcial (streaming) sem deixar um erro do consumidor quebrar o scrape. """
+    if on_event is None:
+        return
     try:
-        cache_duration_days = 1
-        cache_cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=cache_duration_days)
-        
-        cached_data = ScrapedData.query.filter(
-            ScrapedData.url == url,
-            ScrapedData.scraped_at > cache_cutoff
-        ).first()
-
-        if cached_data:
-            print(f"CACHE HIT: Retornando dados do Postgres para {url}")
-            return cached_data.data # Retorna o JSONB salvo
+        on_event(event, data)
+    except Exception as e:
+        print(f"AVISO: Falha ao entregar o evento '{event}': {e}")
 
-    except exc.SQLAlchemyError as e:
-        # Se o DB estiver offline, não quebra, apenas ignora o cache
-        print(f"AVISO: Erro ao consultar o cache no DB: {e}. Prosseguindo com scrape.")
-    
-    print(f"CACHE MISS: Fazendo novo scrape (com Selenium) para {url}")
-    
-    # 2. INICIAR ARANHA (SELENIUM)
-    driver = None
+
+def _await(future, deadline, default, etapa):
+    """ Resultado de uma etapa em paralelo, ou 'default' se o prazo final acabar antes. """
     try:
-        driver = _init_selenium_driver()
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FuturesTimeoutError:
+        print(f"AVISO: Prazo do pipeline esgotado à espera de '{etapa}'. Usando o resultado parcial.")
+    except Exception as e:
+        print(f"AVISO: Etapa '{etapa}' falhou: {e}")
+    return default
+
 
-        # 3. FAZER SCRAPE DA HOME + SUB-PÁGINAS
-        
-        # 3.1. Home Page
-        html_home, dossie_home_json, texto_home = scrape_home_page_dossier(driver, url)
-        
-        # 3.2. Sub-Páginas
-        soup_home = BeautifulSoup(html_home, 'html.parser')
-        lista_dossies_subpaginas, texto_subpaginas = scrape_sub_page_analysis(driver, base_url, soup_home)
+def _run_full_pipeline(url, base_url, on_event=None):
+    """
+    (V10.5) Pipeline completo e concorrente: scrape da home + sub-páginas, Tech Stack e Gemini.
+
+    Assim que a home é extraída, a detecção de tecnologias e uma 1ª análise de
+    AI (só com o texto da home) correm EM PARALELO com o crawl das sub-páginas.
+    No fim, o texto novo das sub-páginas é incorporado numa 2ª passagem
+    (refinamento da análise da home). Tudo sob um único prazo
+    (SCRAPER_PIPELINE_DEADLINE): o que não termina a tempo fica com o resultado
+    parcial (ex: a análise só da home).
+
+    'on_event(evento, dados)' (opcional) recebe os resultados parciais à medida
+    que ficam prontos: "home", "subpage" (um por sub-página), "tech",
+    "ai_preliminar" (análise só da home) e "ai" (análise final).
+    Retorna (JSON do resultado, page_meta)
+    """
+    deadline = time.monotonic() + current_app.config.get("SCRAPER_PIPELINE_DEADLINE", 60)
 
+    # 2. FAZER SCRAPE DA HOME
+    # (HTTP primeiro; a Aranha/Selenium do pool só entra para páginas com JavaScript)
+    try:
+        page_home, dossie_home_json, extracao_home = scrape_home_page_dossier(url)
     except TimeoutException:
         raise Exception(f"Erro de Timeout: A página {url} demorou muito para carregar.")
     except WebDriverException as e:
         raise Exception(f"Erro do WebDriver (verifique o chromedriver): {e}")
     except Exception as e:
-        raise Exception(f"Erro durante o scrape do Selenium: {e}")
+        raise Exception(f"Erro durante o scrape: {e}")
+    _emit(on_event, "home", dict(dossie_home_json))
+
+    # 3. ANÁLISES DA HOME EM PARALELO COM AS SUB-PÁGINAS
+    paginas_home = [(url, extracao_home["blocos"])]
+
+    # Etapas que terminam depois do prazo não emitem mais eventos
+    emit_lock = threading.Lock()
+    encerrado = [False]
+
+    def _emit_parcial(event, data):
+        with emit_lock:
+            if not encerrado[0]:
+                _emit(on_event, event, data)
+
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline")
+    try:
+        # 3.1. Tech Stack (motor de assinaturas)
+        def _tech():
+            tech_stack, versions = _detect_technology_stack(page_home, extracao_home)
+            _emit_parcial("tech", {"tecnologias_detetadas": tech_stack, "versoes_tecnologias": versions})
+            return tech_stack, versions
+
+        # 3.2. 1ª passagem do Gemini: só a home (cliente "safe-fail", com cache por hash do conteúdo)
+        # (os eventos saem de dentro da etapa: chegam sempre antes do "ai" final)
+        def _analise_preliminar():
+            analise = gemini_client.analyze(content_reducer.prepare(paginas_home, deadline=deadline), deadline=deadline)
+            _emit_parcial("ai_preliminar", {"analise_ia": analise})
+            return analise
+
+        tech_future = executor.submit(_tech)
+        ai_home_future = executor.submit(_analise_preliminar)
+
+        # 3.3. Sub-Páginas (em paralelo, a partir dos links já extraídos da home)
+        try:
+            with timed_stage("subpages", url=url):
+                lista_dossies_subpaginas, paginas_subpaginas, metas_subpaginas = scrape_sub_page_analysis(
+                    base_url,
+                    extracao_home["links"],
+                    max_workers=current_app.config.get("SCRAPER_SUBPAGE_PARALLELISM", 3),
+                    deadline_seconds=min(
+                        current_app.config.get("SCRAPER_SUBPAGE_DEADLINE", 25),
+                        max(0.0, deadline - time.monotonic()),
+                    ),
+                    on_result=lambda dossie: _emit(on_event, "subpage", dossie),
+                    page_url=page_home["url"],
+                    max_pages=current_app.config.get("SCRAPER_SUBPAGE_MAX", 5),
+                    use_sitemap=current_app.config.get("SCRAPER_SITEMAP_ENABLED", True),
+                    deadline=deadline,
+                )
+        except Exception as e:
+            # A home já está analisada: sem sub-páginas, o resultado continua útil
+            print(f"AVISO: Falha nas sub-páginas de {url}: {e}. Seguindo só com a home.")
+            lista_dossies_subpaginas, paginas_subpaginas, metas_subpaginas = [], [], []
+
+        tech_stack_analysis, tech_versions = _await(
+            tech_future, deadline, (["Nenhuma tecnologia específica detectada"], {}), "tech_detection"
+        )
+        if tech_future.done():
+            # O HTML da home só servia à detecção de tecnologias: liberta-o já
+            page_home.pop("html", None)
+        analise_home = _await(ai_home_future, deadline, {}, "gemini (home)")
+
+        # 4. 2ª PASSAGEM DO GEMINI: incorpora o texto novo das sub-páginas
+        # (sem boilerplate nem blocos já vistos na home, dentro do orçamento de tokens)
+        texto_subpaginas = content_reducer.prepare(paginas_subpaginas, seen_pages=paginas_home, deadline=deadline)
+        if not texto_subpaginas:
+            ai_analysis_json = analise_home
+        elif analise_home:
+            ai_analysis_json = _await(
+                executor.submit(gemini_client.refine, analise_home, texto_subpaginas, deadline),
+                deadline, analise_home, "gemini (refinamento)"
+            )
+        else:
+            # A 1ª passagem falhou: análise única com tudo
+            ai_analysis_json = _await(
+                executor.submit(
+                    lambda: gemini_client.analyze(
+                        content_reducer.prepare(paginas_home + paginas_subpaginas, deadline=deadline), deadline=deadline
+                    )
+                ),
+                deadline, {}, "gemini"
+            )
     finally:
-        if driver:
-            driver.quit() # Fecha o navegador
+        # Não espera pelas etapas atrasadas (terminam em background e alimentam o cache da AI)
+        executor.shutdown(wait=False)
 
-    # 4. FAZER ANÁLISES (REGEX e IA)
-    
-    # 4.1. Análise de Tech Stack (Regex)
-    tech_stack_analysis = _detect_technology_stack(html_home)
-    
-    # 4.2. Análise de Vendas (Gemini AI)
-    # Junta todo o texto (Home + Sub-páginas)
-    texto_total_para_ia = texto_home + texto_subpaginas
-    
-    # Chama a nossa nova função "safe-fail" (V8.5)
-    ai_analysis_json = _analyze_text_with_ai(texto_total_para_ia)
+    with emit_lock:
+        encerrado[0] = True
+    _emit(on_event, "ai", {"analise_ia": ai_analysis_json})
 
     # 5. COMPILAR O JSON DE RESULTADO FINAL
+    # Adiciona as análises ao dossiê principal
+    dossie_home_json["analise_ia"] = ai_analysis_json
+    dossie_home_json["tecnologias_detetadas"] = tech_stack_analysis
+    dossie_home_json["versoes_tecnologias"] = tech_versions
+
+    # Monta o objeto final
+    result_json_data = {
+        "dossie_pagina_principal": dossie_home_json,
+        "analise_profunda_subpaginas": lista_dossies_subpaginas
+    }
+    page_meta = {
+        "versao": PAGE_META_VERSION,
+        "home": dict(_page_fingerprint(page_home, extracao_home), url=url),
+        "subpages": metas_subpaginas,
+    }
+    return result_json_data, page_meta
+
+
+def _scrape_and_save(url, base_url, on_event=None):
+    """
+    Executa o pipeline para uma URL (já normalizada) sem consultar o cache
+    e grava o resultado no cache (DB).
+    Se já existe um scrape anterior (expirado), tenta primeiro o refresh
+    incremental: só as páginas que mudaram são re-extraídas e re-analisadas.
+    """
+    from app.extensions import db
+    from app.models import ScrapedData
+
+    previous_data = previous_meta = None
     try:
-        # Adiciona as análises ao dossiê principal
-        dossie_home_json["analise_ia"] = ai_analysis_json
-        dossie_home_json["tecnologias_detetadas"] = tech_stack_analysis
-
-        # Monta o objeto final
-        result_json_data = {
-            "dossie_pagina_principal": dossie_home_json,
-            "analise_profunda_subpaginas": lista_dossies_subpaginas
-        }
-        
-        # 6. Salvar no cache (DB)
-        current_time = datetime.datetime.utcnow()
+        # O registo anterior (mesmo expirado), com as colunas só usadas no refresh
+        previous = ScrapedData.query.options(
+            undefer(ScrapedData.page_meta),
+            undefer(ScrapedData.subpages_blob)
+        ).filter_by(url=url).first()
+        if previous is not None:
+            previous_data, previous_meta = previous.to_result(), previous.page_meta
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"AVISO: Erro ao consultar o scrape anterior no DB: {e}")
+    finally:
+        # (V10.10) O pipeline (Selenium + Gemini) demora dezenas de segundos: não
+        # deixa a transação da sessão (e a sua conexão do pool) aberta durante ele
+        db.session.close()
+
+    refreshed = None
+    if previous_data is not None and previous_meta:
+        try:
+            refreshed = _refresh_changed_pages(url, previous_data, previous_meta)
+        except Exception as e:
+            print(f"AVISO: Refresh incremental falhou para {url} ({e}). Fazendo o pipeline completo.")
+
+    if refreshed is not None:
+        result_json_data, page_meta = refreshed
+    else:
+        result_json_data, page_meta = _run_full_pipeline(url, base_url, on_event=on_event)
+
+    # 5. Salvar no cache (DB + memória) com um upsert atômico
+    try:
+        scrape_cache.save(url, result_json_data, page_meta)
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        # Não quebra o request, apenas avisa do erro de cache
+        print(f"AVISO: Não foi possível salvar o scrape no DB: {e}")
+        scrape_cache.store_memory(url, result_json_data)
+
+    # 6. Retornar o JSON
+    return result_json_data
+
+
+def _scrape_coalesced(url, base_url, on_event=None, refresh_before=None):
+    """
+    (V9.8) Faz o scrape de uma URL garantindo que só existe UM scrape em curso
+    por URL normalizada:
+    - dentro do processo, os pedidos simultâneos esperam pelo primeiro (SingleFlight);
+    - entre processos, o primeiro segura um pg_advisory_lock; quem chega depois
+      espera pelo lock (sem segurar conexões) e encontra o resultado já gravado no cache.
+    Por scrape em curso, só a conexão do lock fica ocupada durante o pipeline.
+    Só quem faz o scrape recebe os eventos parciais ('on_event'); quem apenas
+    espera recebe o resultado final.
+    (V10.8) 'refresh_before' (pré-aquecimento): o registo ainda fresco também é
+    renovado, a menos que tenha sido gravado depois dessa data (UTC).
+    """
+    from app.extensions import db
+    from app.models import ScrapedData
+
+    lock_timeout = current_app.config.get("SCRAPE_LOCK_TIMEOUT_SECONDS", 120)
+
+    def _renewed_after(cutoff):
+        """ O registo já foi gravado depois de 'cutoff' (ex: por outro processo)? """
+        return db.session.query(ScrapedData.id).filter(
+            ScrapedData.url == url, ScrapedData.scraped_at >= cutoff
+        ).first() is not None
+
+    def _leader():
+        # A sessão deste pedido (ex: a consulta ao cache) não fica com uma conexão
+        # enquanto espera pelo lock: o lock já segura uma durante o scrape
+        db.session.close()
+        with pg_advisory_lock(db.engine, f"scrape:{url}", timeout_seconds=lock_timeout) as locked:
+            if locked:
+                # Outro processo pode ter acabado de fazer este scrape enquanto esperávamos
+                try:
+                    cached = None
+                    if refresh_before is None or _renewed_after(refresh_before):
+                        cached, _stale = scrape_cache.lookup(url, allow_stale=False)
+                    if cached is not None:
+                        print(f"CACHE HIT (após lock): Outro processo já fez o scrape de {url}")
+                        return cached
+                except exc.SQLAlchemyError as e:
+                    db.session.rollback()
+                    print(f"AVISO: Erro ao consultar o cache no DB: {e}. Prosseguindo com scrape.")
+            return _scrape_and_save(url, base_url, on_event=on_event)
+
+    result, shared = scrape_single_flight.do(url, _leader, timeout=lock_timeout + 180)
+    if shared:
+        print(f"SINGLE-FLIGHT: Reutilizando o scrape em curso de {url}")
+    return result
+
+
+def get_scraped_data_service(url):
+    """
+    (V9.9) Orquestra todo o processo de scraping e análise.
+    1. Verifica Cache (memória -> DB). Se estiver "stale", responde na hora
+       e agenda um refresh em background (stale-while-revalidate)
+    2. Se não tem cache, faz o scrape (HTTP ou Selenium/Aranha do pool)
+    3. Faz análise de Tech Stack (Regex)
+    4. Faz análise de Vendas (Gemini AI)
+    5. Salva no Cache
+    6. Retorna o JSON completo
+    """
+    from app.extensions import db
+
+    url, base_url = normalize_url(url)
+    start = time.perf_counter()
+    result = "error"
+
+    try:
+        # 1. VERIFICAR CACHE (memória -> Postgres)
         try:
-            entry_to_update = ScrapedData.query.filter_by(url=url).first()
-            if entry_to_update:
-                entry_to_update.data = result_json_data
-                entry_to_update.scraped_at = current_time
-                print(f"CACHE UPDATE: Atualizando dados no Postgres para {url}")
-            else:
-                new_entry = ScrapedData(url=url, data=result_json_data, scraped_at=current_time)
-                db.session.add(new_entry)
-                print(f"CACHE SET: Salvando novos dados no Postgres para {url}")
-            db.session.commit()
+            with timed_stage("cache_lookup", url=url):
+                cached_data, stale = scrape_cache.lookup(url)
+
+            if cached_data is not None:
+                if stale:
+                    result = "stale"
+                    scrape_cache.schedule_refresh(url, lambda: _scrape_coalesced(url, base_url))
+                else:
+                    result = "cache_hit"
+                    print(f"CACHE HIT: Retornando dados do cache para {url}")
+                return cached_data # Retorna o JSONB salvo
+
         except exc.SQLAlchemyError as e:
+            # Se o DB estiver offline, não quebra, apenas ignora o cache
             db.session.rollback()
-            # Não quebra o request, apenas avisa do erro de cache
-            print(f"AVISO: Não foi possível salvar o scrape no DB: {e}")
+            print(f"AVISO: Erro ao consultar o cache no DB: {e}. Prosseguindo com scrape.")
 
-        # 7. Retornar o JSON
-        return result_json_data
+        print(f"CACHE MISS: Fazendo novo scrape para {url}")
+        scraped = _scrape_coalesced(url, base_url)
+        result = "scraped"
+        return scraped
 
-    except Exception as e:
-        raise Exception(f"Erro ao compilar o JSON final ou salvar no cache: {e}")
\ No newline at end of file
+    finally:
+        duration = time.perf_counter() - start
+        REQUEST_DURATION.labels(result=result).observe(duration)
+        log_event("scrape", url=url, result=result, duration_ms=round(duration * 1000, 2))
+
+
+# Chaves do dossiê principal que chegam em eventos próprios ("tech" e "ai")
+_LATE_HOME_KEYS = ("analise_ia", "tecnologias_detetadas", "versoes_tecnologias")
+
+
+def _result_events(result_json_data, sent):
+    """
+    Eventos (evento, dados) de um resultado completo, exceto os já enviados.
+    Usado quando o resultado vem do cache, de um scrape partilhado ou do
+    refresh incremental (que não emitem eventos parciais).
+    """
+    dossie_home = result_json_data.get("dossie_pagina_principal") or {}
+    if "home" not in sent:
+        yield "home", {key: value for key, value in dossie_home.items() if key not in _LATE_HOME_KEYS}
+    for dossie in result_json_data.get("analise_profunda_subpaginas") or []:
+        if ("subpage", dossie.get("url_visitada")) not in sent:
+            yield "subpage", dossie
+    if "tech" not in sent:
+        yield "tech", {
+            "tecnologias_detetadas": dossie_home.get("tecnologias_detetadas", []),
+            "versoes_tecnologias": dossie_home.get("versoes_tecnologias", {}),
+        }
+    if "ai" not in sent:
+        yield "ai", {"analise_ia": dossie_home.get("analise_ia", {})}
+
+
+def scrape_stream_service(url, heartbeat_seconds=15):
+    """
+    (V10.1) Variante em streaming do get_scraped_data_service.
+    É um gerador de (evento, dados), na ordem em que os resultados ficam prontos:
+        "home" -> "subpage" (um por sub-página), "tech" e "ai_preliminar"
+        (análise só da home, em paralelo com as sub-páginas) -> "ai" -> "done"
+    ("error" em caso de falha; "heartbeat" enquanto nada chega, para manter a
+    conexão viva). O "done" traz o resultado completo, igual ao do /scrape.
+
+    O scrape corre numa thread própria: se o cliente desconectar, o scrape
+    termina na mesma e fica gravado no cache.
+    """
+    from app.extensions import db
+
+    url, base_url = normalize_url(url)
+
+    # 1. Cache: "reproduz" os eventos do resultado guardado
+    try:
+        with timed_stage("cache_lookup", url=url):
+            cached_data, stale = scrape_cache.lookup(url)
+        if cached_data is not None:
+            if stale:
+                scrape_cache.schedule_refresh(url, lambda: _scrape_coalesced(url, base_url))
+            yield from _result_events(cached_data, set())
+            yield "done", {"cached": True, "stale": stale, "result": cached_data}
+            return
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"AVISO: Erro ao consultar o cache no DB: {e}. Prosseguindo com scrape.")
+
+    # 2. Scrape numa thread; os eventos parciais chegam por uma fila
+    print(f"CACHE MISS (stream): Fazendo novo scrape para {url}")
+    events = queue.Queue()
+    app = current_app._get_current_object()
+
+    def _run():
+        with app.app_context():
+            try:
+                result = _scrape_coalesced(url, base_url, on_event=lambda event, data: events.put((event, data)))
+                events.put(("_result", result))
+            except Exception as e:
+                events.put(("_error", str(e)))
+
+    threading.Thread(target=_run, name="scrape-stream", daemon=True).start()
+
+    sent = set()
+    while True:
+        try:
+            event, data = events.get(timeout=heartbeat_seconds)
+        except queue.Empty:
+            yield "heartbeat", None
+            continue
+
+        if event == "_error":
+            yield "error", {"error": data}
+            return
+        if event == "_result":
+            # Completa o que não foi emitido (ex: scrape partilhado com outro pedido)
+            yield from _result_events(data, sent)
+            yield "done", {"cached": False, "stale": False, "result": data}
+            return
+
+        sent.add(("subpage", data.get("url_visitada")) if event == "subpage" else event)
+        yield event, data
+
+
+def scrape_batch_service(urls, concurrency=4):
+    """
+    (V9.4) Scrape em lote (listas de leads).
+    1. Consulta o cache de TODAS as URLs numa única query;
+    2. Faz o scrape dos "misses" com no máximo 'concurrency' em paralelo;
+    3. É um gerador: entrega cada resultado assim que fica pronto (streaming),
+       sem acumular o lote inteiro em memória.
+
+    Cada item entregue é um dicionário:
+        {"url", "status": "ok"|"error", "cached": bool, "data" | "error"}
+    """
+    from app.extensions import db
+    from app.models import ScrapedData
+
+    # Normaliza e remove duplicadas (mantendo a ordem)
+    normalized = {}
+    for raw_url in urls:
+        url, base_url = normalize_url(raw_url)
+        normalized.setdefault(url, base_url)
+
+    # 1. VERIFICAR CACHE (uma única query para o lote todo)
+    cached_urls = set()
+    try:
+        cached_rows = ScrapedData.query.options(undefer(ScrapedData.subpages_blob)).filter(
+            ScrapedData.url.in_(list(normalized)),
+            ScrapedData.scraped_at > scrape_cache.cutoff()
+        ).yield_per(100)
+
+        for row in cached_rows:
+            cached_urls.add(row.url)
+            # Conta como acesso (despejo LRU e prioridade do pré-aquecimento), como no scrape único
+            scrape_cache.record_access(row.url)
+            yield {"url": row.url, "status": "ok", "cached": True, "data": row.to_result()}
+
+    except exc.SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"AVISO: Erro ao consultar o cache do lote no DB: {e}. Prosseguindo com scrape.")
+
+    misses = [(url, base_url) for url, base_url in normalized.items() if url not in cached_urls]
+    print(f"LOTE: {len(cached_urls)} hit(s) no cache, {len(misses)} scrape(s) a fazer.")
+    if not misses:
+        return
+
+    # 2. SCRAPE DOS MISSES (as threads precisam do contexto da app para o DB)
+    app = current_app._get_current_object()
+
+    def _run(url, base_url):
+        with app.app_context():
+            return _scrape_coalesced(url, base_url)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch")
+    try:
+        futures = {executor.submit(_run, url, base_url): url for url, base_url in misses}
+        for future in as_completed(futures):
+            url = futures.pop(future)
+            try:
+                yield {"url": url, "status": "ok", "cached": False, "data": future.result()}
+            except Exception as e:
+                yield {"url": url, "status": "error", "cached": False, "error": str(e)}
+    finally:
+        # Se o cliente desconectar, cancela o que ainda não começou
+        executor.shutdown(wait=False, cancel_futures=True)
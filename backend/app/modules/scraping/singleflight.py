@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import exc, text
+
+
+class SingleFlightTimeout(Exception):
+    """O scrape em curso (de outro pedido) não terminou dentro do tempo de espera."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    (V9.8) Coalescência de trabalho em curso DENTRO do processo.
+    O primeiro pedido para uma chave executa a função; os pedidos seguintes
+    para a mesma chave esperam e recebem o mesmo resultado (ou o mesmo erro).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """ Retorna (resultado, partilhado) - 'partilhado' é True para quem apenas esperou. """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise SingleFlightTimeout(f"Tempo esgotado à espera do scrape em curso de {key}.")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+def _advisory_lock_id(key):
+    """ Converte a chave num bigint (com sinal) para o pg_advisory_lock. """
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+@contextmanager
+def pg_advisory_lock(engine, key, timeout_seconds=120, wait=True, max_poll_interval=1.0):
+    """
+    Lock ENTRE processos (vários workers do gunicorn, várias máquinas) com
+    pg_advisory_lock. Faz 'yield True' com o lock obtido, ou 'yield False' se
+    não foi possível (timeout, DB offline ou banco que não é Postgres) - nesse
+    caso o chamador segue sem o lock, como antes.
+    Com 'wait=False' tenta uma única vez (não espera se já estiver ocupado).
+
+    (V10.10) A espera é feita com pg_try_advisory_lock a intervalos crescentes
+    (até 'max_poll_interval', no máximo 'timeout_seconds' no total) e SEM
+    segurar uma conexão do pool entre as tentativas. Só quem obtém o lock
+    fica com uma conexão (o lock é de sessão) até o fim do bloco.
+    """
+    if engine.dialect.name != 'postgresql':
+        yield False
+        return
+
+    lock_id = _advisory_lock_id(key)
+    deadline = time.monotonic() + (timeout_seconds if wait else 0)
+    poll_interval = 0.05
+    conn = None
+    acquired = False
+
+    while True:
+        try:
+            conn = engine.connect()
+            acquired = bool(conn.execute(
+                text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": lock_id}
+            ).scalar())
+            # O lock é de sessão: termina a transação implícita para não a deixar aberta
+            conn.commit()
+        except exc.SQLAlchemyError as e:
+            print(f"AVISO: Advisory lock não obtido para {key} ({e}). Prosseguindo sem lock.")
+            acquired = False
+            break
+        if acquired:
+            break
+
+        # Ocupado: devolve a conexão ao pool enquanto espera
+        conn.close()
+        conn = None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if wait:
+                print(f"AVISO: Advisory lock de {key} ocupado após {timeout_seconds}s. Prosseguindo sem lock.")
+            break
+        time.sleep(min(poll_interval, remaining))
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+
+    if not acquired and conn is not None:
+        conn.close()
+        conn = None
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": lock_id})
+                conn.commit()
+            except exc.SQLAlchemyError as e:
+                print(f"AVISO: Erro ao libertar o advisory lock de {key}: {e}")
+            finally:
+                conn.close()
@@ -0,0 +1,325 @@
+import json
+import os
+import re
+import threading
+
+
+DEFAULT_SIGNATURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "technologies.json")
+
+# Fontes onde as assinaturas podem ser procuradas
+SOURCES = ("script_src", "link_href", "meta_generator", "headers", "cookies", "html")
+
+# Grupo de versão nas assinaturas do arquivo de dados: (?P<version>...)
+VERSION_GROUP = "(?P<version>"
+
+# Literais mais curtos que isto não filtram nada (aparecem em qualquer página)
+MIN_LITERAL_LENGTH = 3
+
+# Folga (caracteres) à volta de cada ocorrência do literal onde a regex é confirmada
+CONFIRM_WINDOW = 256
+
+# Ocorrências do literal verificadas por assinatura (ex: "wp-content" aparece centenas de vezes)
+MAX_CONFIRM_OCCURRENCES = 20
+
+_REGEX_META = set(".^$*+?{}[]()|\\")
+_QUANTIFIERS = set("*?{")
+
+
+def _split_alternatives(pattern):
+    """ Divide a regex nas alternativas do nível de topo ('a|b' -> ['a', 'b']). """
+    parts, current, depth, in_class, escaped = [], [], 0, False, False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _longest_literal(branch):
+    """
+    O maior trecho literal (obrigatório) de uma alternativa, ou '' se não houver.
+    Grupos, classes e escapes como '\\d' interrompem o trecho; um quantificador
+    torna opcional o caractere anterior, que sai do trecho.
+    """
+    best, run, i, depth = "", [], 0, 0
+    while i < len(branch):
+        char = branch[i]
+        if char == "\\" and i + 1 < len(branch):
+            following = branch[i + 1]
+            if depth == 0 and not following.isalnum():
+                run.append(following)
+            else:
+                run = []
+            i += 2
+            continue
+        if char == "[" and depth == 0:
+            # Salta a classe de caracteres inteira
+            i = branch.find("]", i + 2) + 1 or len(branch)
+            run = []
+            continue
+        if char == "(":
+            depth += 1
+            run = []
+        elif char == ")":
+            depth -= 1
+            run = []
+        elif depth == 0 and char in _QUANTIFIERS:
+            if run:
+                run.pop()
+            best = max(best, "".join(run), key=len)
+            run = []
+            if char == "{":
+                i = branch.find("}", i) + 1 or len(branch)
+                continue
+        elif depth == 0 and char not in _REGEX_META:
+            run.append(char)
+        else:
+            best = max(best, "".join(run), key=len)
+            run = []
+        best = max(best, "".join(run), key=len)
+        i += 1
+    return max(best, "".join(run), key=len)
+
+
+def required_literals(pattern):
+    """
+    Literais (em minúsculas) dos quais pelo menos um TEM de aparecer no texto
+    para a regex poder casar - um por alternativa. None se alguma alternativa
+    não tem um literal útil (a regex tem de correr sempre).
+    """
+    literals = []
+    for branch in _split_alternatives(pattern):
+        literal = _longest_literal(branch)
+        if len(literal) < MIN_LITERAL_LENGTH:
+            return None
+        literals.append(literal.lower())
+    return literals
+
+
+def _anchor(literal):
+    """
+    Onde começa a chave do literal no LiteralMatcher: no 1º caractere que não
+    é letra/dígito (".", "-", "=", "/"...), se sobrarem pelo menos
+    MIN_LITERAL_LENGTH caracteres. Esses caracteres são raros no texto, e a
+    regex da passagem única salta depressa as posições que não começam por eles.
+    """
+    for offset, char in enumerate(literal):
+        if not char.isalnum() and len(literal) - offset >= MIN_LITERAL_LENGTH:
+            return offset
+    return 0
+
+
+def _trie_pattern(keys):
+    """ Regex em forma de trie ('wp-(?:content|includes)'): no máximo um ramo por caractere. """
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def _build(node):
+        branches = [re.escape(char) + _build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Fim de uma chave com continuação: a parte seguinte é opcional (e gulosa)
+        return f"(?:{body})?" if "" in node else body
+
+    return _build(trie)
+
+
+class LiteralMatcher:
+    """
+    (V10.10) Descobre numa SÓ passagem pelo texto quais de muitos literais
+    aparecem (o custo quase não cresce com o número de assinaturas).
+
+    Cada literal é procurado pela sua "chave" (o sufixo a partir de _anchor),
+    todas juntas numa regex em trie; cada ocorrência de uma chave é confirmada
+    com um startswith do literal inteiro. A procura recomeça na posição
+    seguinte a cada ocorrência, para não perder chaves sobrepostas.
+    """
+
+    def __init__(self, literals):
+        literals = set(literals)
+        by_key = {}
+        for literal in literals:
+            offset = _anchor(literal)
+            by_key.setdefault(literal[offset:], []).append((literal, offset))
+        # A regex devolve a chave mais longa numa posição: ela confirma também
+        # os literais das chaves que são prefixo dela (ex: ".com" dentro de ".com.br")
+        self._checks = {
+            key: [pair for other, pairs in by_key.items() if key.startswith(other) for pair in pairs]
+            for key in by_key
+        }
+        self._total = len(literals)
+        self._pattern = re.compile(_trie_pattern(by_key)) if by_key else None
+
+    def find(self, lowered):
+        """ Os literais presentes em 'lowered' (texto já em minúsculas). """
+        found = set()
+        if self._pattern is None:
+            return found
+        search = self._pattern.search
+        checks = self._checks
+        position = 0
+        while True:
+            match = search(lowered, position)
+            if match is None:
+                break
+            start = match.start()
+            for literal, offset in checks[match.group()]:
+                if start >= offset and literal not in found and lowered.startswith(literal, start - offset):
+                    found.add(literal)
+            if len(found) == self._total:
+                break
+            position = start + 1
+        return found
+
+
+class TechSignatureEngine:
+    """
+    (V9.6) Motor de assinaturas de tecnologias.
+
+    As assinaturas vêm de um arquivo de dados (JSON), no formato:
+        {"Tecnologia": {"<fonte>": ["regex", ...], ...}, ...}
+    Fontes: script_src, link_href, meta_generator, headers ("nome: valor"),
+    cookies ("nome=valor") e html (documento inteiro, último recurso).
+    Um grupo '(?P<version>...)' na regex permite reportar a versão.
+
+    (V10.10) A regex de uma assinatura só corre quando pode casar:
+    1. tecnologias já encontradas numa fonte anterior são saltadas (só as
+       assinaturas com versão voltam a ser vistas, se a versão falta);
+    2. um pré-filtro de literais (o trecho fixo de cada assinatura) descarta
+       as que não aparecem - no HTML de vários MB isto é quase tudo. Os
+       literais de todas as assinaturas de uma fonte são procurados JUNTOS,
+       numa só passagem (LiteralMatcher) por uma cópia ASCII em minúsculas;
+    3. no HTML, a regex é confirmada só numa janela à volta das ocorrências
+       do literal, não no documento inteiro.
+    """
+
+    def __init__(self, signatures):
+        # {fonte: [(tecnologia, regex, literais ou None, tem versão)]}
+        self.signatures = {source: [] for source in SOURCES}
+        self._compile(signatures)
+        self.matchers = {
+            source: LiteralMatcher(
+                literal for _tech, _regex, literals, _version in entries for literal in (literals or ())
+            )
+            for source, entries in self.signatures.items()
+        }
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_SIGNATURES_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _compile(self, signatures):
+        for tech_name, sources in signatures.items():
+            for source, patterns in sources.items():
+                if source not in self.signatures:
+                    raise ValueError(f"Fonte desconhecida '{source}' na assinatura de '{tech_name}'")
+                flags = re.IGNORECASE | (re.MULTILINE if source in ("headers", "cookies") else 0)
+                for pattern in patterns:
+                    # Valida cada assinatura isoladamente (erro legível se estiver mal escrita)
+                    compiled = re.compile(pattern, flags)
+                    literals = required_literals(pattern)
+                    if literals is not None and not all(literal.isascii() for literal in literals):
+                        literals = None  # O pré-filtro só conhece minúsculas ASCII
+                    self.signatures[source].append(
+                        (tech_name, compiled, literals, VERSION_GROUP in pattern)
+                    )
+
+    @staticmethod
+    def _confirm(regex, literals, text, lowered, want_version):
+        """
+        Procura a regex só à volta das ocorrências dos literais. Retorna
+        (casou, versão) - com 'want_version', continua até achar uma versão.
+        """
+        matched = False
+        for literal in literals:
+            position = lowered.find(literal)
+            checked = 0
+            while position != -1 and checked < MAX_CONFIRM_OCCURRENCES:
+                start = max(0, position - CONFIRM_WINDOW)
+                match = regex.search(text, start, position + len(literal) + CONFIRM_WINDOW)
+                if match:
+                    version = match.groupdict().get("version")
+                    if version or not want_version:
+                        return True, version
+                    matched = True
+                checked += 1
+                position = lowered.find(literal, position + len(literal) + CONFIRM_WINDOW)
+        return matched, None
+
+    def _scan(self, source, text, found):
+        if not text:
+            return
+        lowered = present = None
+        for tech_name, regex, literals, has_version in self.signatures[source]:
+            if tech_name in found and (found[tech_name] or not has_version):
+                continue
+            if literals is None:
+                # Sem literal útil: a regex corre no texto todo
+                match = regex.search(text)
+                matched, version = match is not None, match.groupdict().get("version") if match else None
+            else:
+                if lowered is None:
+                    # Minúsculas só ASCII (não-ASCII vira '?'): um caractere por caractere do
+                    # texto, então as posições batem (o str.lower() pode mudar o tamanho e, num
+                    # texto não-ASCII, aloca ~12 bytes por caractere)
+                    lowered = text.encode("ascii", "replace").lower().decode("ascii")
+                    present = self.matchers[source].find(lowered)
+                if present.isdisjoint(literals):
+                    continue
+                if len(text) > 2 * CONFIRM_WINDOW:
+                    matched, version = self._confirm(regex, literals, text, lowered, has_version)
+                else:
+                    match = regex.search(text)
+                    matched, version = match is not None, match.groupdict().get("version") if match else None
+            if matched and (version or tech_name not in found):
+                found[tech_name] = version or found.get(tech_name)
+
+    def detect(self, html_content='', script_srcs=(), link_hrefs=(), meta_generator='', headers=None, cookies=None):
+        """
+        Retorna {"Tecnologia": "versão" ou None}, na ordem em que foram encontradas
+        (fontes direcionadas primeiro, o HTML completo por último).
+        """
+        found = {}
+        self._scan("script_src", "\n".join(script_srcs), found)
+        self._scan("link_href", "\n".join(link_hrefs), found)
+        self._scan("meta_generator", meta_generator, found)
+        self._scan("headers", "\n".join(f"{name}: {value}" for name, value in (headers or {}).items()), found)
+        self._scan("cookies", "\n".join(f"{name}={value}" for name, value in (cookies or {}).items()), found)
+        self._scan("html", html_content, found)
+        return found
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_tech_engine():
+    """ Motor partilhado pelo processo (assinaturas compiladas uma única vez). """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                path = os.getenv("TECH_SIGNATURES_PATH", DEFAULT_SIGNATURES_PATH)
+                _engine = TechSignatureEngine.from_file(path)
+    return _engine
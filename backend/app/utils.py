@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+class TTLCache:
+    """
+    Cache em memória (por processo), thread-safe, com:
+    - expiração por tempo (TTL, em segundos);
+    - limite de tamanho (número de entradas), com despejo LRU.
+    """
+
+    def __init__(self, maxsize=1000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)  # Marca como usado recentemente
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)  # Despeja o menos usado
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """ Remove as entradas cuja chave satisfaz 'predicate(key)'. Retorna quantas. """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def normalize_url(url):
+    """
+    Limpa a URL (ex: remove / no final), como é gravada no cache.
+    Retorna (URL normalizada, URL base do site)
+    """
+    parsed_url = urlparse(url)
+    url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}".rstrip('/')
+    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    return url, base_url
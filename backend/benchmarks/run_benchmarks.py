@@ -0,0 +1,339 @@
+"""
+Micro-benchmarks OFFLINE das funções de extração (sem Chrome, sem rede, sem Gemini).
+
+As páginas vêm do corpus gravado em 'benchmarks/corpus' (manifest.json); as
+páginas grandes ficam comprimidas ('.html.gz', ex: a home "e-commerce" de ~3 MB).
+O 'page_fetcher' dos serviços é trocado por um fetcher que apenas devolve as
+páginas do corpus.
+
+Uso (a partir da pasta backend):
+    python benchmarks/run_benchmarks.py                  # compara com o baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline  # grava o baseline
+    python benchmarks/run_benchmarks.py --filter tech --repeat 50
+
+Sai com código 1 se algum caso ficar mais de '--threshold' % acima do baseline
+(tempo ou memória), ou com '--warn-only' apenas avisa. O baseline gravado é da
+máquina de quem o gravou: grave um novo ('--save-baseline') ao mudar de máquina.
+
+Para cada caso: tempo (mediana e mínimo), vazão (MB/s de HTML processado)
+e pico de memória (tracemalloc, numa execução separada da medição de tempo).
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from app.modules.scraping import services  # noqa: E402
+from app.modules.scraping.extraction import extract_page  # noqa: E402
+from app.modules.scraping.content import ContentReducer  # noqa: E402
+
+
+# ==============================================================================
+# 1. CORPUS
+# ==============================================================================
+
+def _read_corpus_file(name):
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(os.path.join(CORPUS_DIR, name), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_corpus():
+    """ Carrega o manifest e devolve a lista de sites com o HTML já em memória. """
+    with open(os.path.join(CORPUS_DIR, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    sites = []
+    for site in manifest["sites"]:
+        html = _read_corpus_file(site["home"])
+
+        pages = {site["url"]: _corpus_page(site["url"], html, site.get("headers"), site.get("cookies"))}
+        for link, file_name in site.get("subpages", {}).items():
+            pages[link] = _corpus_page(link, _read_corpus_file(file_name), {"content-type": "text/html"}, {})
+
+        sites.append({"name": site["name"], "url": site["url"], "pages": pages})
+    return sites
+
+
+def _corpus_page(url, html, headers, cookies):
+    """ Mesmo formato de página do PageFetcher. """
+    return {"url": url, "html": html, "headers": dict(headers or {}), "cookies": dict(cookies or {}), "via": "http"}
+
+
+class ReplayFetcher:
+    """ Substitui o PageFetcher: devolve as páginas gravadas (nada de rede/Chrome). """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def fetch(self, url):
+        page = self.pages.get(url) or self.pages.get(url.rstrip("/")) or self.pages.get(url.rstrip("/") + "/")
+        if page is None:
+            raise LookupError(f"Página fora do corpus: {url}")
+        return dict(page)
+
+
+# ==============================================================================
+# 2. CASOS E MEDIÇÃO
+# ==============================================================================
+
+# Detector de tecnologias ANTERIOR ao motor de assinaturas (13 regex sobre o
+# HTML inteiro). É a referência: o motor não pode ser mais lento do que ele.
+LEGACY_TECH_PATTERNS = {
+    'React': r'react-dom|react\.js|react\.min\.js',
+    'Vue.js': r'vue\.js|vue\.min\.js',
+    'Angular': r'angular\.js|angular\.min\.js',
+    'jQuery': r'jquery\.js|jquery\.min\.js',
+    'WordPress': r'wp-content|wp-includes',
+    'Shopify': r'cdn\.shopify\.com',
+    'VTEX': r'vteximg\.com\.br|vtexassets\.com',
+    'Nuvemshop': r'cdn\.nuvemshop\.com\.br',
+    'Wix': r'wix\.com|static\.parastorage\.com',
+    'Google Analytics': r'google-analytics\.com/analytics\.js|gtag\(\'config\', \'UA-',
+    'Google Tag Manager': r'googletagmanager\.com/gtm\.js',
+    'Hotjar': r'static\.hotjar\.com',
+    'RD Station': r'tools\.rdstation\.com\.br',
+}
+
+
+def legacy_detect_technology_stack(html_content):
+    return [tech for tech, pattern in LEGACY_TECH_PATTERNS.items() if re.search(pattern, html_content, re.IGNORECASE)]
+
+
+def build_cases(sites):
+    """ Retorna [(nome, função sem argumentos, bytes de HTML processados por chamada)]. """
+    cases = []
+    # Sem map-reduce: o benchmark não chama o Gemini (mede o corte por orçamento)
+    reducer = ContentReducer()
+    reducer.map_reduce_threshold_tokens = 0
+    for site in sites:
+        url = site["url"]
+        home = site["pages"][url]
+        extracao = extract_page(home["html"])
+        home_bytes = len(home["html"].encode("utf-8"))
+        sub_bytes = sum(
+            len(page["html"].encode("utf-8")) for link, page in site["pages"].items() if link != url
+        )
+
+        cases.append((
+            f"extract_page[{site['name']}]",
+            lambda html=home["html"]: extract_page(html),
+            home_bytes,
+        ))
+        cases.append((
+            f"scrape_home_page_dossier[{site['name']}]",
+            lambda url=url: services.scrape_home_page_dossier(url),
+            home_bytes,
+        ))
+        cases.append((
+            f"scrape_sub_page_analysis[{site['name']}]",
+            lambda url=url, links=extracao["links"]: services.scrape_sub_page_analysis(url, links),
+            sub_bytes,
+        ))
+        cases.append((
+            f"_detect_technology_stack[{site['name']}]",
+            lambda page=home, extracao=extracao: services._detect_technology_stack(page, extracao),
+            home_bytes,
+        ))
+        cases.append((
+            f"legacy_tech_regex[{site['name']}]",
+            lambda html=home["html"]: legacy_detect_technology_stack(html),
+            home_bytes,
+        ))
+        pages = [(url, extracao["blocos"])] + [
+            (link, extract_page(page["html"])["blocos"]) for link, page in site["pages"].items() if link != url
+        ]
+        cases.append((
+            f"content_reducer.prepare[{site['name']}]",
+            lambda pages=pages: reducer.prepare(pages),
+            home_bytes + sub_bytes,
+        ))
+    return cases
+
+
+def measure(fn, repeat, warmup):
+    """ Tempos (segundos) de 'repeat' chamadas + pico de memória de uma chamada. """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return timings, peak
+
+
+def run_cases(cases, repeat, warmup):
+    results = {}
+    for name, fn, size_bytes in cases:
+        # Os serviços fazem muitos print(); não é isso que queremos medir
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings, peak = measure(fn, repeat, warmup)
+
+        median = statistics.median(timings)
+        results[name] = {
+            "median_ms": round(median * 1000, 3),
+            "min_ms": round(min(timings) * 1000, 3),
+            "throughput_mb_s": round(size_bytes / median / 1e6, 2) if median and size_bytes else None,
+            "peak_memory_kb": round(peak / 1024, 1),
+            "input_kb": round(size_bytes / 1024, 1),
+        }
+    return results
+
+
+# ==============================================================================
+# 3. BASELINE E RELATÓRIO
+# ==============================================================================
+
+def _delta(current, previous):
+    if not previous:
+        return None
+    return (current - previous) / previous * 100
+
+
+def report(results, baseline, threshold, min_delta_ms=0.0):
+    """
+    Imprime a tabela e devolve a lista de regressões acima de 'threshold' (%).
+    A regressão de tempo é medida no MÍNIMO (menos sensível ao ruído da máquina
+    do que a mediana) e só conta se também passar de 'min_delta_ms' em absoluto:
+    nos casos de décimos de milissegundo, +50% é ruído.
+    """
+    header = f"{'caso':<52} {'mediana ms':>11} {'min ms':>9} {'MB/s':>8} {'pico KB':>10} {'Δ min':>9} {'Δ mem':>8}"
+    print(header)
+    print("-" * len(header))
+
+    regressions = []
+    for name, current in results.items():
+        previous = (baseline or {}).get(name)
+        time_delta = _delta(current["min_ms"], previous["min_ms"]) if previous else None
+        mem_delta = _delta(current["peak_memory_kb"], previous["peak_memory_kb"]) if previous else None
+
+        time_text = f"{time_delta:+.1f}%" if time_delta is not None else "-"
+        mem_text = f"{mem_delta:+.1f}%" if mem_delta is not None else "-"
+        throughput = current["throughput_mb_s"] if current["throughput_mb_s"] is not None else "-"
+        print(f"{name:<52} {current['median_ms']:>11.3f} {current['min_ms']:>9.3f} {throughput:>8} "
+              f"{current['peak_memory_kb']:>10.1f} {time_text:>9} {mem_text:>8}")
+
+        if time_delta is not None and time_delta > threshold and current["min_ms"] - previous["min_ms"] > min_delta_ms:
+            regressions.append((name, "tempo", time_delta))
+        if mem_delta is not None and mem_delta > threshold:
+            regressions.append((name, "memória", mem_delta))
+
+    return regressions
+
+
+def check_tech_detection(results):
+    """
+    Asserção: em cada site, o motor de assinaturas (_detect_technology_stack)
+    não pode ser mais lento do que o detector antigo (legacy_tech_regex).
+    Devolve a lista de falhas [(site, ms do motor, ms do antigo)].
+    """
+    failures = []
+    for name, current in results.items():
+        if not name.startswith("_detect_technology_stack["):
+            continue
+        site = name[len("_detect_technology_stack"):]
+        legacy = results.get(f"legacy_tech_regex{site}")
+        if legacy and current["median_ms"] > legacy["median_ms"]:
+            failures.append((site, current["median_ms"], legacy["median_ms"]))
+    return failures
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path, results, args):
+    payload = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"Baseline gravado em {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline das funções de extração.")
+    parser.add_argument("--repeat", type=int, default=10, help="Execuções medidas por caso")
+    parser.add_argument("--warmup", type=int, default=2, help="Execuções de aquecimento por caso")
+    parser.add_argument("--filter", default="", help="Só os casos cujo nome contém este texto")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Ficheiro do baseline (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--threshold", type=float, default=25.0, help="Regressão tolerada (%%) face ao baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Diferença de tempo (ms) abaixo da qual não há regressão")
+    parser.add_argument("--warn-only", action="store_true", help="Só avisa das regressões (sai com código 0)")
+    args = parser.parse_args(argv)
+
+    sites = load_corpus()
+    pages = {}
+    for site in sites:
+        pages.update(site["pages"])
+    services.page_fetcher = ReplayFetcher(pages)
+
+    cases = [case for case in build_cases(sites) if args.filter in case[0]]
+    if not cases:
+        print(f"Nenhum caso corresponde a '{args.filter}'.")
+        return 1
+
+    results = run_cases(cases, args.repeat, args.warmup)
+
+    tech_failures = check_tech_detection(results)
+    for site, engine_ms, legacy_ms in tech_failures:
+        print(f"FALHA: _detect_technology_stack{site} ({engine_ms:.3f} ms) mais lento "
+              f"que o detector antigo ({legacy_ms:.3f} ms)")
+
+    if args.save_baseline:
+        report(results, None, args.threshold)
+        save_baseline(args.baseline, results, args)
+        return 1 if tech_failures else 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"AVISO: sem baseline em {args.baseline}; use --save-baseline para criar um.")
+    regressions = report(results, baseline, args.threshold, args.min_delta_ms)
+
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) acima de {args.threshold:.0f}%:")
+        for name, kind, delta in regressions:
+            print(f"  - {name}: {kind} {delta:+.1f}%")
+        if not args.warn_only:
+            return 1
+    return 1 if tech_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
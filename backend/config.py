@@ -13,8 +13,147 @@ class Config:
     # POR ISTO:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False 
+    # Pool de conexões do Postgres, POR worker. Cada scrape em curso segura UMA
+    # conexão durante o pipeline todo (a do pg_advisory_lock, que é de sessão);
+    # os pedidos à espera desse scrape não seguram nenhuma. Dimensione para os
+    # scrapes simultâneos de um worker (pedidos interativos + SCRAPE_BATCH_CONCURRENCY
+    # + SCRAPE_JOB_WORKERS + SCRAPE_PREWARM_CONCURRENCY) mais as queries curtas dos
+    # outros pedidos; o total de todos os workers tem de caber no max_connections do Postgres.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_pre_ping": True,
+    }
     JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(hours=2)
     
+    # Pool de drivers do Selenium (Chrome headless)
+    SCRAPER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", 4))
+    SCRAPER_POOL_MAX_PAGES = int(os.getenv("SCRAPER_POOL_MAX_PAGES", 50))  # Recicla após N páginas
+    SCRAPER_POOL_MAX_MEMORY_MB = int(os.getenv("SCRAPER_POOL_MAX_MEMORY_MB", 512))  # Teto do heap JS
+    SCRAPER_POOL_CHECKOUT_TIMEOUT = int(os.getenv("SCRAPER_POOL_CHECKOUT_TIMEOUT", 30))
+    SCRAPER_POOL_PREWARM = os.getenv("SCRAPER_POOL_PREWARM", "true").lower() == "true"
+
+    # Chrome: carregamento e bloqueio de recursos (listas separadas por vírgulas)
+    SCRAPER_PAGE_LOAD_STRATEGY = os.getenv("SCRAPER_PAGE_LOAD_STRATEGY", "eager")  # normal | eager | none
+    SCRAPER_PAGE_LOAD_TIMEOUT = int(os.getenv("SCRAPER_PAGE_LOAD_TIMEOUT", 20))
+    SCRAPER_BLOCK_RESOURCE_TYPES = os.getenv("SCRAPER_BLOCK_RESOURCE_TYPES", "image,font,media")  # + stylesheet
+    SCRAPER_BLOCK_TRACKERS = os.getenv("SCRAPER_BLOCK_TRACKERS", "true").lower() == "true"
+    SCRAPER_BLOCK_URL_PATTERNS = os.getenv("SCRAPER_BLOCK_URL_PATTERNS", "")  # ex: "*hotjar.com/*,*.pdf"
+    SCRAPER_READY_TIMEOUT = float(os.getenv("SCRAPER_READY_TIMEOUT", 10))
+    SCRAPER_READY_POLL_INTERVAL = float(os.getenv("SCRAPER_READY_POLL_INTERVAL", 0.3))
+
+    # Fast path HTTP (Selenium só para páginas renderizadas por JavaScript)
+    SCRAPER_HTTP_FAST_PATH = os.getenv("SCRAPER_HTTP_FAST_PATH", "true").lower() == "true"
+    SCRAPER_HTTP_TIMEOUT = int(os.getenv("SCRAPER_HTTP_TIMEOUT", 10))
+    SCRAPER_HTTP_POOL_SIZE = int(os.getenv("SCRAPER_HTTP_POOL_SIZE", 20))
+    SCRAPER_STATIC_MIN_TEXT = int(os.getenv("SCRAPER_STATIC_MIN_TEXT", 500))  # Mínimo de caracteres de texto visível
+
+    # Tetos de memória por página (o que passar é ignorado e reportado em 'limites_atingidos')
+    SCRAPER_MAX_HTML_BYTES = int(os.getenv("SCRAPER_MAX_HTML_BYTES", 5 * 1024 * 1024))
+    SCRAPER_MAX_ELEMENTS = int(os.getenv("SCRAPER_MAX_ELEMENTS", 100000))
+    SCRAPER_MAX_TEXT_CHARS = int(os.getenv("SCRAPER_MAX_TEXT_CHARS", 300000))
+    SCRAPER_MAX_LINKS = int(os.getenv("SCRAPER_MAX_LINKS", 5000))
+
+    # Educação por host (token bucket + concorrência + robots.txt crawl-delay).
+    # ATENÇÃO: os limites são POR PROCESSO (estado em memória do HostScheduler).
+    # Com N workers do gunicorn (ou várias máquinas), um host pode receber até
+    # N x SCRAPER_HOST_MAX_CONCURRENCY pedidos simultâneos e N x SCRAPER_HOST_RATE
+    # pedidos/s: divida os valores pelo número de workers se o limite for global.
+    SCRAPER_POLITENESS = os.getenv("SCRAPER_POLITENESS", "true").lower() == "true"
+    SCRAPER_HOST_MAX_CONCURRENCY = int(os.getenv("SCRAPER_HOST_MAX_CONCURRENCY", 2))
+    SCRAPER_HOST_RATE = float(os.getenv("SCRAPER_HOST_RATE", 1.0))  # Pedidos/s por host
+    SCRAPER_HOST_BURST = int(os.getenv("SCRAPER_HOST_BURST", 3))
+    SCRAPER_GLOBAL_MAX_CONCURRENCY = int(os.getenv("SCRAPER_GLOBAL_MAX_CONCURRENCY", 16))
+    SCRAPER_HOST_SLOT_TIMEOUT = int(os.getenv("SCRAPER_HOST_SLOT_TIMEOUT", 60))
+    SCRAPER_RESPECT_ROBOTS = os.getenv("SCRAPER_RESPECT_ROBOTS", "true").lower() == "true"
+    SCRAPER_MAX_CRAWL_DELAY = float(os.getenv("SCRAPER_MAX_CRAWL_DELAY", 10))
+    SCRAPER_ROBOTS_TTL_SECONDS = int(os.getenv("SCRAPER_ROBOTS_TTL_SECONDS", 3600))
+    SCRAPER_ROBOTS_TIMEOUT = float(os.getenv("SCRAPER_ROBOTS_TIMEOUT", 5))  # Segundos
+
+    # Sub-páginas: quantas em paralelo e prazo total (segundos) antes do resultado parcial
+    SCRAPER_SUBPAGE_PARALLELISM = int(os.getenv("SCRAPER_SUBPAGE_PARALLELISM", 3))
+    SCRAPER_SUBPAGE_DEADLINE = int(os.getenv("SCRAPER_SUBPAGE_DEADLINE", 25))
+    SCRAPER_SUBPAGE_MAX = int(os.getenv("SCRAPER_SUBPAGE_MAX", 5))
+    SCRAPER_SITEMAP_ENABLED = os.getenv("SCRAPER_SITEMAP_ENABLED", "true").lower() == "true"  # Candidatas do sitemap.xml
+    SCRAPER_SITEMAP_FETCH_TIMEOUT = float(os.getenv("SCRAPER_SITEMAP_FETCH_TIMEOUT", 3))  # Por pedido (vaga do host incluída)
+    SCRAPER_SITEMAP_CACHE_TTL = int(os.getenv("SCRAPER_SITEMAP_CACHE_TTL", 6 * 3600))
+
+    # Prazo único (segundos) do pipeline inteiro: home + sub-páginas + Tech Stack + Gemini
+    SCRAPER_PIPELINE_DEADLINE = int(os.getenv("SCRAPER_PIPELINE_DEADLINE", 60))
+
+    # Cache das análises do Gemini (chave: hash do texto + versão do prompt)
+    AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 1000))
+
+    # Texto enviado ao Gemini: orçamento de tokens e map-reduce dos sites grandes
+    AI_MAX_INPUT_TOKENS = int(os.getenv("AI_MAX_INPUT_TOKENS", 12000))
+    AI_MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("AI_MAP_REDUCE_THRESHOLD_TOKENS", 24000))  # 0 desliga
+    AI_CHUNK_TOKENS = int(os.getenv("AI_CHUNK_TOKENS", 6000))
+    AI_MAX_CHUNKS = int(os.getenv("AI_MAX_CHUNKS", 8))
+    AI_MAP_WORKERS = int(os.getenv("AI_MAP_WORKERS", 4))
+    AI_CHUNK_SUMMARY_WORDS = int(os.getenv("AI_CHUNK_SUMMARY_WORDS", 200))
+
+    # Resiliência do cliente do Gemini: timeouts, repetições, circuit breaker e concorrência
+    GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")  # ex: "http://127.0.0.1:8089" (tools/fake_gemini.py)
+    AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", 20))  # Por tentativa
+    AI_CALL_DEADLINE = float(os.getenv("AI_CALL_DEADLINE", 45))  # Total da chamada (com as repetições)
+    AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", 2))
+    AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", 0.5))
+    AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", 4))
+    AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", 5))  # Falhas seguidas
+    AI_CIRCUIT_RESET_SECONDS = int(os.getenv("AI_CIRCUIT_RESET_SECONDS", 30))
+    AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", 8))  # Chamadas em curso por processo
+    AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", 10))  # Espera máxima por uma vaga
+
+    # Cache de scrapes: TTL, janela de "stale-while-revalidate" e nível em memória
+    SCRAPE_CACHE_TTL_SECONDS = int(os.getenv("SCRAPE_CACHE_TTL_SECONDS", 24 * 3600))
+    SCRAPE_CACHE_STALE_SECONDS = int(os.getenv("SCRAPE_CACHE_STALE_SECONDS", 7 * 24 * 3600))
+    SCRAPE_MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_MEMORY_CACHE_MAX_ENTRIES", 500))
+    # Quanto tempo um worker confia na sua cópia em memória antes de reler o Postgres:
+    # é o atraso máximo com que uma invalidação feita noutro worker do gunicorn chega a este
+    SCRAPE_MEMORY_CACHE_TTL_SECONDS = int(os.getenv("SCRAPE_MEMORY_CACHE_TTL_SECONDS", 60))
+    SCRAPE_CACHE_REFRESH_WORKERS = int(os.getenv("SCRAPE_CACHE_REFRESH_WORKERS", 2))
+    # Acessos ao cache ainda não gravados no DB (gravados pela manutenção e pelo
+    # pré-aquecimento). Acima do teto os URLs mais antigos perdem os acessos pendentes
+    SCRAPE_ACCESS_LOG_MAX_ENTRIES = int(os.getenv("SCRAPE_ACCESS_LOG_MAX_ENTRIES", 10000))
+
+    # Manutenção do cache em background (0 desliga a thread)
+    SCRAPE_CACHE_MAINTENANCE_INTERVAL = int(os.getenv("SCRAPE_CACHE_MAINTENANCE_INTERVAL", 300))
+    SCRAPE_CACHE_PURGE_AFTER_SECONDS = int(os.getenv("SCRAPE_CACHE_PURGE_AFTER_SECONDS", 30 * 24 * 3600))
+    SCRAPE_CACHE_PURGE_BATCH = int(os.getenv("SCRAPE_CACHE_PURGE_BATCH", 500))
+    SCRAPE_CACHE_MAX_ROWS = int(os.getenv("SCRAPE_CACHE_MAX_ROWS", 0))  # 0 = sem limite
+    SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", 0))  # 0 = sem limite
+
+    # Pré-aquecimento do cache das contas acompanhadas (tracked_accounts), fora das horas de pico
+    SCRAPE_PREWARM_INTERVAL = int(os.getenv("SCRAPE_PREWARM_INTERVAL", 60))  # 0 desliga a thread
+    SCRAPE_PREWARM_WINDOW = os.getenv("SCRAPE_PREWARM_WINDOW", "01:00-06:00")  # Hora local; "" = a qualquer hora
+    SCRAPE_PREWARM_RATE_PER_MINUTE = float(os.getenv("SCRAPE_PREWARM_RATE_PER_MINUTE", 10))
+    SCRAPE_PREWARM_CONCURRENCY = int(os.getenv("SCRAPE_PREWARM_CONCURRENCY", 2))
+    SCRAPE_PREWARM_LEAD_SECONDS = int(os.getenv("SCRAPE_PREWARM_LEAD_SECONDS", 3600))  # Margem antes de expirar
+    SCRAPE_PREWARM_RETRY_SECONDS = int(os.getenv("SCRAPE_PREWARM_RETRY_SECONDS", 3600))  # Após uma falha
+    SCRAPE_PREWARM_BATCH = int(os.getenv("SCRAPE_PREWARM_BATCH", 50))
+
+    # Tempo máximo à espera de um scrape da mesma URL em curso noutro processo (advisory lock)
+    SCRAPE_LOCK_TIMEOUT_SECONDS = int(os.getenv("SCRAPE_LOCK_TIMEOUT_SECONDS", 120))
+
+    # Scrape em lote (NDJSON em streaming)
+    SCRAPE_BATCH_MAX_URLS = int(os.getenv("SCRAPE_BATCH_MAX_URLS", 500))
+    SCRAPE_BATCH_CONCURRENCY = int(os.getenv("SCRAPE_BATCH_CONCURRENCY", 4))
+
+    # Jobs de scrape assíncronos (fila local em processo, estado no Postgres)
+    SCRAPE_JOB_WORKERS = int(os.getenv("SCRAPE_JOB_WORKERS", 2))
+    SCRAPE_JOB_QUEUE_MAX = int(os.getenv("SCRAPE_JOB_QUEUE_MAX", 100))
+    SCRAPE_JOB_STALE_SECONDS = int(os.getenv("SCRAPE_JOB_STALE_SECONDS", 600))  # 'running' órfão após restart
+
+    # Pesquisa nos dossiês em cache (GET /api/v1/scraping/search)
+    SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", 50))
+    SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", 200))
+
+    # Observabilidade: logs JSON por etapa e token opcional do /metrics
+    STRUCTURED_LOGS = os.getenv("STRUCTURED_LOGS", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
     DEBUG = False
     TESTING = False
 
@@ -25,6 +164,10 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     """Configuração de Testes"""
     TESTING = True
+    SCRAPER_POOL_PREWARM = False
+    SCRAPE_JOB_WORKERS = 0
+    SCRAPE_CACHE_MAINTENANCE_INTERVAL = 0
+    SCRAPE_PREWARM_INTERVAL = 0
     MONGO_URI = os.getenv("MONGO_TEST_URI", "mongodb://localhost:27017/sales_scraper_test_db")
 
 class ProductionConfig(Config):
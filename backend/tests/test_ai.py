@@ -0,0 +1,103 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.modules.scraping.ai import GeminiClient
+from app.modules.scraping.resilience import CircuitBreaker
+from tools.fake_gemini import FakeGeminiState, make_handler
+
+
+@pytest.fixture
+def fake_gemini():
+    """ tools/fake_gemini.py numa porta efémera, na mesma máquina. """
+    state = FakeGeminiState(hang_seconds=2)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield state, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def client(fake_gemini, monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "fake")
+    _state, endpoint = fake_gemini
+    client = GeminiClient()
+    client.api_endpoint = endpoint
+    client.request_timeout = 5
+    client.call_deadline = 10
+    client.max_retries = 2
+    client.retry_base_delay = 0.01
+    client.retry_max_delay = 0.02
+    client.breaker = CircuitBreaker(failure_threshold=5, reset_seconds=30)
+    return client
+
+
+def test_analyze_returns_the_fake_analysis(fake_gemini, client):
+    state, _endpoint = fake_gemini
+
+    analysis = client.analyze("Somos uma fábrica de estruturas metálicas.")
+
+    assert analysis["main_subject"] == "Assunto falso"
+    assert state.stats["requests"] == 1
+
+
+def test_transient_errors_are_retried_until_success(fake_gemini, client):
+    state, _endpoint = fake_gemini
+    state.update({"fail_next": 2})
+
+    analysis = client.analyze("Texto que falha duas vezes.")
+
+    assert analysis["main_subject"] == "Assunto falso"
+    assert state.stats["error"] == 2
+    assert state.stats["ok"] == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retries_are_bounded(fake_gemini, client):
+    state, _endpoint = fake_gemini
+    state.update({"mode": "error"})
+
+    assert client.analyze("Gemini em baixo.") == {}
+    assert state.stats["requests"] == 1 + client.max_retries
+
+
+def test_hung_request_times_out_instead_of_blocking(fake_gemini, client):
+    state, _endpoint = fake_gemini
+    state.update({"mode": "hang"})
+    client.request_timeout = 0.3
+    client.max_retries = 0
+
+    started = time.monotonic()
+    assert client.analyze("Pedido pendurado.") == {}
+
+    assert time.monotonic() - started < 1.5
+    assert state.stats["hang"] == 1
+
+
+def test_circuit_opens_after_repeated_failures_and_recovers(fake_gemini, client):
+    state, _endpoint = fake_gemini
+    state.update({"mode": "error"})
+    client.max_retries = 0
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.3)
+
+    client.analyze("Falha 1.")
+    client.analyze("Falha 2.")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # Circuito aberto: a análise é saltada sem chegar ao servidor
+    requests_before = state.stats["requests"]
+    assert client.analyze("Saltada.") == {}
+    assert state.stats["requests"] == requests_before
+
+    # Passado o 'reset_seconds', a chamada de teste (half-open) fecha o circuito
+    state.update({"mode": "ok"})
+    time.sleep(0.35)
+    assert client.analyze("Recuperado.")["main_subject"] == "Assunto falso"
+    assert client.breaker.state == CircuitBreaker.CLOSED
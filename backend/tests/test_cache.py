@@ -0,0 +1,53 @@
+import time
+
+from app.modules.scraping.cache import ScrapeCache
+from app.utils import TTLCache
+
+
+def _cache(memory_ttl):
+    cache = ScrapeCache()
+    cache.memory_ttl = memory_ttl
+    cache.memory = TTLCache(maxsize=10, ttl=memory_ttl)
+    return cache
+
+
+def test_memory_copy_expires_after_memory_ttl_even_when_record_is_fresh():
+    cache = _cache(memory_ttl=0.05)
+    cache.store_memory("https://exemplo.com", {"ok": True})
+    assert cache.memory.get("https://exemplo.com") is not None
+
+    time.sleep(0.1)
+
+    # Outro worker pode ter invalidado o registo: a próxima leitura vai ao Postgres
+    assert cache.memory.get("https://exemplo.com") is None
+
+
+def test_memory_copy_keeps_the_real_age_of_the_record():
+    cache = _cache(memory_ttl=60)
+    cache.store_memory("https://exemplo.com", {"ok": True}, age=cache.ttl + 10)
+
+    data, stored_at = cache.memory.get("https://exemplo.com")
+
+    assert time.time() - stored_at >= cache.ttl + 10
+
+
+def test_record_past_the_stale_window_is_not_kept_in_memory():
+    cache = _cache(memory_ttl=60)
+    cache.store_memory("https://exemplo.com", {"ok": True}, age=cache.ttl + cache.stale_window + 1)
+    assert cache.memory.get("https://exemplo.com") is None
+
+
+def test_pending_accesses_are_capped_when_nothing_flushes_them():
+    cache = ScrapeCache()
+    cache.max_pending_accesses = 2
+
+    cache.record_access("https://a.com")
+    cache.record_access("https://b.com")
+    cache.record_access("https://a.com")
+    cache.record_access("https://c.com")
+
+    accesses = cache.drain_accesses()
+    # Sai o URL inserido há mais tempo; os hits dos que ficam mantêm-se
+    assert list(accesses) == ["https://b.com", "https://c.com"]
+    assert accesses["https://c.com"][1] == 1
+    assert cache.drain_accesses() == {}
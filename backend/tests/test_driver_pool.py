@@ -0,0 +1,85 @@
+import pytest
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from app.modules.scraping.driver_pool import DriverPool, DriverPoolExhausted
+
+
+class FakeDriver:
+    """ Driver falso: 'crash()' simula o chromedriver morto (erro do urllib3, não do Selenium). """
+
+    def __init__(self):
+        self.dead = False
+        self.quit_calls = 0
+
+    def crash(self):
+        self.dead = True
+
+    def _check(self):
+        if self.dead:
+            raise MaxRetryError(None, "/session/abc/execute/sync", NewConnectionError(None, "Connection refused"))
+
+    def execute_script(self, script):
+        self._check()
+        return 0 if "performance" in script else 1
+
+    def delete_all_cookies(self):
+        self._check()
+
+    def get(self, url):
+        self._check()
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def pool():
+    drivers = []
+
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    pool = DriverPool(factory)
+    pool.size = 1
+    pool.checkout_timeout = 0.2
+    pool.drivers = drivers
+    return pool
+
+
+def test_checkout_replaces_driver_whose_probe_raises_non_webdriver_error(pool):
+    driver = pool.checkout()
+    pool.checkin(driver)
+    driver.crash()
+
+    replacement = pool.checkout()
+
+    assert replacement is not driver
+    assert driver.quit_calls == 1
+    assert pool.stats() == {"size": 1, "total": 1, "idle": 0, "in_use": 1}
+
+
+def test_checkin_of_crashed_driver_releases_the_slot(pool):
+    driver = pool.checkout()
+    driver.crash()
+
+    pool.checkin(driver)
+
+    assert driver.quit_calls == 1
+    assert pool.stats() == {"size": 1, "total": 0, "idle": 0, "in_use": 0}
+    assert pool.checkout() is not driver
+
+
+def test_crashed_drivers_never_exhaust_the_pool(pool):
+    for _ in range(5):
+        with pool.driver() as driver:
+            driver.crash()
+    assert pool.stats()["total"] == 0
+    with pool.driver() as driver:
+        assert not driver.dead
+
+
+def test_pool_still_reports_exhaustion_when_all_drivers_are_busy(pool):
+    pool.checkout()
+    with pytest.raises(DriverPoolExhausted):
+        pool.checkout(timeout=0.05)
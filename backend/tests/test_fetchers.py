@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from app.modules.scraping.fetchers import PageFetcher
+from app.modules.scraping.politeness import HostSlotTimeout
+
+
+class BusyScheduler:
+    """HostScheduler sem vagas: toda a espera termina em HostSlotTimeout."""
+
+    @contextmanager
+    def slot(self, url, timeout=None):
+        raise HostSlotTimeout(f"Sem vaga para {url}.")
+        yield
+
+
+class FailingSession:
+    def get(self, *args, **kwargs):
+        raise AssertionError("O pedido não devia sair sem a vaga do host")
+
+
+def _fetcher():
+    fetcher = PageFetcher(driver_pool=None, scheduler=BusyScheduler())
+    fetcher.session = FailingSession()
+    return fetcher
+
+
+def test_fetch_http_treats_a_slot_timeout_as_a_fast_path_failure():
+    assert _fetcher().fetch_http("https://exemplo.com") is None
+
+
+def test_revalidate_treats_a_slot_timeout_as_failed():
+    assert _fetcher().revalidate("https://exemplo.com", etag='"abc"') == ("failed", None)
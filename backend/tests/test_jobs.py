@@ -0,0 +1,92 @@
+import queue
+
+import pytest
+
+from app.modules.scraping import jobs
+from app.modules.scraping.jobs import JobQueueFull, ScrapeJobRunner
+
+
+class FakeSession:
+    """Sessão de mentira: guarda os jobs 'gravados' (commit) num dict."""
+
+    def __init__(self):
+        self.pending = []
+        self.rows = {}
+        self._next_id = 0
+
+    def add(self, job):
+        self.pending.append(("add", job))
+
+    def delete(self, job):
+        self.pending.append(("delete", job))
+
+    def commit(self):
+        for op, job in self.pending:
+            if op == "add":
+                self._next_id += 1
+                job.id = job.id or f"job-{self._next_id}"
+                self.rows[job.id] = job
+            else:
+                self.rows.pop(job.id, None)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+
+class FakeDB:
+    def __init__(self):
+        self.session = FakeSession()
+
+
+class RacingQueue(queue.Queue):
+    """Fila que parece ter espaço no 'full()' mas enche antes do 'put' (outro pedido ganhou)."""
+
+    def full(self):
+        return False
+
+    def put_nowait(self, item):
+        raise queue.Full
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(jobs, "db", fake)
+    return fake
+
+
+def _runner(job_queue):
+    runner = ScrapeJobRunner()
+    runner._queue = job_queue
+    runner._workers = [object()]
+    return runner
+
+
+def test_submit_enqueues_the_committed_job(fake_db):
+    runner = _runner(queue.Queue(maxsize=1))
+
+    job = runner.submit("https://exemplo.com")
+
+    assert job.id in fake_db.session.rows
+    assert runner._queue.get_nowait() == job.id
+
+
+def test_submit_rejected_by_a_full_queue_leaves_no_pending_job(fake_db):
+    runner = _runner(RacingQueue(maxsize=1))
+
+    with pytest.raises(JobQueueFull):
+        runner.submit("https://exemplo.com")
+
+    # O cliente recebeu 503: nada fica 'pending' para o _recover_jobs re-executar
+    assert fake_db.session.rows == {}
+
+
+def test_submit_checks_the_queue_before_creating_the_job(fake_db):
+    runner = _runner(queue.Queue(maxsize=1))
+    runner._queue.put_nowait("outro-job")
+
+    with pytest.raises(JobQueueFull):
+        runner.submit("https://exemplo.com")
+
+    assert fake_db.session.rows == {}
@@ -0,0 +1,32 @@
+from sqlalchemy.dialects import postgresql
+
+from app.models import ScrapedData, User
+from tools.migrate_indexes import DROPPED_INDEXES, create_index_concurrently_sql
+
+
+def _index(table, name):
+    return next(index for index in table.indexes if index.name == name)
+
+
+def test_gin_expression_index_is_built_concurrently():
+    index = _index(ScrapedData.__table__, "ix_scraped_data_cache_tecnologias")
+
+    sql = create_index_concurrently_sql(index, postgresql.dialect())
+
+    assert sql.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_scraped_data_cache_tecnologias ")
+    assert "USING gin" in sql
+
+
+def test_unique_index_keeps_unique():
+    index = _index(User.__table__, "ix_users_email")
+
+    sql = create_index_concurrently_sql(index, postgresql.dialect())
+
+    assert sql.startswith("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email ")
+
+
+def test_dropped_indexes_are_no_longer_in_the_models():
+    names = {index.name for index in ScrapedData.__table__.indexes}
+
+    assert "ix_scraped_data_cache_url_scraped_at" in DROPPED_INDEXES
+    assert not names & set(DROPPED_INDEXES)
@@ -0,0 +1,76 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from app.modules.scraping import routes, scraping_bp
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY="chave-de-teste-com-pelo-menos-32-bytes", SCRAPE_BATCH_MAX_URLS=3)
+    JWTManager(app)
+    app.register_blueprint(scraping_bp)
+
+    def fake_batch(urls, concurrency):
+        for url in urls:
+            yield {"url": url, "status": "ok", "cached": True, "data": {}}
+
+    monkeypatch.setattr(routes, "scrape_batch_service", fake_batch)
+
+    with app.app_context():
+        token = create_access_token(identity="1")
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+@pytest.mark.parametrize("bad_item", ["", "   ", None, 42, "exemplo.com", "ftp://exemplo.com", "https://"])
+def test_batch_rejects_invalid_urls_before_streaming(client, bad_item):
+    response = client.post("/api/v1/scraping/batch", json={"urls": ["https://a.com", bad_item]})
+
+    assert response.status_code == 400
+    assert response.get_json()["invalid_indexes"] == [1]
+
+
+def test_batch_rejects_more_urls_than_the_limit(client):
+    urls = [f"https://site{i}.com" for i in range(4)]
+
+    response = client.post("/api/v1/scraping/batch", json={"urls": urls})
+
+    assert response.status_code == 400
+
+
+def test_batch_streams_valid_urls(client):
+    response = client.post("/api/v1/scraping/batch", json={"urls": [" https://a.com ", "http://b.com/x"]})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert [line for line in response.get_data(as_text=True).splitlines()] == [
+        '{"url": "https://a.com", "status": "ok", "cached": true, "data": {}}',
+        '{"url": "http://b.com/x", "status": "ok", "cached": true, "data": {}}',
+    ]
+
+
+@pytest.mark.parametrize("value", ["yes", "1", "", "verdadeiro"])
+def test_search_rejects_has_email_values_other_than_true_or_false(client, value):
+    response = client.get("/api/v1/scraping/search", query_string={"has_email": value})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("value, expected", [("true", True), ("FALSE", False)])
+def test_search_accepts_has_email_true_or_false(client, monkeypatch, value, expected):
+    seen = {}
+
+    def fake_build_filters(**filters):
+        seen.update(filters)
+        return []
+
+    monkeypatch.setattr(routes, "build_filters", fake_build_filters)
+    monkeypatch.setattr(routes, "search_dossiers", lambda criteria, limit, cursor: ([], None))
+
+    response = client.get("/api/v1/scraping/search", query_string={"has_email": value})
+
+    assert response.status_code == 200
+    assert seen["has_email"] is expected
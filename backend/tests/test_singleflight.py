@@ -0,0 +1,102 @@
+import threading
+
+from app.modules.scraping.singleflight import pg_advisory_lock
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+        self.closed = False
+
+    def execute(self, statement, params):
+        sql = str(statement)
+        with self.engine.mutex:
+            if "pg_try_advisory_lock" in sql:
+                if self.engine.holder is None:
+                    self.engine.holder = self
+                    return FakeResult(True)
+                return FakeResult(False)
+            if "pg_advisory_unlock" in sql:
+                self.engine.holder = None
+                return FakeResult(True)
+        raise AssertionError(f"SQL inesperado: {sql}")
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+        with self.engine.mutex:
+            self.engine.open_connections -= 1
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeDialect:
+    name = "postgresql"
+
+
+class FakeEngine:
+    """Postgres de mentira: um único advisory lock e a contagem de conexões abertas."""
+
+    dialect = FakeDialect()
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.holder = None
+        self.open_connections = 0
+
+    def connect(self):
+        with self.mutex:
+            self.open_connections += 1
+        return FakeConnection(self)
+
+
+def test_waiter_holds_no_connection_while_the_lock_is_busy():
+    engine = FakeEngine()
+    seen_by_waiter = []
+
+    with pg_advisory_lock(engine, "scrape:a") as locked:
+        assert locked
+        waiter = threading.Thread(target=lambda: seen_by_waiter.append(
+            _acquire(engine, timeout_seconds=5)
+        ))
+        waiter.start()
+        for _ in range(5):
+            threading.Event().wait(0.05)
+            # Só a conexão de quem segura o lock está aberta
+            assert engine.open_connections == 1
+
+    waiter.join(timeout=5)
+    assert seen_by_waiter == [True]
+    assert engine.open_connections == 0
+
+
+def test_wait_is_bounded_by_the_timeout():
+    engine = FakeEngine()
+
+    with pg_advisory_lock(engine, "scrape:a") as locked:
+        assert locked
+        assert _acquire(engine, timeout_seconds=0.2) is False
+        assert engine.open_connections == 1
+
+    assert engine.open_connections == 0
+
+
+def test_without_wait_tries_only_once():
+    engine = FakeEngine()
+
+    with pg_advisory_lock(engine, "scrape:a"):
+        with pg_advisory_lock(engine, "scrape:a", wait=False) as locked:
+            assert locked is False
+
+
+def _acquire(engine, timeout_seconds):
+    with pg_advisory_lock(engine, "scrape:a", timeout_seconds=timeout_seconds) as locked:
+        return locked
@@ -0,0 +1,74 @@
+import pytest
+
+from app.modules.scraping.extraction import extract_page
+from app.modules.scraping.tech_detection import SOURCES, LiteralMatcher, get_tech_engine
+from benchmarks.run_benchmarks import legacy_detect_technology_stack, load_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus_pages():
+    return [page for site in load_corpus() for page in site["pages"].values()]
+
+
+def _sources(page):
+    extracao = extract_page(page["html"])
+    return {
+        "script_src": "\n".join(extracao["script_srcs"]),
+        "link_href": "\n".join(extracao["link_hrefs"]),
+        "meta_generator": extracao["meta_generator"],
+        "headers": "\n".join(f"{name}: {value}" for name, value in page["headers"].items()),
+        "cookies": "\n".join(f"{name}={value}" for name, value in page["cookies"].items()),
+        "html": page["html"],
+    }, extracao
+
+
+def _detect(engine, page, extracao):
+    return engine.detect(
+        html_content=page["html"],
+        script_srcs=extracao["script_srcs"],
+        link_hrefs=extracao["link_hrefs"],
+        meta_generator=extracao["meta_generator"],
+        headers=page["headers"],
+        cookies=page["cookies"],
+    )
+
+
+def _brute_force(engine, texts):
+    """ Todas as regex no texto inteiro, sem pré-filtro nem janelas: o resultado de referência. """
+    found = {}
+    for source in SOURCES:
+        for tech_name, regex, _literals, _has_version in engine.signatures[source]:
+            if tech_name in found and found[tech_name]:
+                continue
+            versions = [match.groupdict().get("version") for match in regex.finditer(texts[source])]
+            if versions:
+                found[tech_name] = next((version for version in versions if version), None) or found.get(tech_name)
+    return found
+
+
+def test_prefiltered_engine_matches_brute_force_on_corpus(corpus_pages):
+    engine = get_tech_engine()
+    for page in corpus_pages:
+        texts, extracao = _sources(page)
+        detected = _detect(engine, page, extracao)
+        assert detected == _brute_force(engine, texts), page["url"]
+
+
+def test_engine_finds_everything_the_legacy_detector_finds(corpus_pages):
+    engine = get_tech_engine()
+    for page in corpus_pages:
+        _texts, extracao = _sources(page)
+        detected = _detect(engine, page, extracao)
+        assert set(legacy_detect_technology_stack(page["html"])) <= set(detected), page["url"]
+
+
+def test_literal_matcher_finds_overlapping_and_prefix_keys():
+    matcher = LiteralMatcher(["wix.com", "cdn.nuvemshop.com.br", "data-v-", "v-version", "abc"])
+
+    # ".com" (wix.com) e ".com.br" (nuvemshop) começam na mesma posição
+    assert matcher.find("<a href='https://wix.com.br'>") == {"wix.com"}
+    # "data-v-" e "v-version" sobrepõem-se
+    assert matcher.find("<div data-v-version>") == {"data-v-", "v-version"}
+    # Literal no início do texto e chave sem âncora
+    assert matcher.find("abc cdn.nuvemshop.com.br") == {"abc", "cdn.nuvemshop.com.br"}
+    assert matcher.find("nada aqui") == set()
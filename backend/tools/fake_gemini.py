@@ -0,0 +1,183 @@
+"""
+Servidor FALSO da API do Gemini (REST), para testar o cliente sem chave nem rede:
+latência, erros 5xx/429, pedidos pendurados e respostas inválidas, sob controlo.
+
+Uso (a partir da pasta backend):
+    python tools/fake_gemini.py --port 8089 --latency 0.5
+    python tools/fake_gemini.py --fail-rate 0.3            # 30% de 503
+    python tools/fake_gemini.py --mode hang                 # nunca responde (testa os timeouts)
+
+E no .env do backend:
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089
+    GOOGLE_API_KEY=fake
+
+O comportamento muda em tempo real (ex: simular uma queda e a recuperação):
+    curl -X POST localhost:8089/__fake/config -d '{"mode": "error"}'
+    curl -X POST localhost:8089/__fake/config -d '{"mode": "ok", "latency": 0.2}'
+    curl -X POST localhost:8089/__fake/config -d '{"fail_next": 2}'   # só os 2 próximos dão 503
+    curl localhost:8089/__fake/stats
+
+Modos: ok | error (503) | throttle (429) | hang | invalid (texto que não é JSON)
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGeminiState:
+    def __init__(self, mode="ok", latency=0.0, jitter=0.0, fail_rate=0.0, hang_seconds=300):
+        self.lock = threading.Lock()
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.hang_seconds = hang_seconds
+        self.fail_next = 0
+        self.stats = {"requests": 0, "ok": 0, "error": 0, "throttle": 0, "hang": 0, "invalid": 0}
+
+    def config(self):
+        return {
+            "mode": self.mode,
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "fail_rate": self.fail_rate,
+            "hang_seconds": self.hang_seconds,
+            "fail_next": self.fail_next,
+        }
+
+    def update(self, values):
+        with self.lock:
+            for key in ("mode", "latency", "jitter", "fail_rate", "hang_seconds", "fail_next"):
+                if key in values:
+                    setattr(self, key, values[key])
+
+    def pick_outcome(self):
+        """
+        O que fazer com este pedido: os 'fail_next' próximos dão 503; depois o
+        modo manda (a 'fail_rate' injeta 503 aleatórios no modo 'ok').
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            outcome = self.mode
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                outcome = "error"
+            elif outcome == "ok" and self.fail_rate and random.random() < self.fail_rate:
+                outcome = "error"
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+            return outcome
+
+
+def _fake_text(body):
+    """ Resposta plausível: JSON da análise (response_mime_type JSON) ou um resumo em texto. """
+    prompt = ""
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            prompt += part.get("text", "")
+    generation_config = body.get("generationConfig") or body.get("generation_config") or {}
+    mime_type = generation_config.get("responseMimeType") or generation_config.get("response_mime_type")
+
+    if mime_type == "application/json":
+        return json.dumps({
+            "general_summary": f"Resumo falso ({len(prompt)} caracteres de prompt).",
+            "main_subject": "Assunto falso",
+            "target_audience": "Público falso",
+        }, ensure_ascii=False)
+    return f"Resumo falso de uma parte do site ({len(prompt)} caracteres)."
+
+
+def make_handler(state):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                return json.loads(raw or b"{}")
+            except ValueError:
+                return {}
+
+        def do_GET(self):
+            if self.path.startswith("/__fake/stats"):
+                self._send_json(200, {"config": state.config(), "stats": dict(state.stats)})
+            else:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        def do_POST(self):
+            body = self._read_body()
+
+            if self.path.startswith("/__fake/config"):
+                state.update(body)
+                self._send_json(200, state.config())
+                return
+
+            if ":generateContent" not in self.path:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+                return
+
+            outcome = state.pick_outcome()
+            time.sleep(max(0.0, state.latency + random.uniform(-state.jitter, state.jitter)))
+
+            if outcome == "hang":
+                time.sleep(state.hang_seconds)
+                outcome = "error"
+            if outcome == "error":
+                self._send_json(503, {"error": {"code": 503, "message": "Fake: serviço indisponível", "status": "UNAVAILABLE"}})
+                return
+            if outcome == "throttle":
+                self._send_json(429, {"error": {"code": 429, "message": "Fake: quota excedida", "status": "RESOURCE_EXHAUSTED"}})
+                return
+
+            text = "isto não é JSON" if outcome == "invalid" else _fake_text(body)
+            self._send_json(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": text}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0},
+            })
+
+        def log_message(self, format, *args):
+            print(f"[fake-gemini] {self.address_string()} - {format % args}")
+
+    return FakeGeminiHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso da API REST do Gemini.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--mode", default="ok", choices=["ok", "error", "throttle", "hang", "invalid"])
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos por resposta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação aleatória (+/-) da latência")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fração de 503 aleatórios no modo 'ok'")
+    parser.add_argument("--hang-seconds", type=float, default=300, help="Duração de um pedido 'pendurado'")
+    args = parser.parse_args()
+
+    state = FakeGeminiState(args.mode, args.latency, args.jitter, args.fail_rate, args.hang_seconds)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"Gemini falso em http://{args.host}:{args.port} (modo '{args.mode}'). Ctrl+C para sair.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Migração ÚNICA dos índices das tabelas que já existem (Postgres), SEM bloquear
+as escritas: CREATE INDEX CONCURRENTLY para os índices dos modelos que faltam
+e DROP INDEX CONCURRENTLY para os que deixaram de existir nos modelos.
+
+O arranque da app (upgrade_schema) só cria colunas; numa tabela grande, um
+CREATE INDEX normal (ex: os GIN da pesquisa) bloqueia as escritas durante
+minutos, em cada worker do gunicorn que arrancasse ao mesmo tempo. Corra
+este script UMA vez por deploy que traga índices novos.
+
+Uso (a partir da pasta backend, com o DATABASE_URL do .env):
+    python tools/migrate_indexes.py --dry-run   # só mostra o SQL
+    python tools/migrate_indexes.py
+"""
+import argparse
+import os
+import re
+import sys
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import SOCIAL_NETWORKS_FUNCTION  # noqa: E402
+
+# Índices que saíram dos modelos e têm de ser apagados das bases existentes
+DROPPED_INDEXES = [
+    # Duplicava o índice único de 'url' (a consulta de frescura usa esse)
+    "ix_scraped_data_cache_url_scraped_at",
+]
+
+_CREATE_INDEX_PATTERN = re.compile(r"^CREATE (UNIQUE )?INDEX ")
+
+
+def create_index_concurrently_sql(index, dialect):
+    """ CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT EXISTS ... de um índice do modelo. """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)).strip()
+    return _CREATE_INDEX_PATTERN.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX CONCURRENTLY ", ddl, count=1)
+
+
+def drop_index_concurrently_sql(name):
+    return f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+
+
+def existing_indexes(conn):
+    """
+    {nome: válido?} dos índices do schema atual. Um índice INVALID é o resto de
+    um CREATE INDEX CONCURRENTLY que falhou a meio: tem de ser apagado e refeito.
+    """
+    rows = conn.execute(text(
+        "SELECT c.relname, i.indisvalid FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relnamespace = current_schema()::regnamespace"
+    ))
+    return {name: valid for name, valid in rows}
+
+
+def plan(engine):
+    """ Lista ordenada dos comandos SQL a executar nesta base. """
+    inspector = inspect(engine)
+    with engine.connect() as conn:
+        existing = existing_indexes(conn)
+
+    statements = [drop_index_concurrently_sql(name) for name in DROPPED_INDEXES if name in existing]
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # O create_all() da app cria a tabela já com os índices
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if existing.get(index.name) is True:
+                continue
+            if index.name in existing:
+                statements.append(drop_index_concurrently_sql(index.name))
+            statements.append(create_index_concurrently_sql(index, engine.dialect))
+    return statements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cria/apaga os índices dos modelos com CONCURRENTLY.")
+    parser.add_argument("--database-url", default=Config.SQLALCHEMY_DATABASE_URI,
+                        help="Padrão: DATABASE_URL do ambiente/.env")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o SQL, sem o executar")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        print("ERRO: DATABASE_URL não definida.")
+        return 1
+    engine = create_engine(args.database_url)
+    if engine.dialect.name != "postgresql":
+        print(f"ERRO: só o Postgres é suportado (não '{engine.dialect.name}').")
+        return 1
+
+    # Os índices da pesquisa dependem desta função (a app também a cria no arranque)
+    if not args.dry_run:
+        with engine.begin() as conn:
+            conn.execute(SOCIAL_NETWORKS_FUNCTION)
+
+    statements = plan(engine)
+    if not statements:
+        print("Nenhum índice a criar ou apagar.")
+        return 0
+
+    # CONCURRENTLY não pode correr dentro de uma transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in statements:
+            print(statement)
+            if not args.dry_run:
+                conn.execute(text(statement))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,7 +36,19 @@ const renderLinkList = (items, title, isMail = false) => {
 };
 
 // --- Helper para a Análise de IA (V8.5) ---
-const AiAnalysisSection = ({ analysis }) => {
+const AiAnalysisSection = ({ analysis, pending }) => {
+  const hasAnalysis = analysis && Object.keys(analysis).length > 0;
+
+  // Ainda a caminho (streaming)
+  if (pending && !hasAnalysis) {
+    return (
+      <div className="ai-analysis-container">
+        <h3>Análise (IA)</h3>
+        <p className="no-results">A gerar a análise de IA...</p>
+      </div>
+    );
+  }
+
   // Se a 'analise_ia' não existir ou vier vazia
   if (!analysis || Object.keys(analysis).length === 0) {
     return (
@@ -60,6 +72,9 @@ const AiAnalysisSection = ({ analysis }) => {
   return (
     <div className="ai-analysis-container">
       <h3>Análise (IA)</h3>
+      {pending && (
+        <p className="no-results">Preliminar (só a página principal) - a refinar com as sub-páginas...</p>
+      )}
       
       <dl className="ai-analysis-list">
         
@@ -79,7 +94,8 @@ const AiAnalysisSection = ({ analysis }) => {
 // --- FIM DO HELPER ---
 
 
-const ScrapeResult = ({ results }) => {
+// 'pending': etapas ainda a caminho no streaming ('tech', 'ai')
+const ScrapeResult = ({ results, pending = [] }) => {
   // Desestrutura os dados
   const {
     dossie_pagina_principal,
@@ -102,14 +118,21 @@ const ScrapeResult = ({ results }) => {
     ctas_encontrados,
     contagem_palavras_home,
     analise_ia, 
-    tecnologias_detetadas
+    tecnologias_detetadas,
+    versoes_tecnologias
   } = dossie_pagina_principal;
 
+  // Junta a versão (quando detetada) ao nome da tecnologia
+  const tecnologiasComVersao = (tecnologias_detetadas || []).map((tech) =>
+    versoes_tecnologias && versoes_tecnologias[tech] ? `${tech} ${versoes_tecnologias[tech]}` : tech
+  );
+
   // Limpa a URL para exibição
   const cleanUrl = url.replace(/^(https?:\/\/)/, '').replace(/\/$/, '');
   
   // Contagens para o box de análise
-  const techCount = tecnologias_detetadas ? tecnologias_detetadas.length : 0;
+  const techPending = pending.includes('tech');
+  const techCount = techPending ? '...' : (tecnologias_detetadas ? tecnologias_detetadas.length : 0);
   const pageCount = analise_profunda_subpaginas ? analise_profunda_subpaginas.length : 0;
 
 
@@ -133,10 +156,14 @@ const ScrapeResult = ({ results }) => {
           <h4>Tecnologias</h4>
           <p>{techCount}</p>
         </div>
+        <div className="analysis-item">
+          <h4>Páginas</h4>
+          <p>{pageCount}</p>
+        </div>
       </div>
 
       {/* --- 2. SECÇÃO DE IA  --- */}
-      <AiAnalysisSection analysis={analise_ia} />
+      <AiAnalysisSection analysis={analise_ia} pending={pending.includes('ai')} />
 
       {/* --- 3. Dossiê da Home Page --- */}
       <div className="result-dossie">
@@ -149,7 +176,7 @@ const ScrapeResult = ({ results }) => {
         <h4 className="sub-heading">Descrição (Meta Description):</h4>
         <p>{descricao_meta || '(Nenhuma meta description encontrada)'}</p>
 
-        {renderTags(tecnologias_detetadas, "keyword", "Tecnologias Detectadas")}
+        {renderTags(tecnologiasComVersao, "keyword", "Tecnologias Detectadas")}
       </div>
 
       {/* --- 4. Contactos e Links --- */}
@@ -1,8 +1,31 @@
 import React, { useState, useEffect, useRef } from 'react';
-import api from '../services/api';
+import api, { streamScrape } from '../services/api';
 import { IoSend } from 'react-icons/io5';
 import ScrapeResult from '../components/ScrapeResult'; // <-- 1. IMPORTAR O NOVO COMPONENTE
 
+// Junta um evento do streaming (home, subpage, tech, ai_preliminar, ai, done) ao resultado parcial
+const applyStreamEvent = (message, event, data) => {
+    const content = message.content;
+    const pending = (message.pending || []).filter(stage => stage !== event);
+
+    switch (event) {
+        case 'home':
+            return { ...message, content: { ...content, dossie_pagina_principal: { ...content.dossie_pagina_principal, ...data } } };
+        case 'subpage':
+            return { ...message, content: { ...content, analise_profunda_subpaginas: [...content.analise_profunda_subpaginas, data] } };
+        case 'ai_preliminar':
+            // Análise só da home: aparece já, mas a final (com as sub-páginas) continua pendente
+            return { ...message, content: { ...content, dossie_pagina_principal: { ...content.dossie_pagina_principal, ...data } } };
+        case 'tech':
+        case 'ai':
+            return { ...message, pending, content: { ...content, dossie_pagina_principal: { ...content.dossie_pagina_principal, ...data } } };
+        case 'done':
+            return { ...message, pending: [], content: data.result };
+        default:
+            return message;
+    }
+};
+
 const DashboardPage = () => {
     const [url, setUrl] = useState('');
     const [loading, setLoading] = useState(false);
@@ -36,17 +59,43 @@ const DashboardPage = () => {
         const urlToScrape = url; 
         setUrl(''); 
 
+        // Mensagem do bot preenchida aos poucos pelos eventos do streaming
+        const messageId = Date.now();
+        let receivedEvents = 0;
+        const updateMessage = (update) => {
+            setChatHistory(prev => prev.map(msg => (msg.id === messageId ? update(msg) : msg)));
+        };
+
         try {
-            const response = await api.post('/scraping/scrape', {
-                url: urlToScrape
-            });
-            
             setChatHistory(prev => [
                 ...prev,
-                { sender: 'bot', content: response.data }
+                {
+                    id: messageId,
+                    sender: 'bot',
+                    content: { dossie_pagina_principal: null, analise_profunda_subpaginas: [] },
+                    pending: ['tech', 'ai']
+                }
             ]);
 
+            try {
+                await streamScrape(urlToScrape, (event, data) => {
+                    receivedEvents += 1;
+                    if (event === 'error') {
+                        throw new Error(data.error);
+                    }
+                    updateMessage(msg => applyStreamEvent(msg, event, data));
+                });
+            } catch (streamErr) {
+                // Sem nenhum evento (ex: backend sem streaming): usa o endpoint normal
+                if (receivedEvents > 0) throw streamErr;
+                const response = await api.post('/scraping/scrape', {
+                    url: urlToScrape
+                });
+                updateMessage(msg => ({ ...msg, content: response.data, pending: [] }));
+            }
+
         } catch (err) {
+            setChatHistory(prev => prev.filter(msg => msg.id !== messageId));
             let errorMessage = "Erro desconhecido.";
             if (err.response && err.response.data && err.response.data.error) {
                 errorMessage = err.response.data.error;
@@ -71,19 +120,24 @@ const DashboardPage = () => {
         }
         
         if (typeof message.content === 'object') {
-            
-            return <ScrapeResult results={message.content} />;
+            return <ScrapeResult results={message.content} pending={message.pending} />;
         }
         return <p>{message.content}</p>;
     };
 
+    // Resultado em streaming ainda sem o dossiê da home: não há nada para mostrar
+    const isWaitingForHome = (message) => (
+        typeof message.content === 'object' && message.content !== null && !message.content.dossie_pagina_principal
+    );
+    const hasPartialResult = chatHistory.some(msg => msg.pending && msg.pending.length > 0 && !isWaitingForHome(msg));
+
     return (
         <div className="chat-dashboard">
             
             {/* 1. A Janela do Chat (com histórico) */}
             <div className="chat-window" ref={chatWindowRef}>
-                {chatHistory.map((msg, index) => (
-                    <div key={index} className={`chat-message ${msg.sender}`}>
+                {chatHistory.filter(msg => !isWaitingForHome(msg)).map((msg, index) => (
+                    <div key={msg.id || index} className={`chat-message ${msg.sender}`}>
                         {msg.sender === 'user' ? (
                             <p>{msg.content}</p>
                         ) : (
@@ -94,7 +148,11 @@ const DashboardPage = () => {
                 {/* Mostra "Bot está a digitar..." */}
                 {loading && (
                     <div className="chat-message bot">
-                        <p>Analisando o site... pode demorar 20-30 segundos...</p>
+                        <p>
+                            {hasPartialResult
+                                ? 'Detectando tecnologias e gerando a análise de IA...'
+                                : 'Analisando o site... pode demorar 20-30 segundos...'}
+                        </p>
                     </div>
                 )}
             </div>
@@ -7,5 +7,55 @@ const api = axios.create({
 });
 
 
+// Scrape em streaming (Server-Sent Events via fetch, para poder enviar o JWT).
+// Chama onEvent(evento, dados) a cada etapa: home, subpage, tech, ai_preliminar, ai, done, error.
+export async function streamScrape(url, onEvent) {
+  const response = await fetch(`${api.defaults.baseURL}/scraping/scrape/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: api.defaults.headers.common["Authorization"] || "",
+    },
+    body: JSON.stringify({ url }),
+  });
+
+  if (!response.ok || !response.body) {
+    let message = `HTTP ${response.status}`;
+    try {
+      const data = await response.json();
+      if (data && data.error) message = data.error;
+    } catch {
+      // Resposta sem JSON: fica o código HTTP
+    }
+    throw new Error(message);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  // Cada evento SSE termina numa linha em branco
+  const dispatch = (block) => {
+    let event = "message";
+    const dataLines = [];
+    for (const line of block.split("\n")) {
+      if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+    }
+    if (dataLines.length > 0) onEvent(event, JSON.parse(dataLines.join("\n")));
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      dispatch(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+    }
+  }
+  if (buffer.trim()) dispatch(buffer);
+}
 
 export default api;
\ No newline at end of file